@@ -0,0 +1,183 @@
+"""
+Mod size analyzer: where a mod's bytes go, per payload section, with
+configurable size budgets reported as validator issues.
+"""
+
+import os
+import json
+import zlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .lib import USER_DATA_DIR, ensure_dir, ZipMember
+from .schema import section_paths
+
+SIZE_BUDGETS_PATH = os.path.join(USER_DATA_DIR, "size_budgets.json")
+
+# budgets apply to the estimated compressed (download) size, in bytes; "total" is the whole mod
+DEFAULT_SIZE_BUDGETS = {
+    "total": 250 << 20,
+    "splash_screen": 20 << 20,
+    "wallpaper": 150 << 20,
+    "background_music": 60 << 20,
+    "browser_sounds": 10 << 20,
+    "keyboard_sounds": 5 << 20,
+}
+
+# groups for registered files no payload section points at
+OTHER_PACKAGE = "(package files)"
+OTHER_UNREFERENCED = "(unreferenced)"
+PACKAGE_FILES = ("icon_512.png", "license.txt")
+
+SAMPLE_SIZE = 64 * 1024
+SAMPLE_COUNT = 3
+# (path, size, mtime) -> estimate memo size
+ESTIMATE_MEMO = 20000
+
+_estimates = {}
+_estimates_lock = threading.Lock()
+
+
+def format_bytes(n):
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(n) < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024.0
+
+
+def _is_budget(v):
+    return v is None or (isinstance(v, (int, float)) and not isinstance(v, bool))
+
+
+def budget_overrides(data):
+    """The entries of a user's budget file that mean something: a byte count, or 0 / null
+    to switch a default off."""
+    return {k: v for k, v in data.items() if _is_budget(v)}
+
+
+def merge_size_budgets(overrides):
+    """The default budgets with the user's overrides laid over them."""
+    budgets = dict(DEFAULT_SIZE_BUDGETS)
+    for k, v in overrides.items():
+        if not _is_budget(v):
+            continue
+        if v is None or v <= 0:
+            budgets.pop(k, None)
+        else:
+            budgets[k] = int(v)
+    return budgets
+
+
+def load_size_budget_overrides(path=SIZE_BUDGETS_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return budget_overrides(data) if isinstance(data, dict) else {}
+
+
+def load_size_budgets(path=SIZE_BUDGETS_PATH):
+    return merge_size_budgets(load_size_budget_overrides(path))
+
+
+def save_size_budgets(budgets, path=SIZE_BUDGETS_PATH):
+    ensure_dir(os.path.dirname(path))
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(budgets, f, indent=2, sort_keys=True)
+
+
+def _estimate_file(path, size):
+    """Compressed size estimate from a few deflated samples spread over the file."""
+    if size <= SAMPLE_SIZE * SAMPLE_COUNT:
+        with open(path, "rb") as f:
+            return len(zlib.compress(f.read(), 6))
+    raw = comp = 0
+    with open(path, "rb") as f:
+        for i in range(SAMPLE_COUNT):
+            f.seek((size - SAMPLE_SIZE) * i // (SAMPLE_COUNT - 1))
+            buf = f.read(SAMPLE_SIZE)
+            raw += len(buf)
+            comp += len(zlib.compress(buf, 6))
+    return int(size * comp / raw) if raw else size
+
+
+def measure_source(src):
+    """(bytes, estimated compressed bytes) of a files_to_include value; (0, 0) if unreadable."""
+    if isinstance(src, (bytes, bytearray)):
+        return len(src), len(zlib.compress(bytes(src), 6))
+    try:
+        if isinstance(src, ZipMember):
+            info = src.info()
+            return info.file_size, info.compress_size
+        st = os.stat(src)
+        key = (os.path.abspath(src), st.st_size, st.st_mtime_ns)
+        with _estimates_lock:
+            est = _estimates.get(key)
+        if est is None:
+            est = _estimate_file(src, st.st_size)
+            with _estimates_lock:
+                if len(_estimates) >= ESTIMATE_MEMO:
+                    _estimates.clear()
+                _estimates[key] = est
+        return st.st_size, est
+    except Exception:
+        return 0, 0
+
+
+def analyze_sizes(payload, files_to_include, top_n=10, workers=16):
+    """Per-section byte breakdown and the top_n largest assets.
+
+    A file referenced by several sections is counted once, under the first one.
+    """
+    owner = {}
+    for key, rels in section_paths(payload).items():
+        for rel in rels:
+            owner.setdefault(rel, key)
+
+    rels = sorted(files_to_include)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        sizes = list(pool.map(measure_source, (files_to_include[r] for r in rels)))
+
+    sections = {}
+    assets = []
+    total = total_est = 0
+    for rel, (size, est) in zip(rels, sizes):
+        section = owner.get(rel) or (OTHER_PACKAGE if rel in PACKAGE_FILES else OTHER_UNREFERENCED)
+        s = sections.setdefault(section, {"files": 0, "bytes": 0, "compressed": 0})
+        s["files"] += 1; s["bytes"] += size; s["compressed"] += est
+        total += size; total_est += est
+        assets.append((size, rel, section))
+    assets.sort(key=lambda a: (-a[0], a[1]))
+    return {
+        "sections": sections,
+        "total_bytes": total,
+        "total_compressed": total_est,
+        "largest": assets[:top_n],
+    }
+
+
+def budget_issues(report, budgets):
+    issues = []
+    total_budget = budgets.get("total")
+    if total_budget and report["total_compressed"] > total_budget:
+        issues.append(f"Size budget exceeded: whole mod ~{format_bytes(report['total_compressed'])} "
+                      f"compressed > {format_bytes(total_budget)}")
+    for section, s in sorted(report["sections"].items()):
+        b = budgets.get(section)
+        if b and s["compressed"] > b:
+            issues.append(f"Size budget exceeded: {section} ~{format_bytes(s['compressed'])} "
+                          f"compressed > {format_bytes(b)}")
+    return issues
+
+
+def format_report(report):
+    lines = [f"Total: {format_bytes(report['total_bytes'])} (~{format_bytes(report['total_compressed'])} compressed)"]
+    for section, s in sorted(report["sections"].items(), key=lambda kv: -kv[1]["bytes"]):
+        lines.append(f"  {section:<24} {s['files']:>5} files  {format_bytes(s['bytes']):>10}  "
+                     f"~{format_bytes(s['compressed']):>10} compressed")
+    if report["largest"]:
+        lines.append("Largest assets:")
+        for size, rel, section in report["largest"]:
+            lines.append(f"  {format_bytes(size):>10}  {rel}  [{section}]")
+    return lines
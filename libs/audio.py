@@ -0,0 +1,309 @@
+"""
+Keyboard sound export stages for WAV files (see libs/stages.py). Both need NumPy
+and are skipped when it isn't installed.
+
+- trim: cuts leading and trailing silence (below SILENCE_DB) from every WAV
+  referenced by keyboard_sounds. The cut is on frame boundaries, so the
+  samples that remain are bit-identical. Leading silence is what users feel
+  as typing latency.
+- compact: downmixes to mono and resamples to at most COMPACT_RATE as 16-bit
+  PCM, which is plenty for a key click.
+
+The processed file keeps its relpath; only its source in the file map is
+swapped, so the manifest is unchanged. Results are cached by the source's
+digest.
+
+WAVs are parsed here rather than with the `wave` module, which (before
+Python 3.12) rejects WAVE_FORMAT_EXTENSIBLE, the usual header of 24-bit
+files, and float WAVs. `wave` writes the compact output.
+"""
+
+import io
+import os
+import math
+import struct
+import wave
+import hashlib
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .lib import iter_source_chunks, source_size
+from .schema import SECTIONS
+from .analyze import format_bytes
+
+# bump when the processing changes so cached outputs are rebuilt
+AUDIO_FORMAT_VERSION = 1
+
+# frames quieter than this on every channel count as silence
+SILENCE_DB = -50.0
+# kept before the first / after the last non-silent frame so attacks and decays aren't clipped
+LEAD_PAD_MS = 1.0
+TAIL_PAD_MS = 5.0
+# less than this in total isn't worth a new file
+MIN_TRIM_MS = 2.0
+
+COMPACT_RATE = 44100
+RESAMPLE_HALF_TAPS = 16
+RESAMPLE_BLOCK = 8192
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# cache key -> per-file stats (None when the file is left as it is)
+_trim_memo = {}
+_compact_memo = {}
+
+
+class Wav:
+    """A parsed PCM / float WAV: the raw fmt chunk plus the data chunk bytes."""
+
+    def __init__(self, fmt_chunk, data):
+        self.fmt_chunk = fmt_chunk
+        tag, self.channels, self.rate, _, self.block_align, self.bits = struct.unpack("<HHIIHH", fmt_chunk[:16])
+        if tag == WAVE_FORMAT_EXTENSIBLE and len(fmt_chunk) >= 40:
+            tag = struct.unpack("<H", fmt_chunk[24:26])[0]
+        self.format = tag
+        if not self.channels or not self.block_align or self.block_align % self.channels:
+            raise ValueError("bad fmt chunk")
+        self.width = self.block_align // self.channels
+        if not ((tag == WAVE_FORMAT_PCM and self.width in (1, 2, 3, 4)) or
+                (tag == WAVE_FORMAT_IEEE_FLOAT and self.width in (4, 8))):
+            raise ValueError(f"unsupported WAV format {tag} / {self.bits} bit")
+        self.frames = len(data) // self.block_align
+        self.data = data[:self.frames * self.block_align]
+
+    def samples(self):
+        """float32 array of shape (frames, channels) in -1..1."""
+        raw = np.frombuffer(self.data, np.uint8)
+        w = self.width
+        if self.format == WAVE_FORMAT_IEEE_FLOAT:
+            x = np.frombuffer(self.data, "<f4" if w == 4 else "<f8").astype(np.float32)
+        elif w == 1:
+            x = (raw.astype(np.float32) - 128.0) / 128.0
+        elif w == 2:
+            x = np.frombuffer(self.data, "<i2").astype(np.float32) / 32768.0
+        elif w == 3:
+            b = raw.reshape(-1, 3).astype(np.int32)
+            v = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+            v = np.where(v >= 1 << 23, v - (1 << 24), v)
+            x = v.astype(np.float32) / float(1 << 23)
+        else:
+            x = np.frombuffer(self.data, "<i4").astype(np.float32) / float(1 << 31)
+        return x.reshape(-1, self.channels)
+
+    def is_compact(self, rate=COMPACT_RATE):
+        return self.format == WAVE_FORMAT_PCM and self.channels == 1 and self.width <= 2 and self.rate <= rate
+
+    def to_bytes(self, data):
+        """A WAV with this one's fmt chunk around `data`."""
+        chunks = [b"fmt ", struct.pack("<I", len(self.fmt_chunk)), self.fmt_chunk, b"\0" * (len(self.fmt_chunk) & 1)]
+        if self.format != WAVE_FORMAT_PCM:
+            # non-PCM files must carry their frame count
+            chunks += [b"fact", struct.pack("<II", 4, len(data) // self.block_align)]
+        chunks += [b"data", struct.pack("<I", len(data)), data, b"\0" * (len(data) & 1)]
+        body = b"WAVE" + b"".join(chunks)
+        return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+def parse_wav(data):
+    """Wav for RIFF/WAVE bytes; ValueError if it isn't a readable PCM or float WAV."""
+    if len(data) < 12 or data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        raise ValueError("not a RIFF/WAVE file")
+    pos = 12
+    fmt = body = None
+    while pos + 8 <= len(data):
+        cid, size = data[pos:pos + 4], struct.unpack("<I", data[pos + 4:pos + 8])[0]
+        chunk = data[pos + 8:pos + 8 + size]
+        if cid == b"fmt ":
+            fmt = chunk
+        elif cid == b"data":
+            body = chunk
+        if fmt is not None and body is not None:
+            break
+        pos += 8 + size + (size & 1)
+    if fmt is None or body is None or len(fmt) < 16:
+        raise ValueError("missing fmt or data chunk")
+    return Wav(fmt, body)
+
+
+def trim_bounds(wav):
+    """(first, end) frames to keep once leading and trailing silence is cut; None if all silent."""
+    amp = np.abs(wav.samples()).max(axis=1)
+    loud = np.flatnonzero(amp > 10 ** (SILENCE_DB / 20.0))
+    if not len(loud):
+        return None
+    lead = int(wav.rate * LEAD_PAD_MS / 1000)
+    tail = int(wav.rate * TAIL_PAD_MS / 1000)
+    return max(0, int(loud[0]) - lead), min(wav.frames, int(loud[-1]) + 1 + tail)
+
+
+def resample(x, src_rate, dst_rate, half_taps=RESAMPLE_HALF_TAPS):
+    """Kaiser-windowed sinc resampling of (frames, channels) float samples."""
+    if src_rate == dst_rate or not len(x):
+        return x
+    ratio = src_rate / dst_rate
+    # low-pass just under the lower of the two Nyquist frequencies
+    cutoff = min(1.0, dst_rate / src_rate) * 0.95
+    beta = 8.6
+    n_out = int(round(len(x) * dst_rate / src_rate))
+    offsets = np.arange(-half_taps + 1, half_taps + 1)
+    padded = np.pad(x, ((half_taps, half_taps + 1), (0, 0)))
+    out = np.empty((n_out, x.shape[1]), np.float32)
+
+    def kernel(frac):
+        d = frac[:, None] - offsets[None, :]
+        win = np.i0(beta * np.sqrt(np.clip(1.0 - (d / half_taps) ** 2, 0.0, None))) / np.i0(beta)
+        k = np.sinc(cutoff * d) * win
+        return k / k.sum(axis=1, keepdims=True)
+
+    # output n sits at phase (n * src mod dst) / dst: with common rates there are few phases
+    period = dst_rate // math.gcd(src_rate, dst_rate)
+    table = kernel((np.arange(period) * src_rate % dst_rate) / dst_rate) if period <= n_out else None
+    for s in range(0, n_out, RESAMPLE_BLOCK):
+        n = np.arange(s, min(s + RESAMPLE_BLOCK, n_out))
+        base = n * src_rate // dst_rate
+        k = table[n % period] if table is not None else kernel(n * ratio - base)
+        taps = padded[base[:, None] + offsets[None, :] + half_taps]
+        out[s:s + len(n)] = np.einsum("ij,ijc->ic", k, taps)
+    return out
+
+
+def compact_bytes(wav, rate=COMPACT_RATE):
+    """16-bit mono WAV bytes at min(wav.rate, rate)."""
+    x = wav.samples()
+    x = x.mean(axis=1, keepdims=True) if wav.channels > 1 else x
+    out_rate = min(wav.rate, rate)
+    x = resample(x, wav.rate, out_rate)
+    pcm = np.clip(np.round(x[:, 0] * 32767.0), -32768, 32767).astype("<i2")
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(out_rate)
+        w.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+
+def keyboard_wavs(payload):
+    """[(pack label, event, relpath)] for every .wav in keyboard_sounds."""
+    out = []
+    section = SECTIONS['keyboard_sounds']
+    packs = payload.get('keyboard_sounds')
+    for i, pack in enumerate(packs if isinstance(packs, list) else ()):
+        if not isinstance(pack, dict) or not isinstance(pack.get('sounds'), dict):
+            continue
+        label = pack.get('name') or pack.get('id') or str(i)
+        for ev, items in pack['sounds'].items():
+            for rel in section.extract_entry({"sounds": {ev: items}}):
+                if rel.lower().endswith(".wav"):
+                    out.append((label, ev, rel))
+    return out
+
+
+def _process(manifest, file_map, ctx, stage, memo, params, work):
+    """Shared loop of the WAV stages. work(wav) -> (stats, render() -> new bytes), or None to keep the file;
+    a rendering that isn't smaller than the source is not used either. Returns {relpath: (stats, bytes before, bytes after)} of the files that were replaced."""
+    payload = manifest.get('mod', {}).get('payload') or {}
+    cache = ctx.cache(f"wav_{stage}", ".wav")
+    done = {}
+    for _, _, rel in keyboard_wavs(payload):
+        if rel in done or rel not in file_map:
+            continue
+        src = file_map[rel]
+        sha = ctx.digests.source_digest(src)
+        if sha is None:
+            continue
+        key = hashlib.sha256(f"gx-wav-{stage}-v{AUDIO_FORMAT_VERSION}\0{params}\0{sha}".encode()).hexdigest()
+        path = cache.get(key)
+        if key not in memo or (memo[key] is not None and path is None):
+            try:
+                data = b"".join(iter_source_chunks(src))
+                result = work(parse_wav(data))
+                if result is not None and path is None:
+                    out = result[1]()
+                    # e.g. 8-bit sources come out of compact as 16-bit: keep whichever is smaller
+                    if len(out) >= len(data):
+                        result = None
+                    else:
+                        path = cache.put_bytes(key, out, ctx.governor)
+            except (OSError, ValueError) as e:
+                ctx.log(f"WAV {stage}: {rel}: {e}, left as is")
+                result = None
+            memo[key] = None if result is None else result[0]
+        if memo[key] is None:
+            continue
+        done[rel] = (memo[key], source_size(src), os.path.getsize(path))
+        file_map[rel] = path
+    return done
+
+
+def _report(payload, done, ctx, stage, describe):
+    """One log line per keyboard pack event with replaced files, then a total."""
+    events = {}
+    for label, ev, rel in keyboard_wavs(payload):
+        if rel in done and rel not in events.setdefault((label, ev), []):
+            events[(label, ev)].append(rel)
+    for (label, ev), rels in events.items():
+        if rels:
+            stats = [done[r] for r in rels]
+            before = sum(b for _, b, _ in stats)
+            after = sum(a for _, _, a in stats)
+            ctx.log(f"WAV {stage}: {label} / {ev}: {describe([st for st, _, _ in stats])}"
+                    f"{format_bytes(before)} -> {format_bytes(after)}")
+    if done:
+        before = sum(b for _, b, _ in done.values())
+        after = sum(a for _, _, a in done.values())
+        ctx.log(f"WAV {stage}: {len(done)} file(s), {format_bytes(before)} -> {format_bytes(after)}")
+
+
+def _trim(wav):
+    bounds = trim_bounds(wav)
+    if bounds is None:
+        # all silent: a deliberate filler, leave it alone
+        return None
+    first, end = bounds
+    lead_ms = first * 1000.0 / wav.rate
+    tail_ms = (wav.frames - end) * 1000.0 / wav.rate
+    if lead_ms + tail_ms < MIN_TRIM_MS:
+        return None
+    stats = {"lead_ms": lead_ms, "tail_ms": tail_ms}
+    return stats, lambda: wav.to_bytes(wav.data[first * wav.block_align:end * wav.block_align])
+
+
+def _compact(wav):
+    if wav.is_compact():
+        return None
+    kind = "float" if wav.format == WAVE_FORMAT_IEEE_FLOAT else "bit"
+    stats = {"from": f"{wav.rate} Hz, {wav.channels} ch, {wav.bits}-{kind}"}
+    return stats, lambda: compact_bytes(wav)
+
+
+def trim_keyboard_wavs(manifest, file_map, ctx):
+    """Export stage: cut leading / trailing silence from keyboard_sounds WAVs."""
+    if np is None:
+        ctx.log("WAV trim: NumPy is not installed, stage skipped")
+        return
+    params = f"{SILENCE_DB}/{LEAD_PAD_MS}/{TAIL_PAD_MS}/{MIN_TRIM_MS}"
+    done = _process(manifest, file_map, ctx, "trim", _trim_memo, params, _trim)
+
+    def describe(stats):
+        lead = [st["lead_ms"] for st in stats]
+        return f"{len(stats)} file(s), -{sum(lead) / len(lead):.0f} ms lead silence (up to {max(lead):.0f} ms), "
+    _report(manifest.get('mod', {}).get('payload') or {}, done, ctx, "trim", describe)
+
+
+def compact_keyboard_wavs(manifest, file_map, ctx):
+    """Export stage: keyboard_sounds WAVs as mono 16-bit PCM at up to COMPACT_RATE."""
+    if np is None:
+        ctx.log("WAV compact: NumPy is not installed, stage skipped")
+        return
+    done = _process(manifest, file_map, ctx, "compact", _compact_memo, f"{COMPACT_RATE}/{RESAMPLE_HALF_TAPS}", _compact)
+
+    def describe(stats):
+        kinds = sorted({st["from"] for st in stats})
+        return f"{len(stats)} file(s) from {'; '.join(kinds)}, "
+    _report(manifest.get('mod', {}).get('payload') or {}, done, ctx, "compact", describe)
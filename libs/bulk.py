@@ -0,0 +1,103 @@
+"""
+Bulk import of sound packs and cursor sets from folders laid out by convention:
+    <folder>/<EVENT>/*.mp3      or   <folder>/<EVENT>.mp3, <EVENT>_2.mp3 ...
+    <folder>/<TYPE>.png         or   <folder>/<TYPE>/*.png
+Folder and file names are matched against the preset lists case-insensitively,
+with '-', ' ' and '.' treated like '_'.
+"""
+
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+AUDIO_EXTS = (".mp3", ".wav", ".ogg")
+CURSOR_EXTS = (".png", ".cur", ".ani", ".svg", ".gif", ".webp")
+
+_SEPARATORS = re.compile(r"[\s.\-]+")
+_NUMBER_SUFFIX = re.compile(r"_?\d+$")
+
+
+def normalize_name(name):
+    return _SEPARATORS.sub("_", name.strip()).upper()
+
+
+def match_preset(name, presets):
+    """Preset matching a folder name or file stem (a trailing number like _2 is ignored), or None."""
+    n = normalize_name(name)
+    if n in presets:
+        return n
+    n = _NUMBER_SUFFIX.sub("", n)
+    return n if n in presets else None
+
+
+def _scan_tree(path, top_event, presets, exts):
+    found = []
+    unmatched = []
+    for root_dir, dirs, files in os.walk(path):
+        dirs.sort()
+        event = top_event
+        if root_dir != path:
+            # the nearest matching folder name wins over the top-level one
+            event = match_preset(os.path.basename(root_dir), presets) or top_event
+        for fname in sorted(files):
+            stem, ext = os.path.splitext(fname)
+            if ext.lower() not in exts:
+                continue
+            full = os.path.join(root_dir, fname)
+            ev = event or match_preset(stem, presets)
+            if ev:
+                found.append((ev, full))
+            else:
+                unmatched.append(full)
+    return found, unmatched
+
+
+def scan_convention_folder(folder, presets, exts, workers=8):
+    """({preset: [files]}, [unmatched files]) for a folder laid out by convention."""
+    presets = set(presets)
+    try:
+        names = sorted(os.listdir(folder))
+    except OSError:
+        return {}, []
+    jobs = []
+    found, unmatched = [], []
+    for n in names:
+        full = os.path.join(folder, n)
+        if os.path.isdir(full):
+            jobs.append((full, match_preset(n, presets)))
+        elif os.path.splitext(n)[1].lower() in exts:
+            ev = match_preset(os.path.splitext(n)[0], presets)
+            if ev:
+                found.append((ev, full))
+            else:
+                unmatched.append(full)
+    # one pass over all sub-trees in parallel
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for f, u in pool.map(lambda job: _scan_tree(job[0], job[1], presets, exts), jobs):
+            found.extend(f); unmatched.extend(u)
+    matches = {}
+    for ev, path in found:
+        matches.setdefault(ev, []).append(path)
+    return matches, sorted(unmatched)
+
+
+def unique_dest(folder, name, ev, src, taken):
+    """relpath under folder for src, prefixed with the event/type if the plain name is already used."""
+    for cand in (f"{folder}/{name}", f"{folder}/{ev.lower()}_{name}"):
+        if taken.get(cand, src) == src:
+            return cand
+    stem, ext = os.path.splitext(name)
+    i = 2
+    while True:
+        cand = f"{folder}/{ev.lower()}_{stem}_{i}{ext}"
+        if taken.get(cand, src) == src:
+            return cand
+        i += 1
+
+
+def summarize(matches, unmatched, limit=20):
+    lines = [f"{ev}: {len(files)} file(s)" for ev, files in sorted(matches.items())]
+    if unmatched:
+        lines.append(f"Not matched ({len(unmatched)}): " + ", ".join(os.path.basename(u) for u in unmatched[:limit])
+                     + (" ..." if len(unmatched) > limit else ""))
+    return "\n".join(lines)
@@ -0,0 +1,281 @@
+"""
+Persistent caches used by the export code:
+  - DigestIndex: content digests of source files, memoized by (size, mtime)
+  - BuildCache: finished archives keyed by their full input signature, LRU-evicted
+"""
+
+import os
+import json
+import shutil
+import zlib
+import hashlib
+import zipfile
+import threading
+
+from .lib import USER_DATA_DIR, ensure_dir, iter_source_chunks, source_size, ZipMember
+
+DIGEST_INDEX_PATH = os.path.join(USER_DATA_DIR, "digests.json")
+BUILD_CACHE_DIR = os.path.join(USER_DATA_DIR, "build_cache")
+BUILD_CACHE_MAX_BYTES = 2 << 30
+# leading bytes covered by an entry's "head" digest, a cheap pre-check before comparing full digests
+PARTIAL_BYTES = 64 * 1024
+
+# bump when the archive layout changes so old cache entries stop matching
+BUILD_FORMAT_VERSION = 1
+
+
+def file_digests(path):
+    """(sha256 hex, crc32, sha256 hex of the first PARTIAL_BYTES) of a file (or ZipMember) in one pass."""
+    h = hashlib.sha256(); head = hashlib.sha256(); crc = 0; n = 0
+    for buf in iter_source_chunks(path):
+        h.update(buf)
+        crc = zlib.crc32(buf, crc)
+        if n < PARTIAL_BYTES:
+            head.update(buf[:PARTIAL_BYTES - n])
+        n += len(buf)
+    return h.hexdigest(), crc, head.hexdigest()
+
+
+class DigestIndex:
+    """sha256/crc32 of source files, re-read only when a file's size or mtime changes."""
+
+    def __init__(self, path=DIGEST_INDEX_PATH):
+        self.path = os.path.abspath(path)
+        self.entries = {}
+        self.dirty = False
+        self.lock = threading.Lock()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                self.entries = data
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def _key(path):
+        if isinstance(path, ZipMember):
+            return repr(path), path.zip_path
+        key = os.path.abspath(path)
+        return key, key
+
+    def entry(self, path):
+        """Index entry {size, mtime_ns, sha256, crc32, head} for a path or ZipMember, or None if it can't be read.
+        ZipMember entries are keyed by archive!member and invalidated with the archive."""
+        key, stat_path = self._key(path)
+        try:
+            st = os.stat(stat_path)
+        except OSError:
+            return None
+        with self.lock:
+            e = self.entries.get(key)
+        if e and e.get("size") == st.st_size and e.get("mtime_ns") == st.st_mtime_ns and "crc32" in e:
+            return e
+        try:
+            sha, crc, head = file_digests(path)
+        except (OSError, KeyError, zipfile.BadZipFile):
+            return None
+        e = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": sha, "crc32": crc, "head": head}
+        if isinstance(path, ZipMember):
+            e["member_size"] = source_size(path)
+        with self.lock:
+            self.entries[key] = e
+            self.dirty = True
+        return e
+
+    def recorded(self, path):
+        """Last entry recorded for a path or ZipMember, whether or not it still exists."""
+        with self.lock:
+            return self.entries.get(self._key(path)[0])
+
+    def head_digest(self, path):
+        """sha256 of the first PARTIAL_BYTES of a file; only those bytes are read if the index has no entry."""
+        if isinstance(path, ZipMember):
+            e = self.entry(path)
+            return e.get("head") if e else None
+        key, stat_path = self._key(path)
+        try:
+            st = os.stat(stat_path)
+        except OSError:
+            return None
+        with self.lock:
+            e = self.entries.get(key)
+        if e and e.get("size") == st.st_size and e.get("mtime_ns") == st.st_mtime_ns and "head" in e:
+            return e["head"]
+        try:
+            with open(stat_path, "rb") as f:
+                head = hashlib.sha256(f.read(PARTIAL_BYTES)).hexdigest()
+        except OSError:
+            return None
+        with self.lock:
+            e = self.entries.get(key)
+            if not (e and e.get("size") == st.st_size and e.get("mtime_ns") == st.st_mtime_ns):
+                # a partial entry: entry() fills in the full digests when they are asked for
+                e = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+            self.entries[key] = dict(e, head=head)
+            self.dirty = True
+        return head
+
+    def digest(self, path):
+        """sha256 hex of `path`, or None if it can't be read."""
+        e = self.entry(path)
+        return e["sha256"] if e else None
+
+    def source_digest(self, src):
+        """Digest of a files_to_include value (path, ZipMember or in-memory bytes)."""
+        if isinstance(src, (bytes, bytearray)):
+            return hashlib.sha256(src).hexdigest()
+        return self.digest(src)
+
+    def source_crc(self, src):
+        """(size, crc32) of a files_to_include value, or None if it can't be read."""
+        if isinstance(src, (bytes, bytearray)):
+            return len(src), zlib.crc32(src)
+        e = self.entry(src)
+        if not e:
+            return None
+        return (e.get("member_size", e["size"]), e["crc32"])
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            data = json.dumps(self.entries)
+            self.dirty = False
+        ensure_dir(os.path.dirname(self.path))
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp, self.path)
+
+
+def build_signature(manifest_text, file_map, digests):
+    """Key over everything that ends up in the archive: manifest bytes plus each member's content digest."""
+    h = hashlib.sha256()
+    h.update(f"gx-build-v{BUILD_FORMAT_VERSION}\0".encode())
+    h.update(manifest_text.encode("utf-8"))
+    for rel in sorted(file_map):
+        h.update(b"\0" + rel.encode("utf-8") + b"\0")
+        h.update((digests.source_digest(file_map[rel]) or "missing").encode())
+    return h.hexdigest()
+
+
+def _tmp_path(dest):
+    # unique per writer: two threads or processes may store the same key at once
+    return f"{dest}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class BuildCache:
+    """Directory of finished archives; least recently used entries go first once max_bytes is exceeded.
+
+    The entry just stored is never evicted, even if it alone is over max_bytes. With pin=True, every
+    entry this instance handed out or stored is kept too: stage caches are opened once per export,
+    and the file map of that export points into them.
+    """
+
+    def __init__(self, root=BUILD_CACHE_DIR, max_bytes=BUILD_CACHE_MAX_BYTES, suffix=".zip", pin=False):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.pin = pin
+        self.pinned = set()
+        self.lock = threading.Lock()
+
+    def _pin(self, p):
+        if self.pin:
+            with self.lock:
+                self.pinned.add(p)
+
+    def entry_path(self, key):
+        return os.path.join(self.root, key + self.suffix)
+
+    def get(self, key):
+        p = self.entry_path(key)
+        if not os.path.isfile(p):
+            return None
+        # mtime doubles as the LRU clock
+        try:
+            os.utime(p, None)
+        except OSError:
+            pass
+        self._pin(p)
+        return p
+
+    def put(self, key, path, governor=None):
+        ensure_dir(self.root)
+        dest = self.entry_path(key)
+        tmp = _tmp_path(dest)
+        try:
+            if governor is not None:
+                with open(tmp, "wb") as f:
+                    governor.copy_to(path, f)
+            else:
+                shutil.copyfile(path, tmp)
+        except BaseException:
+            _remove_quietly(tmp)
+            raise
+        os.replace(tmp, dest)
+        self._pin(dest)
+        self.evict(keep=(dest,))
+        return dest
+
+    def put_bytes(self, key, data, governor=None):
+        return self.put_with(key, lambda f: f.write(data), governor)
+
+    def put_with(self, key, write, governor=None):
+        """Store what write(f) writes into an open binary file (through governor, libs/throttle.py, if given)."""
+        ensure_dir(self.root)
+        dest = self.entry_path(key)
+        tmp = _tmp_path(dest)
+        try:
+            with open(tmp, "wb") as f:
+                write(governor.wrap(f) if governor is not None else f)
+        except BaseException:
+            _remove_quietly(tmp)
+            raise
+        os.replace(tmp, dest)
+        self._pin(dest)
+        self.evict(keep=(dest,))
+        return dest
+
+    def entries(self):
+        out = []
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return out
+        for n in names:
+            if not n.endswith(self.suffix):
+                continue
+            p = os.path.join(self.root, n)
+            try:
+                st = os.stat(p)
+            except OSError:
+                continue
+            out.append((st.st_mtime_ns, st.st_size, p))
+        return out
+
+    def evict(self, keep=()):
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        with self.lock:
+            keep = set(keep) | self.pinned
+        removed = 0
+        for _, size, p in entries:
+            if total <= self.max_bytes:
+                break
+            if p in keep:
+                continue
+            try:
+                os.remove(p)
+                total -= size; removed += 1
+            except OSError:
+                pass
+        return removed
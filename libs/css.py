@@ -0,0 +1,266 @@
+"""
+CSS bundling and minification for page_styles (an export stage, see libs/stages.py).
+
+Every page_styles entry's `css` list is concatenated, in order, into one
+minified bundle next to its first stylesheet, and the entry is pointed at
+it. The cascade is unchanged: rules keep their order, relative url()s are
+rebased to the bundle's folder, and a file with @import / @namespace (only
+valid at the top of a sheet) starts a new bundle instead of being merged
+into the previous one. Bundles are cached by the digests of their inputs.
+
+The minifier only removes what never matters to the parser: comments
+(except /*! ... */ notices), whitespace next to { } ; , > and after ':',
+and the last ';' of a block. Strings and url() contents are copied verbatim.
+"""
+
+import os
+import re
+import hashlib
+import posixpath
+
+from .lib import iter_source_chunks, source_size
+from .analyze import format_bytes
+from .schema import referenced_paths
+
+# bump when the minifier output changes so cached bundles are rebuilt
+CSS_FORMAT_VERSION = 1
+
+_CHARSET = re.compile(rb'^@charset\s+"([^"]+)";')
+_SCHEME = re.compile(r"^[a-zA-Z][a-zA-Z0-9+.-]*:")
+_NAME_CHARS = re.compile(r"[^A-Za-z0-9_.-]+")
+# at-rules that must come before every other rule of a stylesheet
+_HEAD_RULE = re.compile(r"@(import|namespace)\b", re.I)
+# source sha256 -> whether the sheet has head rules
+_head_rules_memo = {}
+
+# no space needed before / after these
+_TIGHT_BEFORE = set("{};,>")
+_TIGHT_AFTER = set("{};,>:")
+
+
+def decode_css(data):
+    """Text of a stylesheet: BOM and @charset honoured, UTF-8 otherwise (latin-1 if that fails)."""
+    if data.startswith(b"\xef\xbb\xbf"):
+        return data[3:].decode("utf-8", "replace")
+    m = _CHARSET.match(data)
+    if m:
+        try:
+            return data.decode(m.group(1).decode("ascii", "replace"))
+        except (LookupError, UnicodeDecodeError):
+            pass
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return data.decode("latin-1")
+
+
+def rebase_url(url, src_dir, dest_dir):
+    """url (as written in a sheet in src_dir) relative to dest_dir; absolute and special URLs are kept."""
+    if src_dir == dest_dir:
+        return url
+    u = url.strip()
+    if not u or u.startswith(("#", "/", "%23")) or _SCHEME.match(u):
+        return url
+    cut = min([i for i in (u.find("?"), u.find("#")) if i >= 0] or [len(u)])
+    path, suffix = u[:cut], u[cut:]
+    target = posixpath.normpath(posixpath.join(src_dir, path))
+    return posixpath.relpath(target, dest_dir or ".") + suffix
+
+
+def _read_string(text, i):
+    """End index (exclusive) of the string starting at text[i]."""
+    q = text[i]
+    n = len(text)
+    j = i + 1
+    while j < n:
+        c = text[j]
+        if c == "\\":
+            j += 2
+            continue
+        if c == q or c == "\n":
+            return j + 1
+        j += 1
+    return n
+
+
+def minify_css(text, src_dir="", dest_dir=""):
+    """Minified text; url()s and @import strings are rebased from src_dir to dest_dir."""
+    out = []
+    n = len(text)
+    i = 0
+    pending = False   # whitespace (or a comment) seen since the last emitted char
+    last = ""         # last emitted char
+    at_kw = None      # at-keyword of the current statement
+    depth = 0
+    while i < n:
+        c = text[i]
+        if c in " \t\r\n\f":
+            pending = True
+            i += 1
+            continue
+        if c == "/" and text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            end = n if end < 0 else end + 2
+            if text.startswith("/*!", i):
+                out.append(text[i:end]); last = "/"
+            else:
+                pending = True
+            i = end
+            continue
+
+        if pending and last and last not in _TIGHT_AFTER and c not in _TIGHT_BEFORE:
+            out.append(" "); last = " "
+        pending = False
+
+        if c in "\"'":
+            end = _read_string(text, i)
+            s = text[i:end]
+            if at_kw == "import":
+                s = s[0] + rebase_url(s[1:-1], src_dir, dest_dir) + s[-1]
+            out.append(s); last = s[-1]
+            i = end
+            continue
+        if c in "uU" and text[i:i + 4].lower() == "url(" and (not last or not (last.isalnum() or last in "-_")):
+            j = i + 4
+            while j < n and text[j] in " \t\r\n\f":
+                j += 1
+            if j < n and text[j] in "\"'":
+                end = _read_string(text, j)
+                inner = text[j:end]
+                inner = inner[0] + rebase_url(inner[1:-1], src_dir, dest_dir) + inner[-1]
+                close = text.find(")", end)
+            else:
+                close = text.find(")", j)
+                raw = text[j:close if close >= 0 else n].strip()
+                inner = rebase_url(raw, src_dir, dest_dir)
+                if inner != raw and re.search(r"[\s()'\"]", inner):
+                    inner = '"' + inner.replace('"', '\\"') + '"'
+            close = n if close < 0 else close + 1
+            out.append("url(" + inner + ")"); last = ")"
+            i = close
+            continue
+        if c == "@":
+            m = re.match(r"@([A-Za-z-]+)", text[i:i + 64])
+            if m:
+                at_kw = m.group(1).lower()
+                out.append(m.group(0)); last = m.group(0)[-1]
+                i += len(m.group(0))
+                continue
+        if c in ";{}":
+            at_kw = None
+            if c == "{":
+                depth += 1
+            elif c == "}":
+                depth = max(0, depth - 1)
+                if last == ";":
+                    out.pop()
+        if c == "\\" and i + 1 < n:
+            out.append(text[i:i + 2]); last = text[i + 1]
+            i += 2
+            continue
+        out.append(c); last = c
+        i += 1
+    # blocks left open at the end of a sheet are closed there, not in the next sheet of a bundle
+    return "".join(out) + "}" * depth
+
+
+def strip_charset(text):
+    # only valid at the very start of a file; the bundle gets its own
+    m = re.match(r'\s*@charset\s+"[^"]*"\s*;', text)
+    return text[m.end():] if m else text
+
+
+def bundle_name(entry, index, folder, taken):
+    base = _NAME_CHARS.sub("_", str(entry.get('id') or "")).strip("_.") or f"page_style_{index}"
+    name = posixpath.join(folder, f"{base}.bundle.css")
+    k = 2
+    while name in taken:
+        name = posixpath.join(folder, f"{base}.bundle{k}.css"); k += 1
+    taken.add(name)
+    return name
+
+
+def bundle_texts(parts, dest_dir):
+    """[(relpath, css text)] -> one minified sheet for dest_dir."""
+    chunks = []
+    for rel, text in parts:
+        chunks.append(minify_css(strip_charset(text), posixpath.dirname(rel), dest_dir))
+    out = "\n".join(chunks)
+    if any(ord(ch) > 127 for ch in out):
+        out = '@charset "UTF-8";' + out
+    return out
+
+
+def _group(css, read):
+    """css relpaths split into runs that can share a bundle (a sheet with head rules starts a new one)."""
+    groups = []
+    for rel, sha in css:
+        if sha not in _head_rules_memo:
+            # a match inside a comment or string only costs an extra bundle
+            _head_rules_memo[sha] = bool(_HEAD_RULE.search(read(rel)))
+        if not groups or _head_rules_memo[sha]:
+            groups.append([])
+        groups[-1].append((rel, sha))
+    return groups
+
+
+def bundle_page_styles(manifest, file_map, ctx):
+    """Export stage: one minified bundle per page_styles entry (see module docstring)."""
+    payload = manifest.get('mod', {}).get('payload') or {}
+    styles = payload.get('page_styles')
+    if isinstance(styles, dict):
+        styles = [styles]
+    if not isinstance(styles, list) or not styles:
+        return
+    cache = ctx.cache("css", ".css")
+    taken = set(file_map)
+    texts = {}
+
+    def read(rel):
+        if rel not in texts:
+            texts[rel] = decode_css(b"".join(iter_source_chunks(file_map[rel])))
+        return texts[rel]
+
+    replaced = set()
+    new_styles = []
+    before = after = hits = made = 0
+    for idx, entry in enumerate(styles):
+        css = entry.get('css') if isinstance(entry, dict) else None
+        if not isinstance(css, list) or not css or not all(isinstance(c, str) and c in file_map for c in css):
+            new_styles.append(entry)
+            continue
+        shas = [ctx.digests.source_digest(file_map[rel]) for rel in css]
+        if None in shas:
+            # unreadable sheet: leave the entry alone, validation reports it
+            new_styles.append(entry)
+            continue
+        bundles = []
+        for group in _group(list(zip(css, shas)), read):
+            rels = [rel for rel, _ in group]
+            folder = posixpath.dirname(rels[0])
+            h = hashlib.sha256(f"gx-css-v{CSS_FORMAT_VERSION}\0{folder}\0".encode())
+            for rel, sha in group:
+                h.update(f"{rel}\0{sha}\0".encode("utf-8"))
+            key = h.hexdigest()
+            path = cache.get(key)
+            if path is None:
+                path = cache.put_bytes(key, bundle_texts([(r, read(r)) for r in rels], folder).encode("utf-8"),
+                                       ctx.governor)
+                made += 1
+            else:
+                hits += 1
+            name = bundle_name(entry, idx, folder, taken)
+            file_map[name] = path
+            bundles.append(name)
+            replaced.update(rels)
+            before += sum(source_size(file_map[r]) for r in rels)
+            after += os.path.getsize(path)
+        new_styles.append(dict(entry, css=bundles))
+        ctx.log(f"CSS: {entry.get('id') or idx}: {len(css)} sheet(s) -> {', '.join(bundles)}")
+    if not replaced:
+        return
+    payload['page_styles'] = new_styles
+    still_used = referenced_paths(payload)
+    for rel in replaced - still_used:
+        file_map.pop(rel, None)
+    ctx.log(f"CSS: {format_bytes(before)} -> {format_bytes(after)} ({made} bundle(s) built, {hits} from cache)")
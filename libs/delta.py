@@ -0,0 +1,139 @@
+"""
+Delta update packages.
+Compares the current build against a previous one (export folder or ZIP) and
+packages only added/changed members plus a removal list, with
+mod.flavor.parent_hash pointing at the previous build.
+"""
+
+import os
+import json
+import zlib
+import zipfile
+
+from .lib import iter_file_chunks, manifest_to_json, source_size
+from .ziputil import write_mod_zip
+
+# name of the removal list / change summary written into delta packages
+DELTA_INFO_NAME = "delta.json"
+# members of a build that are not payload files
+BUILD_META_NAMES = ("manifest.json", DELTA_INFO_NAME)
+
+
+def _file_crc(path):
+    crc = 0; size = 0
+    for buf in iter_file_chunks(path):
+        crc = zlib.crc32(buf, crc)
+        size += len(buf)
+    return size, crc
+
+
+def read_previous_build(path):
+    """Members of a previous build as {relpath: (size, crc32)}, plus its parsed manifest (or None).
+
+    ZIP sizes and CRCs come straight from the central directory; folders are read once.
+    """
+    members = {}
+    manifest = None
+    if os.path.isdir(path):
+        for root_dir, _, files in os.walk(path):
+            for fname in files:
+                full = os.path.join(root_dir, fname)
+                rel = os.path.relpath(full, path).replace(os.sep, "/")
+                if rel == "manifest.json":
+                    try:
+                        with open(full, "r", encoding="utf-8") as f:
+                            manifest = json.load(f)
+                    except (OSError, ValueError):
+                        pass
+                if rel in BUILD_META_NAMES:
+                    continue
+                members[rel] = _file_crc(full)
+    else:
+        with zipfile.ZipFile(path) as zf:
+            for info in zf.infolist():
+                if info.is_dir():
+                    continue
+                if info.filename == "manifest.json":
+                    try:
+                        manifest = json.loads(zf.read(info).decode("utf-8"))
+                    except ValueError:
+                        pass
+                if info.filename in BUILD_META_NAMES:
+                    continue
+                members[info.filename] = (info.file_size, info.CRC)
+    return members, manifest
+
+
+def previous_flavor_hash(manifest):
+    try:
+        h = manifest['mod']['flavor']['hash']
+    except (KeyError, TypeError):
+        return None
+    return h if isinstance(h, str) and h else None
+
+
+def plan_delta(file_map, previous, digests):
+    """Split file_map against a previous build into added / changed / unchanged / removed relpaths."""
+    added, changed, unchanged = [], [], []
+    for rel in sorted(file_map):
+        cur = digests.source_crc(file_map[rel])
+        if cur is None:
+            # unreadable sources are skipped by the exporters as well
+            continue
+        old = previous.get(rel)
+        if old is None:
+            added.append(rel)
+        elif tuple(old) != tuple(cur):
+            changed.append(rel)
+        else:
+            unchanged.append(rel)
+    readable = set(added) | set(changed) | set(unchanged)
+    removed = sorted(rel for rel in previous if rel not in readable)
+    return {"added": added, "changed": changed, "unchanged": unchanged, "removed": removed}
+
+
+def _without_flavor(manifest):
+    mod = manifest.get('mod') if isinstance(manifest, dict) else None
+    if not isinstance(mod, dict):
+        return manifest
+    return dict(manifest, mod={k: v for k, v in mod.items() if k != 'flavor'})
+
+
+def manifest_changed(manifest, previous_manifest):
+    """True if manifest differs from the previous build's beyond mod.flavor (which only
+    records the hashes): a version bump or a new icon path has to ship in a delta too."""
+    if previous_manifest is None:
+        return True
+    return _without_flavor(manifest) != _without_flavor(previous_manifest)
+
+
+def delta_is_empty(plan, manifest, previous_manifest):
+    """Nothing added, changed or removed, manifest.json included."""
+    return (not (plan["added"] or plan["changed"] or plan["removed"])
+            and not manifest_changed(manifest, previous_manifest))
+
+
+def write_delta_zip(out, file_map, plan, manifest, log=print, governor=None):
+    """Write a delta package and return a size report comparing it with the full build."""
+    flavor = manifest.get('mod', {}).get('flavor', {})
+    info = {
+        "parent_hash": flavor.get('parent_hash'),
+        "hash": flavor.get('hash'),
+        "added": plan["added"],
+        "changed": plan["changed"],
+        "removed": plan["removed"],
+    }
+    members = {rel: file_map[rel] for rel in plan["added"] + plan["changed"]}
+    members[DELTA_INFO_NAME] = manifest_to_json(info).encode("utf-8")
+    write_mod_zip(out, members, manifest_to_json(manifest), log=log, governor=governor)
+
+    full_bytes = sum(source_size(file_map[rel]) for rel in plan["added"] + plan["changed"] + plan["unchanged"])
+    delta_bytes = sum(source_size(file_map[rel]) for rel in plan["added"] + plan["changed"])
+    return {
+        "full_files": len(plan["added"]) + len(plan["changed"]) + len(plan["unchanged"]),
+        "full_bytes": full_bytes,
+        "delta_files": len(plan["added"]) + len(plan["changed"]),
+        "delta_bytes": delta_bytes,
+        "removed_files": len(plan["removed"]),
+        "archive_bytes": os.path.getsize(out),
+    }
@@ -0,0 +1,158 @@
+"""
+Folder export helpers shared by "Export folder (Load unpacked)" and watch mode.
+Assets can be placed as real copies or, for local testing, as reflink clones,
+hardlinks or symlinks so big videos are not duplicated on every export.
+In "store" mode they are linked from the shared asset store (libs/store.py).
+"""
+
+import os
+import errno
+import shutil
+
+from .lib import ensure_dir, manifest_to_json, iter_source_chunks, source_exists, ZipMember
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# "auto" tries reflink -> hardlink -> symlink -> copy
+LINK_MODES = ("copy", "auto", "reflink", "hardlink", "symlink", "store")
+LINK_FALLBACKS = {
+    "copy": ("copy",),
+    "auto": ("reflink", "hardlink", "symlink", "copy"),
+    "reflink": ("reflink", "copy"),
+    "hardlink": ("hardlink", "copy"),
+    "symlink": ("symlink", "copy"),
+    # store blobs are read-only and survive gc while linked, so no symlinks
+    "store": ("reflink", "hardlink", "copy"),
+}
+
+# _IOW(0x94, 9, int) from linux/fs.h
+FICLONE = 0x40049409
+
+
+def _reflink(src, dest):
+    """Clone src's extents into dest (btrfs, XFS, ...); raises OSError where unsupported."""
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, "reflink not supported")
+    with open(src, "rb") as fs, open(dest, "wb") as fd:
+        fcntl.ioctl(fd.fileno(), FICLONE, fs.fileno())
+    shutil.copystat(src, dest)
+
+
+def _copy(src, dest, governor=None):
+    """Real copy; in-kernel via copy_file_range where available (which also shares extents on
+    filesystems that support it), shutil.copy2 otherwise. A governor copies in throttled chunks."""
+    if governor is not None:
+        governor.copy(src, dest)
+        return
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, "rb") as fs, open(dest, "wb") as fd:
+                left = os.fstat(fs.fileno()).st_size
+                while left > 0:
+                    n = os.copy_file_range(fs.fileno(), fd.fileno(), left)
+                    if n == 0:
+                        break
+                    left -= n
+            if left <= 0:
+                shutil.copystat(src, dest)
+                return
+        except OSError:
+            pass
+    shutil.copy2(src, dest)
+
+
+def _remove_quiet(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def place_file(src, dest, mode="copy", governor=None):
+    """Put src at dest using the cheapest method `mode` allows. Returns the method used."""
+    # never write through an old link from a previous export: it may point at the source itself
+    if os.path.lexists(dest):
+        os.remove(dest)
+    for method in LINK_FALLBACKS.get(mode, ("copy",)):
+        try:
+            if method == "reflink":
+                _reflink(src, dest)
+            elif method == "hardlink":
+                os.link(src, dest)
+            elif method == "symlink":
+                os.symlink(os.path.abspath(src), dest)
+            else:
+                _copy(src, dest, governor)
+            return method
+        except (OSError, NotImplementedError):
+            if method == "copy":
+                raise
+            _remove_quiet(dest)
+    return None
+
+
+def write_folder_member(out, rel, src, log=print, link_mode="copy", store=None, governor=None):
+    """Write one files_to_include entry under `out`. Returns False if the source is missing."""
+    if governor is not None:
+        with governor.file():
+            return _write_folder_member(out, rel, src, log, link_mode, store, governor)
+    return _write_folder_member(out, rel, src, log, link_mode, store, governor)
+
+
+def _write_folder_member(out, rel, src, log, link_mode, store, governor):
+    dest = os.path.join(out, rel)
+    ensure_dir(os.path.dirname(dest))
+    if link_mode == "store" and store is not None and not isinstance(src, (bytes, bytearray)):
+        blob = store.add(src)
+        if blob is None:
+            log(f"WARNING: missing source {src} (skipped)")
+            return False
+        method = place_file(blob, dest, link_mode, governor)
+        log(f"{'Copied' if method == 'copy' else method.capitalize() + 'ed'} {src} -> {rel} (store)")
+        return True
+    if isinstance(src, (bytes, bytearray)):
+        if os.path.lexists(dest):
+            os.remove(dest)
+        with open(dest, "wb") as fw:
+            (governor.wrap(fw) if governor else fw).write(src)
+        log(f"Wrote generated bytes -> {rel}")
+        return True
+    if isinstance(src, ZipMember):
+        if not source_exists(src):
+            log(f"WARNING: missing source {src} (skipped)")
+            return False
+        if os.path.lexists(dest):
+            os.remove(dest)
+        with open(dest, "wb") as fw:
+            fw = governor.wrap(fw) if governor else fw
+            for buf in iter_source_chunks(src):
+                fw.write(buf)
+        log(f"Extracted {src} -> {rel}")
+        return True
+    if os.path.exists(src):
+        method = place_file(src, dest, link_mode, governor)
+        log(f"{'Copied' if method == 'copy' else method.capitalize() + 'ed'} {src} -> {rel}")
+        return True
+    log(f"WARNING: missing source {src} (skipped)")
+    return False
+
+
+def write_folder_manifest(out, manifest):
+    text = manifest_to_json(manifest)
+    path = os.path.join(out, "manifest.json")
+    if os.path.islink(path):
+        os.remove(path)
+    with open(path, "w", encoding="utf-8") as mf:
+        mf.write(text)
+    return text
+
+
+def write_folder_export(out, file_map, manifest, log=print, link_mode="copy", store=None, governor=None):
+    for rel, src in sorted(file_map.items()):
+        write_folder_member(out, rel, src, log, link_mode, store, governor)
+    if link_mode == "store" and store is not None:
+        store.set_refs(out, store.object_map(file_map), manifest.get('name'))
+    return write_folder_manifest(out, manifest)
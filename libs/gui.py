@@ -4,15 +4,171 @@ Imports helpers and constants from libs.lib.
 """
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import json, os, shutil, zipfile
+import json, os, shutil, time, zipfile, base64, copy, queue, threading
 from functools import partial
 
 from .lib import (
     APP_TITLE, THEME_STYLES, BROWSER_EVENT_PRESETS, KEYBOARD_EVENT_PRESETS,
-    CURSOR_PRESETS, md5_bytes, compute_payload_hash, ensure_dir,
-    is_nonempty_list_of_dicts, collect_referenced_paths_from_payload,
-    SILENT_MP3_BYTES
+    CURSOR_PRESETS, md5_bytes, PayloadHasher, flavor_files,
+    is_nonempty_list_of_dicts, SILENT_MP3_BYTES, manifest_to_json, ZipMember
 )
+from .schema import SCHEMA, SECTIONS, PAYLOAD_KEYS, referenced_paths, validate_payload
+from .cache import DigestIndex, BuildCache, build_signature
+from .ziputil import write_mod_zip, update_mod_zip
+from .delta import read_previous_build, previous_flavor_hash, plan_delta, delta_is_empty, write_delta_zip
+from .export import write_folder_export, LINK_MODES
+from .watch import SourceWatcher, LiveSync
+from .matrix import load_matrix, build_matrix
+from .analyze import (analyze_sizes, budget_issues, format_report, format_bytes, save_size_budgets,
+                      budget_overrides, merge_size_budgets, load_size_budget_overrides, DEFAULT_SIZE_BUDGETS)
+from .store import AssetStore, format_usage
+from .history import History
+from .journal import Journal, FSYNC_INTERVAL_MS
+from .server import serve_in_thread, UPDATE_MANIFEST_NAME
+from .thumbs import ThumbnailCache, is_thumbnail_source
+from .matcher import compile_page_styles, run_match_report, format_match_report, read_url_list, extract_urls
+from .verify import record_digests, verify_export
+from .relink import find_relinks, missing_sources
+from .stages import EXPORT_STAGES, DEFAULT_STAGES, StageContext, run_export_stages
+from .throttle import IOGovernor
+from .bulk import scan_convention_folder, unique_dest, summarize, AUDIO_EXTS, CURSOR_EXTS
+
+# how often a running governed export passes on its log and status (ms)
+EXPORT_POLL_MS = 200
+
+# payload sections whose tabs show image thumbnails next to the list
+THUMB_SECTIONS = ("app_icon", "cursors", "mobile_image_overrides", "wallpaper")
+
+
+class ThumbnailPanel:
+    """Scrollable grid of thumbnails; only cells scrolled into view are requested from the cache."""
+    PAD = 6
+    LABEL_H = 14
+    POLL_MS = 30
+
+    def __init__(self, parent, cache, width=240):
+        self.cache = cache
+        self.cell_w = cache.size + 2 * self.PAD
+        self.cell_h = cache.size + self.LABEL_H + 2 * self.PAD
+        self.frame = ttk.Frame(parent)
+        self.canvas = tk.Canvas(self.frame, width=width, highlightthickness=0)
+        sb = ttk.Scrollbar(self.frame, orient="vertical", command=self.yview)
+        self.canvas.configure(yscrollcommand=sb.set)
+        sb.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.canvas.bind("<Configure>", lambda e: self.layout())
+        for seq in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.canvas.bind(seq, self.on_wheel)
+        self.items = []      # (label, source or None)
+        self.cols = 1
+        self.drawn = set()
+        self.images = {}     # index -> PhotoImage, or None if it can't be shown
+        self.futures = {}    # index -> pending ThumbnailCache request
+        self.polling = False
+
+    def set_items(self, items):
+        items = list(items)
+        if items == self.items:
+            return
+        for fut in self.futures.values():
+            fut.cancel()
+        self.items, self.images, self.futures = items, {}, {}
+        self.canvas.yview_moveto(0)
+        self.layout()
+
+    def layout(self):
+        c = self.canvas
+        c.delete("all")
+        self.drawn = set()
+        self.cols = max(1, c.winfo_width() // self.cell_w)
+        rows = (len(self.items) + self.cols - 1) // self.cols
+        c.configure(scrollregion=(0, 0, self.cols * self.cell_w, rows * self.cell_h))
+        if not self.items:
+            c.create_text(self.PAD, self.PAD, anchor="nw", text="No images", fill="gray")
+        self.load_visible()
+
+    def yview(self, *args):
+        self.canvas.yview(*args)
+        self.load_visible()
+
+    def on_wheel(self, event):
+        up = getattr(event, "num", 0) == 4 or getattr(event, "delta", 0) > 0
+        self.canvas.yview_scroll(-1 if up else 1, "units")
+        self.load_visible()
+
+    def visible_range(self):
+        c = self.canvas
+        top, bottom = c.canvasy(0), c.canvasy(c.winfo_height())
+        first = int(top // self.cell_h) * self.cols
+        # one row of lookahead below the fold
+        last = (int(bottom // self.cell_h) + 2) * self.cols
+        return max(0, first), min(len(self.items), last)
+
+    def load_visible(self):
+        first, last = self.visible_range()
+        # cells scrolled away before a worker got to them are not decoded
+        for i in [i for i in self.futures if not first <= i < last]:
+            if self.futures[i].cancel():
+                del self.futures[i]
+        for i in range(first, last):
+            if i not in self.drawn:
+                self.drawn.add(i)
+                self.draw_cell(i)
+            src = self.items[i][1]
+            if src is not None and i not in self.images and i not in self.futures:
+                self.futures[i] = self.cache.request(src)
+        if self.futures and not self.polling:
+            self.polling = True
+            self.canvas.after(self.POLL_MS, self.poll)
+
+    def cell_center(self, i):
+        s = self.cache.size
+        return (i % self.cols) * self.cell_w + self.PAD + s // 2, (i // self.cols) * self.cell_h + self.PAD + s // 2
+
+    def draw_cell(self, i):
+        label, src = self.items[i]
+        c, h = self.canvas, self.cache.size // 2
+        x, y = self.cell_center(i)
+        c.create_rectangle(x - h, y - h, x + h, y + h, outline="gray")
+        name = label if len(label) <= 12 else label[:11] + "\u2026"
+        c.create_text(x, y + h + 2, anchor="n", text=name, fill="gray", font=("Helvetica", 8))
+        if src is None:
+            c.create_text(x, y, text="missing", fill="red")
+        elif i in self.images:
+            self.place_image(i)
+
+    def place_image(self, i):
+        x, y = self.cell_center(i)
+        img = self.images[i]
+        if img is None:
+            self.canvas.create_text(x, y, text="?", fill="gray")
+        else:
+            self.canvas.create_image(x, y, image=img)
+
+    def poll(self):
+        for i, fut in list(self.futures.items()):
+            if not fut.done():
+                continue
+            del self.futures[i]
+            try:
+                png = b"" if fut.cancelled() else fut.result()
+            except Exception:
+                # a failed load is shown like an undecodable image; polling must go on
+                png = b""
+            img = None
+            if png:
+                try:
+                    img = tk.PhotoImage(master=self.canvas, data=base64.b64encode(png).decode("ascii"))
+                except tk.TclError:
+                    img = None
+            self.images[i] = img
+            if i in self.drawn:
+                self.place_image(i)
+        if self.futures:
+            self.canvas.after(self.POLL_MS, self.poll)
+        else:
+            self.polling = False
+
 
 class GXModBuilder:
     def __init__(self, root):
@@ -25,15 +181,51 @@ class GXModBuilder:
         self.style = ttk.Style()
         self.style.theme_use('clam')
 
-        # relpath -> src path or bytes
-        self.files_to_include = {}
+        # undo/redo of payload and file registrations; a step closes once Tk is idle again
+        self.history = History(schedule=root.after_idle)
 
-        # core data structure: mod payload (schema v2-ish)
-        payload_keys = [
-            'app_icon','background_music','browser_sounds','keyboard_sounds','cursors','fonts',
-            'mobile_image_overrides','splash_screen','theme','wallpaper','page_styles'
-        ]
-        empty_payload = {k: [] for k in payload_keys}
+        # relpath -> src path or bytes
+        self.files_to_include = self.history.track({}, "files")
+
+        # autosave journal (crash recovery), see libs/journal.py
+        self.journal = Journal()
+        self.history.listeners.append(self.journal_step)
+        self._journal_info = None
+
+        # source digests (memoized by size/mtime) and finished-archive cache
+        self.digests = DigestIndex()
+        self.build_cache = BuildCache()
+        # shared content-addressed asset store, used by the "store" link mode
+        self.asset_store = AssetStore(digests=self.digests)
+        # export stages (CSS bundling ...), see libs/stages.py
+        self.stage_ctx = StageContext(self.digests, log=self.log_validator)
+        # flavor hash with per-file checkpoints; only edited files (and later ones) are re-read
+        self.payload_hasher = PayloadHasher()
+
+        # per-section size budgets (estimated compressed bytes), see libs/analyze.py
+        # the user's overrides as saved (0 / null switch a default off) and the budgets in effect
+        self.size_budget_overrides = load_size_budget_overrides()
+        self.size_budgets = merge_size_budgets(self.size_budget_overrides)
+        self.budget_check = None
+
+        # watch mode (live sync into an export folder)
+        self.watcher = None
+        self.live_sync = None
+
+        # governed export running on its own thread (see run_export)
+        self.export_thread = None
+
+        # local update server (libs/server.py)
+        self.update_server = None
+
+        # image thumbnails (libs/thumbs.py), shown next to the lists of THUMB_SECTIONS
+        self.thumbs = ThumbnailCache(digests=self.digests)
+        self.thumb_panels = {}
+        self._thumbs_dirty = False
+        self.history.listeners.append(self.thumbs_step)
+
+        # core data structure: mod payload (schema v2-ish), sections declared in libs/schema.py
+        empty_payload = self.history.track({k: [] for k in PAYLOAD_KEYS}, "payload")
 
         self.data = {
             "name": "GX Mod",
@@ -42,7 +234,7 @@ class GXModBuilder:
             "developer": {"name": ""},
             "icons": {"512": "icon_512.png"},
             "manifest_version": 3,
-            "mod": {"schema_version": 2, "payload": empty_payload},
+            "mod": self.history.track({"schema_version": 2, "payload": empty_payload}, "mod"),
             "update_url": ""
         }
 
@@ -53,6 +245,9 @@ class GXModBuilder:
         self.build_ui()
         self.apply_theme() # Initial theme
 
+        root.protocol("WM_DELETE_WINDOW", self.on_close)
+        root.after(100, self.offer_session_restore)
+
     def create_toolbar(self):
         """Creates the top bar with the Dark/Light toggle."""
         toolbar = ttk.Frame(self.root)
@@ -64,6 +259,11 @@ class GXModBuilder:
         btn.pack(side="right", padx=5, pady=2)
 
         ttk.Label(toolbar, text=APP_TITLE, font=("Helvetica", 12, "bold")).pack(side="left", padx=5)
+        ttk.Button(toolbar, text="Undo", command=self.undo).pack(side="left", padx=(15, 2))
+        ttk.Button(toolbar, text="Redo", command=self.redo).pack(side="left", padx=2)
+        self.root.bind_all("<Control-z>", lambda e: self.undo())
+        self.root.bind_all("<Control-y>", lambda e: self.redo())
+        self.root.bind_all("<Control-Z>", lambda e: self.redo())
 
     def toggle_theme(self):
         """Switches between Dark and Light mode and updates the UI."""
@@ -165,14 +365,18 @@ class GXModBuilder:
         ttk.Label(f, text="Import manifest.json and auto-register files (looks relative to manifest)").pack(anchor="w")
         btn_frame = ttk.Frame(f); btn_frame.pack(fill="x", pady=8)
         ttk.Button(btn_frame, text="Import manifest.json", command=self.import_manifest).pack(side="left")
+        ttk.Button(btn_frame, text="Import mod ZIP", command=self.import_mod_zip).pack(side="left", padx=8)
         ttk.Button(btn_frame, text="Auto-scan folder for referenced files", command=self.auto_register_from_manifest_folder).pack(side="left", padx=8)
+        ttk.Button(btn_frame, text="Relink moved files", command=self.relink_missing_files).pack(side="left", padx=8)
         self.widgets['import_log'] = tk.Text(f, height=18); self.widgets['import_log'].pack(fill="both", expand=True)
 
     # App icons tab
     def build_app_icon_tab(self, parent):
         f = ttk.Frame(parent, padding=8); f.pack(fill="both", expand=True)
         ttk.Label(f, text="App icons (app_icon array)").pack(anchor="w")
-        self.widgets['app_icon_list'] = tk.Listbox(f, height=8); self.widgets['app_icon_list'].pack(fill="both", expand=True)
+        body = ttk.Frame(f); body.pack(fill="both", expand=True)
+        self.widgets['app_icon_list'] = tk.Listbox(body, height=8); self.widgets['app_icon_list'].pack(side="left", fill="both", expand=True)
+        self.add_thumbnail_panel(body, 'app_icon')
         rb = ttk.Frame(f); rb.pack(fill="x", pady=6)
         ttk.Button(rb, text="Add App Icon", command=self.add_app_icon).pack(side="left")
         ttk.Button(rb, text="Edit Selected", command=self.edit_app_icon).pack(side="left", padx=6)
@@ -198,6 +402,7 @@ class GXModBuilder:
         rb = ttk.Frame(f); rb.pack(fill="x", pady=6)
         ttk.Button(rb, text="Add Pack", command=partial(self.add_sound_pack, pack_key)).pack(side="left")
         ttk.Button(rb, text="Add event-file(s) to selected", command=partial(self.add_event_files, pack_key, folder)).pack(side="left", padx=6)
+        ttk.Button(rb, text="Bulk import folder", command=partial(self.bulk_import_sounds, pack_key, folder)).pack(side="left", padx=6)
         ttk.Button(rb, text="Edit Selected pack JSON", command=partial(self.edit_pack_json, pack_key)).pack(side="left", padx=6)
         ttk.Button(rb, text="Remove Selected", command=partial(self.remove_list_selection, pack_key)).pack(side="left", padx=6)
 
@@ -205,10 +410,13 @@ class GXModBuilder:
     def build_cursors_tab(self, parent):
         f = ttk.Frame(parent, padding=8); f.pack(fill="both", expand=True)
         ttk.Label(f, text="Cursor packs").pack(anchor="w")
-        self.widgets['cursors_list'] = tk.Listbox(f, height=8); self.widgets['cursors_list'].pack(fill="both", expand=True)
+        body = ttk.Frame(f); body.pack(fill="both", expand=True)
+        self.widgets['cursors_list'] = tk.Listbox(body, height=8); self.widgets['cursors_list'].pack(side="left", fill="both", expand=True)
+        self.add_thumbnail_panel(body, 'cursors')
         rb = ttk.Frame(f); rb.pack(fill="x", pady=6)
         ttk.Button(rb, text="Add Cursor Pack", command=self.add_cursor_pack).pack(side="left")
         ttk.Button(rb, text="Add cursor files to selected", command=self.add_cursor_files).pack(side="left", padx=6)
+        ttk.Button(rb, text="Bulk import folder", command=self.bulk_import_cursors).pack(side="left", padx=6)
         ttk.Button(rb, text="Remove selected", command=partial(self.remove_list_selection, 'cursors')).pack(side="left", padx=6)
 
     # Fonts
@@ -225,7 +433,9 @@ class GXModBuilder:
     def build_mobile_tab(self, parent):
         f = ttk.Frame(parent, padding=8); f.pack(fill="both", expand=True)
         ttk.Label(f, text="Mobile image overrides (mobile_image_overrides)").pack(anchor="w")
-        self.widgets['mobile_list'] = tk.Listbox(f, height=6); self.widgets['mobile_list'].pack(fill="both", expand=True)
+        body = ttk.Frame(f); body.pack(fill="both", expand=True)
+        self.widgets['mobile_list'] = tk.Listbox(body, height=6); self.widgets['mobile_list'].pack(side="left", fill="both", expand=True)
+        self.add_thumbnail_panel(body, 'mobile_image_overrides')
         rb = ttk.Frame(f); rb.pack(fill="x", pady=6)
         ttk.Button(rb, text="Add Mobile Override", command=self.add_mobile_override).pack(side="left")
         ttk.Button(rb, text="Remove selected", command=partial(self.remove_list_selection, 'mobile_image_overrides')).pack(side="left", padx=6)
@@ -253,7 +463,9 @@ class GXModBuilder:
     def build_wallpaper_tab(self, parent):
         f = ttk.Frame(parent, padding=8); f.pack(fill="both", expand=True)
         ttk.Label(f, text="Wallpaper entries").pack(anchor="w")
-        self.widgets['wp_list'] = tk.Listbox(f, height=8); self.widgets['wp_list'].pack(fill="both", expand=True)
+        body = ttk.Frame(f); body.pack(fill="both", expand=True)
+        self.widgets['wp_list'] = tk.Listbox(body, height=8); self.widgets['wp_list'].pack(side="left", fill="both", expand=True)
+        self.add_thumbnail_panel(body, 'wallpaper')
         rb = ttk.Frame(f); rb.pack(fill="x", pady=6)
         ttk.Button(rb, text="Add Wallpaper Entry", command=self.add_wallpaper).pack(side="left")
         ttk.Button(rb, text="Edit selected", command=partial(self.edit_wallpaper)).pack(side="left", padx=6)
@@ -268,6 +480,7 @@ class GXModBuilder:
         ttk.Button(rb, text="Add Page Style", command=self.add_page_style).pack(side="left")
         ttk.Button(rb, text="Edit selected", command=partial(self.edit_page_style)).pack(side="left", padx=6)
         ttk.Button(rb, text="Remove selected", command=partial(self.remove_list_selection, 'page_styles')).pack(side="left", padx=6)
+        ttk.Button(rb, text="Match tester", command=self.open_match_tester).pack(side="left", padx=6)
 
     # Files tab
     def build_files_tab(self, parent):
@@ -296,10 +509,83 @@ class GXModBuilder:
         ttk.Button(rb, text="Run Validation", command=self.run_validation).pack(side="left")
         ttk.Button(rb, text="Auto-Fix detected problems", command=self.autofix_all).pack(side="left", padx=6)
         ttk.Button(rb, text="Preview manifest.json", command=self.preview_manifest).pack(side="left", padx=6)
+        ttk.Button(rb, text="Analyze sizes", command=self.analyze_mod_size).pack(side="left", padx=6)
+        ttk.Button(rb, text="Size budgets", command=self.edit_size_budgets).pack(side="left", padx=6)
         ttk.Button(rb, text="Export folder (Load unpacked)", command=self.export_folder).pack(side="left", padx=6)
         ttk.Button(rb, text="Export ZIP", command=self.export_zip).pack(side="left", padx=6)
+        ttk.Button(rb, text="Export delta update", command=self.export_delta).pack(side="left", padx=6)
+        ttk.Button(rb, text="Build variant matrix", command=self.export_matrix).pack(side="left", padx=6)
+        ttk.Button(rb, text="Asset store", command=self.show_asset_store).pack(side="left", padx=6)
+        self.watch_btn_text = tk.StringVar(value="Start watch (live sync)")
+        ttk.Button(rb, textvariable=self.watch_btn_text, command=self.toggle_watch).pack(side="left", padx=6)
+        self.serve_btn_text = tk.StringVar(value="Serve builds locally")
+        ttk.Button(rb, textvariable=self.serve_btn_text, command=self.toggle_update_server).pack(side="left", padx=6)
+        opts = ttk.Frame(f); opts.pack(fill="x")
+        ttk.Label(opts, text="Folder export link mode:").pack(side="left")
+        self.widgets['link_mode'] = tk.StringVar(value="copy")
+        ttk.Combobox(opts, textvariable=self.widgets['link_mode'], values=LINK_MODES, state="readonly", width=10).pack(side="left", padx=6)
+        ttk.Label(opts, text="(auto = reflink, else hardlink, else symlink, else copy; store = link from the shared asset store; links are for local testing only)").pack(side="left")
+        stages = ttk.Frame(f); stages.pack(fill="x", pady=(4, 0))
+        ttk.Label(stages, text="Export stages:").pack(side="left")
+        for name, label, _ in EXPORT_STAGES:
+            self.widgets[f'stage_{name}'] = tk.BooleanVar(value=name in DEFAULT_STAGES)
+            ttk.Checkbutton(stages, text=label, variable=self.widgets[f'stage_{name}']).pack(side="left", padx=6)
+        self.widgets['verify_export'] = tk.BooleanVar(value=False)
+        ttk.Checkbutton(stages, text="Verify output after export", variable=self.widgets['verify_export']).pack(side="right", padx=6)
+        self.widgets['zip_update'] = tk.BooleanVar(value=False)
+        ttk.Checkbutton(stages, text="Update existing ZIP in place", variable=self.widgets['zip_update']).pack(side="right", padx=6)
+        io = ttk.Frame(f); io.pack(fill="x", pady=(4, 0))
+        ttk.Label(io, text="Export I/O limit (MB/s, 0 = none):").pack(side="left")
+        self.widgets['io_limit'] = tk.StringVar(value="0")
+        ttk.Entry(io, textvariable=self.widgets['io_limit'], width=6).pack(side="left", padx=6)
+        ttk.Label(io, text="Max files in flight (0 = no cap):").pack(side="left")
+        self.widgets['io_in_flight'] = tk.StringVar(value="0")
+        ttk.Spinbox(io, from_=0, to=64, textvariable=self.widgets['io_in_flight'], width=4).pack(side="left", padx=6)
+        self.widgets['io_low_priority'] = tk.BooleanVar(value=False)
+        ttk.Checkbutton(io, text="Low I/O priority", variable=self.widgets['io_low_priority']).pack(side="left", padx=6)
+        self.widgets['io_status'] = tk.StringVar(value="")
+        ttk.Label(io, textvariable=self.widgets['io_status']).pack(side="left", padx=6)
         self.widgets['validator_log'] = tk.Text(f, height=18); self.widgets['validator_log'].pack(fill="both", expand=True, pady=6)
 
+    # Thumbnail panels
+    def add_thumbnail_panel(self, parent, payload_key):
+        panel = ThumbnailPanel(parent, self.thumbs)
+        panel.frame.pack(side="right", fill="y", padx=(6, 0))
+        self.thumb_panels[payload_key] = panel
+        self.widgets[SECTIONS[payload_key].listbox].bind(
+            "<<ListboxSelect>>", lambda e: self.refresh_thumbnails(payload_key))
+
+    def thumbnail_items(self, payload_key):
+        """(file name, source) of each image of the selected entries, or of all entries if none is selected."""
+        section = SECTIONS[payload_key]
+        val = self.data['mod']['payload'].get(payload_key)
+        if section.wrap_dict and isinstance(val, dict):
+            val = [val]
+        entries = [e for e in val if isinstance(e, dict)] if isinstance(val, list) else []
+        sel = self.widgets[section.listbox].curselection()
+        if sel:
+            entries = [entries[i] for i in sel if i < len(entries)]
+        return [(os.path.basename(rel), self.files_to_include.get(rel))
+                for e in entries for rel in section.extract_entry(e) if is_thumbnail_source(rel)]
+
+    def refresh_thumbnails(self, payload_key):
+        panel = self.thumb_panels.get(payload_key)
+        if panel is not None:
+            panel.set_items(self.thumbnail_items(payload_key))
+
+    def thumbs_step(self, step):
+        """History listener: redraw the panels of the sections (or files) a step touched, once Tk is idle."""
+        if self._thumbs_dirty or not self.thumb_panels:
+            return
+        if any(root == "files" or (root == "payload" and key in self.thumb_panels) for root, key in step.touched()):
+            self._thumbs_dirty = True
+            self.root.after_idle(self._refresh_all_thumbnails)
+
+    def _refresh_all_thumbnails(self):
+        self._thumbs_dirty = False
+        for key in self.thumb_panels:
+            self.refresh_thumbnails(key)
+
     # ---------------- Functional helpers ----------------
     def register_file(self, relpath, var=None):
         p = filedialog.askopenfilename()
@@ -336,7 +622,7 @@ class GXModBuilder:
         self.files_to_include[dest] = p
         entry = {"id": id_, "name": name, "path": dest}
         self.data['mod']['payload'].setdefault('app_icon', []).append(entry)
-        self.widgets['app_icon_list'].insert("end", f"{id_} : {name} -> {dest}")
+        self.widgets['app_icon_list'].insert("end", self.list_row('app_icon', entry))
 
     def edit_app_icon(self):
         sel = self.widgets['app_icon_list'].curselection()
@@ -352,7 +638,7 @@ class GXModBuilder:
         if not dlg: return
         entry = {"id": dlg['id'], "name": dlg['name'], "tracks": []}
         self.data['mod']['payload'].setdefault('background_music', []).append(entry)
-        self.widgets['bgmusic_list'].insert("end", f"{dlg['id']} : {dlg['name']}")
+        self.widgets['bgmusic_list'].insert("end", self.list_row('background_music', entry))
 
     def add_tracks_to_bg_music(self):
         sel = self.widgets['bgmusic_list'].curselection()
@@ -381,7 +667,7 @@ class GXModBuilder:
         self.data['mod']['payload'].setdefault(pack_key, []).append(pack)
         lb = self.widgets.get(f'{pack_key}_listbox')
         if lb:
-            lb.insert("end", f"{dlg['id']} : {dlg['name']}")
+            lb.insert("end", self.list_row(pack_key, pack))
 
     def add_event_files(self, pack_key, dest_folder):
         lb = self.widgets.get(f'{pack_key}_listbox')
@@ -424,6 +710,54 @@ class GXModBuilder:
             self.log_import(f"Registered sound {f} -> {dest} for event {ev}")
         self.update_pack_listbox(pack_key)
 
+    def scan_bulk_folder(self, title, dest_folder, presets, exts):
+        """Ask for a convention folder and scan it; returns (pack name, matches) once the user confirmed."""
+        folder = filedialog.askdirectory(title=title)
+        if not folder: return None, None
+        name = os.path.basename(folder.rstrip("/\\"))
+        # the mod root may be picked instead of the sounds/cursors folder itself
+        sub = os.path.join(folder, dest_folder)
+        if os.path.isdir(sub):
+            folder = sub
+        matches, unmatched = scan_convention_folder(folder, presets, exts)
+        if not matches:
+            messagebox.showwarning("Bulk import", f"No files in {folder} match a known name.\n\n"
+                                   + summarize(matches, unmatched))
+            return None, None
+        count = sum(len(v) for v in matches.values())
+        if not messagebox.askyesno("Bulk import", f"Import {count} file(s) for {len(matches)} type(s)?\n\n"
+                                   + summarize(matches, unmatched)):
+            return None, None
+        for u in unmatched:
+            self.log_import(f"Bulk import: no preset matches {u} (skipped)")
+        return name, matches
+
+    def bulk_target_pack(self, key, listbox, id_prefix, name, empty):
+        """Selected pack of a section, or a new one named after the imported folder."""
+        packs = self.data['mod']['payload'].setdefault(key, [])
+        sel = self.widgets[listbox].curselection()
+        if sel:
+            return packs[sel[0]]
+        pack = {"id": self.generate_auto_id(id_prefix, packs), "name": name}
+        pack.update(empty)
+        packs.append(pack)
+        return packs[-1]
+
+    def bulk_import_sounds(self, pack_key, dest_folder):
+        presets = BROWSER_EVENT_PRESETS if pack_key == 'browser_sounds' else KEYBOARD_EVENT_PRESETS
+        name, matches = self.scan_bulk_folder("Select sound pack folder", dest_folder, presets, AUDIO_EXTS)
+        if not matches: return
+        pack = self.bulk_target_pack(pack_key, f'{pack_key}_listbox', pack_key, name, {"sounds": {}})
+        for ev, files in sorted(matches.items()):
+            arr = pack.setdefault('sounds', {}).setdefault(ev, [])
+            for f in files:
+                dest = unique_dest(dest_folder, os.path.basename(f), ev, f, self.files_to_include)
+                self.files_to_include[dest] = f
+                if dest not in arr:
+                    arr.append(dest)
+            self.log_import(f"Bulk import: {len(files)} sound(s) for event {ev}")
+        self.update_pack_listbox(pack_key)
+
     def edit_pack_json(self, pack_key):
         lb = self.widgets.get(f'{pack_key}_listbox')
         if not lb: return
@@ -441,7 +775,7 @@ class GXModBuilder:
             return
         lb.delete(0, "end")
         for p in self.data['mod']['payload'].get(pack_key, []):
-            lb.insert("end", f"{p.get('id','?')} : {p.get('name','')}")
+            lb.insert("end", self.list_row(pack_key, p))
 
     # Cursors
     def add_cursor_pack(self):
@@ -450,7 +784,7 @@ class GXModBuilder:
         if not dlg: return
         pack = {"id": dlg['id'], "name": dlg['name'], "items": [], "preview": None}
         self.data['mod']['payload'].setdefault('cursors', []).append(pack)
-        self.widgets['cursors_list'].insert("end", f"{dlg['id']} : {dlg['name']}")
+        self.widgets['cursors_list'].insert("end", self.list_row('cursors', pack))
 
     def add_cursor_files(self):
         sel = self.widgets['cursors_list'].curselection()
@@ -475,13 +809,27 @@ class GXModBuilder:
             self.log_import(f"Registered cursor {f} -> {dest} type={ctype}")
         self.update_listbox('cursors')
 
+    def bulk_import_cursors(self):
+        name, matches = self.scan_bulk_folder("Select cursor folder", "cursors", CURSOR_PRESETS, CURSOR_EXTS)
+        if not matches: return
+        pack = self.bulk_target_pack('cursors', 'cursors_list', "cursor", name, {"items": [], "preview": None})
+        for ctype, files in sorted(matches.items()):
+            for f in files:
+                dest = unique_dest("cursors", os.path.basename(f), ctype, f, self.files_to_include)
+                self.files_to_include[dest] = f
+                item = {"path": dest, "type": ctype}
+                if item not in pack.setdefault('items', []):
+                    pack['items'].append(item)
+            self.log_import(f"Bulk import: {len(files)} cursor(s) of type {ctype}")
+        self.update_listbox('cursors')
+
     def update_listbox(self, key):
         if key == 'cursors':
             lb = self.widgets.get('cursors_list')
             if not lb: return
             lb.delete(0, "end")
             for p in self.data['mod']['payload'].get('cursors', []):
-                lb.insert("end", f"{p.get('id')} : {p.get('name')} ({len(p.get('items',[]))} items)")
+                lb.insert("end", self.list_row('cursors', p))
 
     # Fonts
     def add_font_pack(self):
@@ -490,7 +838,7 @@ class GXModBuilder:
         if not dlg: return
         pack = {"id": dlg['id'], "name": dlg['name'], "header": {}, "body": {}}
         self.data['mod']['payload'].setdefault('fonts', []).append(pack)
-        self.widgets['fonts_list'].insert("end", f"{dlg['id']} : {dlg['name']}")
+        self.widgets['fonts_list'].insert("end", self.list_row('fonts', pack))
 
     def add_font_files(self):
         sel = self.widgets['fonts_list'].curselection()
@@ -516,7 +864,7 @@ class GXModBuilder:
         if not dlg: return
         entry = {"id": dlg['id'], "name": dlg['name'], "images": {}}
         self.data['mod']['payload'].setdefault('mobile_image_overrides', []).append(entry)
-        self.widgets['mobile_list'].insert("end", f"{dlg['id']} : {dlg['name']}")
+        self.widgets['mobile_list'].insert("end", self.list_row('mobile_image_overrides', entry))
 
     # Splash
     def add_splash(self):
@@ -529,7 +877,7 @@ class GXModBuilder:
         self.files_to_include[dest] = p
         entry = {"id": dlg['id'], "name": dlg['name'], "path": dest}
         self.data['mod']['payload'].setdefault('splash_screen', []).append(entry)
-        self.widgets['splash_list'].insert("end", f"{dlg['id']} : {dlg['name']} -> {dest}")
+        self.widgets['splash_list'].insert("end", self.list_row('splash_screen', entry))
 
     # Theme
     def add_theme(self):
@@ -556,7 +904,7 @@ class GXModBuilder:
             }
         }
         self.data['mod']['payload'].setdefault('theme', []).append(theme_obj)
-        self.widgets['theme_list'].insert("end", f"{dlg['id']} : {dlg['name']}")
+        self.widgets['theme_list'].insert("end", self.list_row('theme', theme_obj))
 
     def edit_theme(self):
         sel = self.widgets['theme_list'].curselection()
@@ -571,7 +919,7 @@ class GXModBuilder:
         if not dlg: return
         obj = {"id": dlg['id'], "name": dlg['name'], "dark": {}, "light": {}}
         self.data['mod']['payload'].setdefault('wallpaper', []).append(obj)
-        self.widgets['wp_list'].insert("end", f"{dlg['id']} : {dlg['name']}")
+        self.widgets['wp_list'].insert("end", self.list_row('wallpaper', obj))
 
     def edit_wallpaper(self):
         sel = self.widgets['wp_list'].curselection()
@@ -616,8 +964,41 @@ class GXModBuilder:
             css_paths.append(dest)
             self.log_import(f"Registered css {fpath} -> {dest}")
         entry = {"css": css_paths, "id": id_ or "", "matches": [m.strip() for m in (matches or "").split(",") if m.strip()], "name": name or ""}
+        for _, pattern, why in compile_page_styles([entry])[1]:
+            self.log_import(f"WARNING: match pattern '{pattern}' is invalid: {why}")
         self.data['mod']['payload'].setdefault('page_styles', []).append(entry)
-        self.widgets['pages_list'].insert("end", f"{entry['id']} : {entry['name']} -> {', '.join(css_paths)}")
+        self.widgets['pages_list'].insert("end", self.list_row('page_styles', entry))
+
+    def open_match_tester(self):
+        """Window to run URLs (pasted or from a history export) against the page_styles patterns."""
+        w = tk.Toplevel(self.root); w.title("Page style match tester")
+        ttk.Label(w, text="URLs (one per line, or load a browsing-history export):").pack(anchor="w", padx=8, pady=(8, 0))
+        urls = tk.Text(w, height=10, width=110); urls.pack(fill="both", expand=True, padx=8)
+        out = tk.Text(w, height=22, width=110); out.pack(fill="both", expand=True, padx=8, pady=(0, 8))
+
+        def load():
+            p = filedialog.askopenfilename(title="URL list or history export",
+                                           filetypes=[("History export", "*.txt *.csv *.json"), ("All", "*.*")])
+            if not p: return
+            try:
+                found = read_url_list(p)
+            except (OSError, ValueError) as e:
+                messagebox.showerror("Match tester", str(e))
+                return
+            urls.delete("1.0", "end")
+            urls.insert("1.0", "\n".join(found))
+
+        def run():
+            found = extract_urls(urls.get("1.0", "end"))
+            t0 = time.perf_counter()
+            report = run_match_report(self.data['mod']['payload'].get('page_styles') or [], found)
+            out.delete("1.0", "end")
+            out.insert("end", "\n".join(format_match_report(report, max_urls=500)) + "\n")
+            out.insert("end", f"({(time.perf_counter() - t0) * 1000:.0f} ms)\n")
+
+        rb = ttk.Frame(w); rb.pack(fill="x", padx=8, pady=(0, 8))
+        ttk.Button(rb, text="Load URL list...", command=load).pack(side="left")
+        ttk.Button(rb, text="Run", command=run).pack(side="left", padx=6)
 
     def edit_page_style(self):
         sel = self.widgets['pages_list'].curselection()
@@ -626,25 +1007,151 @@ class GXModBuilder:
         entry = self.data['mod']['payload']['page_styles'][idx]
         messagebox.showinfo("Page style JSON", json.dumps(entry, indent=2, ensure_ascii=False))
 
+    # ---------- Undo / redo ----------
+    def undo(self):
+        label = self.history.undo()
+        if label:
+            self.refresh_after_history(f"Undid: {label}")
+
+    def redo(self):
+        label = self.history.redo()
+        if label:
+            self.refresh_after_history(f"Redid: {label}")
+
+    def list_row(self, key, entry):
+        """Listbox text of a payload entry: the same whether it was just added, edited or restored."""
+        return SECTIONS[key].row(entry) if isinstance(entry, dict) else str(entry)
+
+    def refresh_after_history(self, msg):
+        """Redraw everything that mirrors the payload / registered files."""
+        payload = self.data['mod']['payload']
+        for section in SCHEMA:
+            lb = self.widgets.get(section.listbox)
+            if not lb:
+                continue
+            lb.delete(0, "end")
+            val = payload.get(section.key)
+            if section.wrap_dict and isinstance(val, dict):
+                val = [val]
+            for entry in (val if isinstance(val, list) else []):
+                lb.insert("end", self.list_row(section.key, entry))
+        self.widgets['icon_entry'].set(str(self.files_to_include.get('icon_512.png', '')))
+        self.widgets['license_entry'].set(str(self.files_to_include.get('license.txt', '')))
+        self.log_import(msg)
+
+    # ---------- Autosave journal ----------
+    def info_fields(self):
+        info = {k: self.widgets[k].get() for k in ("name", "version", "author", "developer", "update_url")}
+        info['description'] = self.widgets['description'].get("1.0", "end-1c")
+        return info
+
+    def session_state(self):
+        mod = self.data['mod']
+        return {
+            "payload": mod['payload'],
+            "files": dict(self.files_to_include),
+            "mod": {k: v for k, v in mod.items() if k != 'payload'},
+            "info": self.info_fields(),
+        }
+
+    def journal_step(self, step):
+        """History listener: journal the new value of every section / file / mod field a step touched."""
+        if not self.journal.enabled:
+            return
+        roots = {"payload": self.data['mod']['payload'], "files": self.files_to_include, "mod": self.data['mod']}
+        changes, removed = {}, {}
+        for root, key in step.touched():
+            if root not in roots or (root == "mod" and key == "payload"):
+                continue
+            if key in roots[root]:
+                changes.setdefault(root, {})[key] = roots[root][key]
+            else:
+                removed.setdefault(root, []).append(key)
+        if changes or removed:
+            self.journal.record(changes, removed)
+
+    def _journal_tick(self):
+        if not self.journal.enabled:
+            return
+        info = self.info_fields()
+        if info != self._journal_info:
+            old = self._journal_info or {}
+            self.journal.record({"info": {k: v for k, v in info.items() if old.get(k) != v}})
+            self._journal_info = info
+        try:
+            self.journal.flush()
+            if self.journal.needs_compaction():
+                self.journal.compact(self.session_state())
+        except OSError as e:
+            self.log_validator(f"Autosave error: {e}")
+        self.root.after(FSYNC_INTERVAL_MS, self._journal_tick)
+
+    def offer_session_restore(self):
+        try:
+            # only a session no running instance holds the lock of is offered
+            orphaned = self.journal.claim()
+        except OSError as e:
+            self.log_import(f"Autosave disabled: {e}")
+            return
+        if orphaned:
+            t0 = time.perf_counter()
+            try:
+                state, replayed = self.journal.load()
+            except Exception as e:
+                state, replayed = None, 0
+                self.log_import(f"Could not read the previous session: {e}")
+            t_load = time.perf_counter() - t0
+            if state and (state['payload'] or state['files'] or replayed) and messagebox.askyesno(
+                    "Restore session", "The builder was not closed properly last time.\n"
+                    f"Restore the previous session ({len(state['files'])} files, {replayed} journaled changes)?"):
+                t0 = time.perf_counter()
+                self.restore_session(state)
+                self.log_import(f"Restored previous session in {(t_load + time.perf_counter() - t0) * 1000:.0f} ms")
+        try:
+            self.journal.start(self.session_state())
+        except OSError as e:
+            self.log_import(f"Autosave disabled: {e}")
+            return
+        self._journal_info = self.info_fields()
+        self.root.after(FSYNC_INTERVAL_MS, self._journal_tick)
+
+    def restore_session(self, state):
+        # a restore is the starting point, not an undoable edit
+        with self.history.untracked():
+            payload = self.data['mod']['payload']
+            payload.clear()
+            payload.update({k: [] for k in PAYLOAD_KEYS})
+            payload.update(state['payload'])
+            for k, v in state['mod'].items():
+                if k != 'payload':
+                    self.data['mod'][k] = v
+            self.files_to_include.clear()
+            self.files_to_include.update(state['files'])
+        for k, v in state['info'].items():
+            if k == 'description':
+                self.widgets['description'].delete("1.0", "end"); self.widgets['description'].insert("1.0", v)
+            elif k in self.widgets:
+                self.widgets[k].set(v)
+        if self.data['mod'].get('key'):
+            self.widgets['key_text'].set("[restored]")
+        self.refresh_after_history("Session restored")
+
+    def on_close(self):
+        if self.watcher is not None:
+            self.stop_watch()
+        if self.update_server is not None:
+            self.update_server.shutdown()
+        self.thumbs.close()
+        self.journal.close()
+        self.digests.save()
+        self.root.destroy()
+
     # Remove helper
     def remove_list_selection(self, payload_key):
-        mapping = {
-            'app_icon': 'app_icon_list',
-            'background_music': 'bgmusic_list',
-            'browser_sounds': 'browser_sounds_listbox',
-            'keyboard_sounds': 'keyboard_sounds_listbox',
-            'cursors': 'cursors_list',
-            'fonts': 'fonts_list',
-            'mobile_image_overrides': 'mobile_list',
-            'splash_screen': 'splash_list',
-            'theme': 'theme_list',
-            'wallpaper': 'wp_list',
-            'page_styles': 'pages_list'
-        }
-        lbname = mapping.get(payload_key)
-        if not lbname:
+        section = SECTIONS.get(payload_key)
+        if not section:
             return
-        lb = self.widgets.get(lbname)
+        lb = self.widgets.get(section.listbox)
         if not lb:
             return
         sel = lb.curselection()
@@ -653,11 +1160,12 @@ class GXModBuilder:
         idx = sel[0]
         lb.delete(idx)
         try:
-            lst = self.data['mod']['payload'].get(payload_key)
-            if isinstance(lst, list):
-                lst.pop(idx)
-                if len(lst) == 0:
-                    self.data['mod']['payload'].pop(payload_key, None)
+            with self.history.step(f"Remove {payload_key}[{idx}]"):
+                lst = self.data['mod']['payload'].get(payload_key)
+                if isinstance(lst, list):
+                    lst.pop(idx)
+                    if len(lst) == 0:
+                        self.data['mod']['payload'].pop(payload_key, None)
             self.log_import(f"Removed {payload_key}[{idx}]")
         except Exception:
             pass
@@ -673,9 +1181,59 @@ class GXModBuilder:
             messagebox.showerror("Import error", f"Failed to read or parse JSON: {e}")
             return
 
-        self.widgets['import_log'].insert("end", f"Loaded manifest: {p}\n")
         base_dir = os.path.dirname(p)
 
+        def resolve(relpath):
+            if os.path.isabs(relpath) and os.path.exists(relpath):
+                return relpath
+            candidate = os.path.join(base_dir, relpath)
+            if os.path.exists(candidate):
+                return candidate
+            candidate2 = os.path.join(base_dir, os.path.basename(relpath))
+            if os.path.exists(candidate2):
+                return candidate2
+            return None
+
+        with self.history.step("Import manifest"):
+            self.load_manifest(m, p, resolve)
+
+    def import_mod_zip(self):
+        """Import a packed mod; its files stay inside the ZIP and are referenced as ZipMember sources."""
+        p = filedialog.askopenfilename(title="Select mod ZIP", filetypes=[("Zip","*.zip")])
+        if not p: return
+        try:
+            with zipfile.ZipFile(p) as zf:
+                names = [n for n in zf.namelist() if not n.endswith("/")]
+                manifests = sorted((n for n in names if n.rsplit("/", 1)[-1] == "manifest.json"), key=len)
+                if not manifests:
+                    messagebox.showerror("Import error", "No manifest.json found in the ZIP.")
+                    return
+                m = json.loads(zf.read(manifests[0]).decode("utf-8"))
+        except Exception as e:
+            messagebox.showerror("Import error", f"Failed to read ZIP: {e}")
+            return
+
+        # mods are sometimes zipped with their folder: resolve paths relative to the manifest
+        prefix = manifests[0][:-len("manifest.json")]
+        name_set = set(names)
+        by_basename = {}
+        for n in names:
+            by_basename.setdefault(n.rsplit("/", 1)[-1], n)
+
+        def resolve(relpath):
+            rel = relpath.replace("\\", "/").lstrip("/")
+            if prefix + rel in name_set:
+                return ZipMember(p, prefix + rel)
+            n = by_basename.get(rel.rsplit("/", 1)[-1])
+            return ZipMember(p, n) if n else None
+
+        with self.history.step("Import mod ZIP"):
+            self.load_manifest(m, f"{p}!{manifests[0]}", resolve)
+
+    def load_manifest(self, m, label, resolve):
+        """Populate the project from a parsed manifest; resolve(relpath) returns a source or None."""
+        self.widgets['import_log'].insert("end", f"Loaded manifest: {label}\n")
+
         # populate top-level info only when meaningful
         name_val = m.get('name')
         if isinstance(name_val, str) and name_val.strip():
@@ -703,196 +1261,57 @@ class GXModBuilder:
 
         def register_if_exists(relpath):
             if not relpath or not isinstance(relpath, str): return False
-            if os.path.isabs(relpath) and os.path.exists(relpath):
-                self.files_to_include[relpath] = relpath; return True
-            candidate = os.path.join(base_dir, relpath)
-            if os.path.exists(candidate):
-                self.files_to_include[relpath] = candidate; return True
-            bn = os.path.basename(relpath)
-            candidate2 = os.path.join(base_dir, bn)
-            if os.path.exists(candidate2):
-                self.files_to_include[relpath] = candidate2; return True
-            return False
+            src = resolve(relpath)
+            if src is None: return False
+            self.files_to_include[relpath] = src; return True
 
         # Import only the sections that exist in the source manifest and are valid
-        # app_icon
-        if 'app_icon' in payload and isinstance(payload.get('app_icon'), list):
-            self.data['mod']['payload'].setdefault('app_icon', [])
-            for a in payload.get('app_icon', []):
-                if isinstance(a, dict):
-                    self.data['mod']['payload']['app_icon'].append(a)
-                    path = a.get('path')
-                    if path and register_if_exists(path):
-                        self.log_import(f"Auto-registered app_icon {path}")
-                    self.widgets['app_icon_list'].insert("end", f"{a.get('id')} : {a.get('name')} -> {a.get('path')}")
-            if not self.data['mod']['payload'].get('app_icon'):
-                self.data['mod']['payload'].pop('app_icon', None)
-
-        # background_music
-        if 'background_music' in payload and isinstance(payload.get('background_music'), list):
-            self.data['mod']['payload'].setdefault('background_music', [])
-            for bg in payload.get('background_music', []):
-                if not isinstance(bg, dict):
-                    continue
-                tracks = []
-                for t in bg.get('tracks', []):
-                    if isinstance(t, str) and register_if_exists(t):
-                        self.log_import(f"Auto-registered bg track {t}")
-                    tracks.append(t)
-                bgobj = {"id": bg.get('id','0'), "name": bg.get('name','Background Music'), "tracks": tracks}
-                self.data['mod']['payload']['background_music'].append(bgobj)
-                self.widgets['bgmusic_list'].insert("end", f"{bgobj['id']} : {bgobj['name']}")
-            if not self.data['mod']['payload'].get('background_music'):
-                self.data['mod']['payload'].pop('background_music', None)
-
-        # browser & keyboard
-        def import_packs(key):
-            if key not in payload or not isinstance(payload.get(key), list):
-                return
-            self.data['mod']['payload'].setdefault(key, [])
-            for pack in payload.get(key, []):
-                if not isinstance(pack, dict):
+        for section in SCHEMA:
+            key = section.key
+            val = payload.get(key)
+            if section.wrap_dict and isinstance(val, dict):
+                val = [val]
+            if not isinstance(val, list):
+                continue
+            entries = []
+            for raw in val:
+                entry = section.normalize(raw)
+                if entry is None:
                     continue
-                sounds = {}
-                for ev, arr in pack.get('sounds', {}).items():
-                    if not isinstance(ev, str) or not isinstance(arr, list):
-                        continue
-                    norm = []
-                    for it in arr:
-                        if isinstance(it, str):
-                            if register_if_exists(it):
-                                self.log_import(f"Auto-registered sound {it}")
-                            norm.append(it)
-                        elif isinstance(it, dict) and 'src' in it and isinstance(it['src'], str):
-                            src = it['src']
-                            if register_if_exists(src):
-                                self.log_import(f"Auto-registered sound {src}")
-                            norm.append(src)
-                    if norm:
-                        sounds[ev] = norm
-                newpack = {"id": pack.get('id','0'), "name": pack.get('name',''), "sounds": sounds}
-                self.data['mod']['payload'][key].append(newpack)
-                lb = self.widgets.get(f'{key}_listbox')
-                if lb: lb.insert("end", f"{newpack['id']} : {newpack['name']}")
-            if not self.data['mod']['payload'].get(key):
+                for pth in section.extract_entry(entry):
+                    if register_if_exists(pth):
+                        self.log_import(f"Auto-registered {key} {pth}")
+                entries.append(entry)
+            if section.import_mode == "replace":
+                target = entries
+            else:
+                target = (self.data['mod']['payload'].get(key) or []) + entries
+            if target:
+                self.data['mod']['payload'][key] = target
+            else:
                 self.data['mod']['payload'].pop(key, None)
-
-        import_packs('browser_sounds')
-        import_packs('keyboard_sounds')
-
-        # cursors
-        if 'cursors' in payload and isinstance(payload.get('cursors'), list):
-            self.data['mod']['payload'].setdefault('cursors', [])
-            for cpack in payload.get('cursors', []):
-                if not isinstance(cpack, dict):
-                    continue
-                self.data['mod']['payload']['cursors'].append(cpack)
-                for item in cpack.get('items', []):
-                    pth = item.get('path')
-                    if pth and register_if_exists(pth):
-                        self.log_import(f"Auto-registered cursor {pth}")
-                self.widgets['cursors_list'].insert("end", f"{cpack.get('id')} : {cpack.get('name')}")
-            if not self.data['mod']['payload'].get('cursors'):
-                self.data['mod']['payload'].pop('cursors', None)
-
-        # fonts
-        if 'fonts' in payload and isinstance(payload.get('fonts', list)):
-            self.data['mod']['payload'].setdefault('fonts', [])
-            for fpack in payload.get('fonts', []):
-                if not isinstance(fpack, dict):
-                    continue
-                self.data['mod']['payload']['fonts'].append(fpack)
-                for part in ('header','body'):
-                    for var in fpack.get(part, {}).get('variants', []):
-                        pth = var.get('path')
-                        if pth and register_if_exists(pth):
-                            self.log_import(f"Auto-registered font {pth}")
-                self.widgets['fonts_list'].insert("end", f"{fpack.get('id')} : {fpack.get('name')}")
-            if not self.data['mod']['payload'].get('fonts'):
-                self.data['mod']['payload'].pop('fonts', None)
-
-        # mobile_image_overrides
-        if 'mobile_image_overrides' in payload and isinstance(payload.get('mobile_image_overrides'), list):
-            self.data['mod']['payload']['mobile_image_overrides'] = payload.get('mobile_image_overrides', [])
-            for mo in self.data['mod']['payload']['mobile_image_overrides']:
-                for v in (mo.get('images') or {}).values():
-                    if v and isinstance(v, str) and "/" in v and register_if_exists(v):
-                        self.log_import(f"Auto-registered mobile image {v}")
-                self.widgets['mobile_list'].insert("end", f"{mo.get('id')} : {mo.get('name')}")
-            if not self.data['mod']['payload'].get('mobile_image_overrides'):
-                self.data['mod']['payload'].pop('mobile_image_overrides', None)
-
-        # splash
-        if 'splash_screen' in payload and isinstance(payload.get('splash_screen'), list):
-            self.data['mod']['payload'].setdefault('splash_screen', [])
-            for sp in payload.get('splash_screen', []):
-                if not isinstance(sp, dict):
-                    continue
-                self.data['mod']['payload']['splash_screen'].append(sp)
-                if sp.get('path') and register_if_exists(sp['path']):
-                    self.log_import(f"Auto-registered splash {sp['path']}")
-                self.widgets['splash_list'].insert("end", f"{sp.get('id')} : {sp.get('name')}")
-            if not self.data['mod']['payload'].get('splash_screen'):
-                self.data['mod']['payload'].pop('splash_screen', None)
-
-        # theme
-        if 'theme' in payload and isinstance(payload.get('theme'), list):
-            self.data['mod']['payload']['theme'] = payload.get('theme', [])
-            for t in self.data['mod']['payload']['theme']:
-                self.widgets['theme_list'].insert("end", f"{t.get('id')} : {t.get('name')}")
-            if not self.data['mod']['payload'].get('theme'):
-                self.data['mod']['payload'].pop('theme', None)
-
-        # wallpaper
-        if 'wallpaper' in payload:
-            wpval = payload.get('wallpaper')
-            if isinstance(wpval, list):
-                self.data['mod']['payload']['wallpaper'] = wpval
-            elif isinstance(wpval, dict):
-                self.data['mod']['payload']['wallpaper'] = [wpval]
-            for w in self.data['mod']['payload'].get('wallpaper', []):
-                for mode in ('dark','light'):
-                    mo = w.get(mode, {})
-                    for k,v in mo.items():
-                        if isinstance(v, str) and "/" in v and register_if_exists(v):
-                            self.log_import(f"Auto-registered wallpaper image {v}")
-                self.widgets['wp_list'].insert("end", f"{w.get('id')} : {w.get('name')}")
-            if not self.data['mod']['payload'].get('wallpaper'):
-                self.data['mod']['payload'].pop('wallpaper', None)
-
-        # page_styles
-        if 'page_styles' in payload:
-            psval = payload.get('page_styles')
-            if isinstance(psval, list):
-                self.data['mod']['payload']['page_styles'] = psval
-            elif isinstance(psval, dict):
-                self.data['mod']['payload']['page_styles'] = [psval]
-            for ps in self.data['mod']['payload'].get('page_styles', []):
-                for css in ps.get('css', []):
-                    if isinstance(css, str) and register_if_exists(css):
-                        self.log_import(f"Auto-registered css {css}")
-                self.widgets['pages_list'].insert("end", f"{ps.get('id')} : {ps.get('name')}")
-            if not self.data['mod']['payload'].get('page_styles'):
-                self.data['mod']['payload'].pop('page_styles', None)
+            lb = self.widgets.get(section.listbox)
+            if lb:
+                for entry in entries:
+                    lb.insert("end", self.list_row(key, entry))
 
         # license/icon - only register if path exists
         lic = mod.get('license') or m.get('mod', {}).get('license')
         if lic and isinstance(lic, str):
-            candidate = os.path.join(base_dir, lic) if not os.path.isabs(lic) else lic
-            if os.path.exists(candidate):
-                self.files_to_include['license.txt'] = candidate
-                self.widgets['license_entry'].set(candidate)
+            src = resolve(lic)
+            if src is not None:
+                self.files_to_include['license.txt'] = src
+                self.widgets['license_entry'].set(str(src))
 
         icons = m.get('icons', {})
         if isinstance(icons, dict):
             icon512 = icons.get('512')
             if isinstance(icon512, str):
-                cands = [icon512, os.path.join(base_dir, icon512), os.path.join(base_dir, os.path.basename(icon512))]
-                for c in cands:
-                    if c and os.path.exists(c):
-                        self.files_to_include['icon_512.png'] = c
-                        self.widgets['icon_entry'].set(c)
-                        break
+                # relative to the manifest (or a member of its ZIP), never the working directory
+                src = resolve(icon512)
+                if src is not None:
+                    self.files_to_include['icon_512.png'] = src
+                    self.widgets['icon_entry'].set(str(src))
 
         self.widgets['import_log'].insert("end", "Import complete — review registered files and payload entries.\n")
 
@@ -917,8 +1336,33 @@ class GXModBuilder:
                         self.log_import(f"Auto-registered {rel} -> {full}")
         messagebox.showinfo("Auto-scan", f"Auto-scan complete: registered {found} files (if any).")
 
+    def relink_missing_files(self):
+        """Find moved / renamed sources of missing files by content (see libs/relink.py)."""
+        refs = self.collect_current_references()
+        if not missing_sources(self.files_to_include) and all(r in self.files_to_include for r in refs):
+            messagebox.showinfo("Relink", "No missing files: every registered source exists.")
+            return
+        folder = filedialog.askdirectory(title="Choose the asset folder to search (sub-folders included)")
+        if not folder:
+            return
+        t0 = time.perf_counter()
+        found, still = find_relinks(self.files_to_include, refs, [folder], self.digests)
+        with self.history.step("Relink moved files"):
+            for rel, (path, how) in sorted(found.items()):
+                self.files_to_include[rel] = path
+                self.log_import(f"Relinked {rel} -> {path} (by {how})")
+        for rel, var in (('icon_512.png', 'icon_entry'), ('license.txt', 'license_entry')):
+            if rel in found:
+                self.widgets[var].set(found[rel][0])
+        for rel in still:
+            self.log_import(f"Still missing: {rel}")
+        by_content = sum(1 for _, how in found.values() if how == "content")
+        messagebox.showinfo("Relink", f"Relinked {len(found)} file(s) ({by_content} by content, "
+                                      f"{len(found) - by_content} by name) in {time.perf_counter() - t0:.1f}s.\n"
+                                      f"{len(still)} still missing.")
+
     def collect_current_references(self):
-        return collect_referenced_paths_from_payload(self.data['mod']['payload'])
+        return referenced_paths(self.data['mod']['payload'])
 
     # ---------- Validation & Auto-fix ----------
     def run_validation(self):
@@ -927,32 +1371,19 @@ class GXModBuilder:
         issues = []
         payload = self.data['mod']['payload']
 
-        # Only validate structure of optional sections if they exist.
-        if 'background_music' in payload:
-            bg = payload.get('background_music')
-            if not is_nonempty_list_of_dicts(bg):
-                issues.append("background_music is present but must be a non-empty array of dicts.")
-            else:
-                for i, el in enumerate(bg):
-                    if not el.get('tracks'):
-                        issues.append(f"background_music[{i}] has empty 'tracks' array.")
-
-        for key in ('keyboard_sounds','browser_sounds'):
-            if key in payload:
-                val = payload.get(key)
-                if not is_nonempty_list_of_dicts(val):
-                    issues.append(f"{key} is present but must be a non-empty array of pack objects (id,name,sounds).")
-
-        wp = payload.get('wallpaper')
-        if wp is not None and not is_nonempty_list_of_dicts(wp):
-            issues.append("wallpaper must be a non-empty array of objects when present.")
+        # Only validate structure of sections that will be exported (non-empty).
+        issues.extend(validate_payload(payload))
 
         # referenced files
-        referenced = collect_referenced_paths_from_payload(payload)
+        referenced = referenced_paths(payload)
         missing = [p for p in referenced if p not in self.files_to_include]
         if missing:
             issues.append("Referenced asset files not registered: " + ", ".join(missing[:8]) + ("" if len(missing)<=8 else " ..."))
 
+        # page style match patterns
+        for style, pattern, why in compile_page_styles(payload.get('page_styles') or [])[1]:
+            issues.append(f"page_styles '{style}': invalid match pattern '{pattern}' ({why}).")
+
         # informative note about icon (not an error)
         if 'icon_512.png' not in self.files_to_include:
             log.insert("end", "NOTE: icon_512.png not registered. Manifest will omit icons unless you register one.\n")
@@ -962,9 +1393,102 @@ class GXModBuilder:
         else:
             for i in issues:
                 log.insert("end", "ISSUE: " + i + "\n")
+        self.check_size_budgets()
         return issues
 
+    def analyze_in_background(self, done):
+        """Run analyze_sizes on a worker thread (it samples every file) and call done(report) on the
+        Tk thread when it is finished, done(None) if it failed. Returns the worker."""
+        payload, files = copy.deepcopy(self.data['mod']['payload']), dict(self.files_to_include)
+        result = []
+        worker = threading.Thread(target=lambda: result.append(analyze_sizes(payload, files)),
+                                  name="gx-sizes", daemon=True)
+        worker.start()
+
+        def poll():
+            if worker.is_alive():
+                self.root.after(EXPORT_POLL_MS, poll)
+                return
+            done(result[0] if result else None)
+
+        self.root.after(EXPORT_POLL_MS, poll)
+        return worker
+
+    def check_size_budgets(self):
+        """Size budgets for the validator log, added to it when the analysis is done."""
+        budgets = dict(self.size_budgets)
+
+        def done(report):
+            # a newer validation run replaces this one's check
+            if self.budget_check is not worker:
+                return
+            self.budget_check = None
+            log = self.widgets['validator_log']
+            if report is None:
+                log.insert("end", "Size budgets could not be checked.\n")
+            else:
+                issues = budget_issues(report, budgets)
+                for i in issues:
+                    log.insert("end", "ISSUE: " + i + "\n")
+                if not issues:
+                    log.insert("end", "All size budgets met.\n")
+            log.see("end")
+
+        self.widgets['validator_log'].insert("end", "Checking size budgets...\n")
+        worker = self.budget_check = self.analyze_in_background(done)
+
+    def analyze_mod_size(self):
+        t0 = time.perf_counter()
+        count = len(self.files_to_include)
+        budgets = dict(self.size_budgets)
+
+        def done(report):
+            if report is None:
+                self.log_validator("Size analysis failed.")
+                return
+            for line in format_report(report):
+                self.log_validator(line)
+            over = budget_issues(report, budgets)
+            for i in over:
+                self.log_validator("ISSUE: " + i)
+            if not over:
+                self.log_validator("All size budgets met.")
+            self.log_validator(f"Analyzed {count} files in {time.perf_counter() - t0:.2f}s")
+
+        self.log_validator(f"Analyzing {count} files...")
+        self.analyze_in_background(done)
+
+    def edit_size_budgets(self):
+        win = tk.Toplevel(self.root)
+        win.title("Size budgets"); win.transient(self.root); win.grab_set()
+        ttk.Label(win, text="Budgets in bytes of estimated compressed size, per payload section or \"total\".\n"
+                            "They override the defaults; 0 or null switches a default off. Defaults:\n"
+                            + ", ".join(f"{k} {format_bytes(v)}" for k, v in sorted(DEFAULT_SIZE_BUDGETS.items())),
+                  justify="left").pack(padx=8, pady=6)
+        t = tk.Text(win, width=60, height=14); t.pack(fill="both", expand=True, padx=8)
+        t.insert("1.0", json.dumps(self.size_budget_overrides, indent=2, sort_keys=True))
+        def ok():
+            try:
+                data = json.loads(t.get("1.0", "end"))
+                if not isinstance(data, dict):
+                    raise ValueError("expected a JSON object")
+                overrides = budget_overrides(data)
+                save_size_budgets(overrides)
+                self.size_budget_overrides = overrides
+                self.size_budgets = merge_size_budgets(overrides)
+            except Exception as e:
+                messagebox.showerror("Size budgets", str(e), parent=win)
+                return
+            win.destroy()
+        ttk.Button(win, text="OK", command=ok).pack(pady=6)
+        win.wait_window()
+
     def autofix_all(self):
+        with self.history.step("Auto-Fix"):
+            self.autofix_payload()
+        messagebox.showinfo("Auto-fix", "Auto-fix completed. Run Validation again.")
+
+    def autofix_payload(self):
         payload = self.data['mod']['payload']
         # Only normalize existing sections; do not insert defaults.
 
@@ -1032,8 +1556,6 @@ class GXModBuilder:
             if not payload.get('page_styles'):
                 payload.pop('page_styles', None)
 
-        messagebox.showinfo("Auto-fix", "Auto-fix completed. Run Validation again.")
-
     # ---------- Manifest / Export ----------
     def build_manifest(self):
         manifest = {}
@@ -1065,8 +1587,7 @@ class GXModBuilder:
 
         # Build payload including only keys that exist and are non-empty
         payload = {}
-        for key in ('app_icon','background_music','browser_sounds','keyboard_sounds','cursors','fonts',
-                    'mobile_image_overrides','splash_screen','theme','wallpaper','page_styles'):
+        for key in PAYLOAD_KEYS:
             val = self.data['mod']['payload'].get(key)
             if val:
                 payload[key] = val
@@ -1094,68 +1615,348 @@ class GXModBuilder:
         t = tk.Text(w, width=100, height=40); t.pack(fill="both", expand=True)
         t.insert("1.0", s); t.config(state="disabled")
 
+    def export_inputs(self, stages=True):
+        """What an export takes from the GUI, read on the Tk thread: (manifest, file map, enabled stages).
+        The manifest is a copy, so edits made while a governed export runs don't reach it."""
+        manifest = copy.deepcopy(self.build_manifest())
+        enabled = [name for name, _, _ in EXPORT_STAGES if self.widgets[f'stage_{name}'].get()] if stages else []
+        return manifest, dict(self.files_to_include), enabled
+
+    def prepare_export(self, parent_hash=None, stages=True, inputs=None, log=None, governor=None):
+        """Manifest with mod.flavor filled in, plus the relpath -> source map to write.
+        parent_hash is the flavor hash of the build this one updates (full builds have none).
+        The enabled export stages run first, so the hash covers the files that actually ship.
+        inputs is export_inputs(), taken beforehand when this runs on an export thread."""
+        manifest, file_map, enabled = inputs or self.export_inputs(stages)
+        if enabled:
+            run_export_stages(manifest, file_map, self.stage_ctx.for_export(log or self.log_validator, governor), enabled)
+        payload_map = {k: file_map[k] for k in flavor_files(file_map)}
+        flavor_hash = self.payload_hasher.hexdigest(payload_map) if payload_map else md5_bytes(b"")
+        manifest.setdefault('mod', {}).setdefault('flavor', {})
+        manifest['mod']['flavor']['hash'] = flavor_hash
+        manifest['mod']['flavor']['parent_hash'] = parent_hash or md5_bytes(b"")
+        return manifest, file_map
+
+    def run_export(self, title, work, done):
+        """Run work(log, governor) -> result, then done(result) on the Tk thread; errors go to an error box.
+
+        Without I/O limits this happens right away. A governed export sleeps to hold its limit, so it runs on
+        an export thread (with lowered priority) while the Tk loop keeps going: its log lines are passed on
+        and the I/O status line is updated through root.after."""
+        try:
+            governor = self.export_governor()
+        except ValueError as e:
+            messagebox.showerror(title, str(e))
+            return
+        if governor is None:
+            try:
+                result = work(self.log_validator, None)
+            except Exception as e:
+                messagebox.showerror(title, str(e))
+                return
+            done(result)
+            return
+        if self.export_thread is not None:
+            messagebox.showwarning(title, "Another export is still running.")
+            return
+        lines = queue.Queue()
+        outcome = {}
+
+        def run():
+            governor.init_worker()
+            try:
+                outcome['result'] = work(lines.put, governor)
+            except Exception as e:
+                outcome['error'] = e
+
+        def poll():
+            alive = self.export_thread.is_alive()
+            while not lines.empty():
+                self.log_validator(lines.get_nowait())
+            if alive:
+                self.widgets['io_status'].set(governor.progress())
+                self.root.after(EXPORT_POLL_MS, poll)
+                return
+            self.export_thread = None
+            self.widgets['io_status'].set("")
+            self.log_validator(governor.report())
+            if 'error' in outcome:
+                messagebox.showerror(title, str(outcome['error']))
+            else:
+                done(outcome['result'])
+
+        self.export_thread = threading.Thread(target=run, name="gx-export", daemon=True)
+        self.export_thread.start()
+        self.root.after(EXPORT_POLL_MS, poll)
+
     def export_folder(self):
         out = filedialog.askdirectory(title="Export folder (Load unpacked)")
         if not out: return
         manifest = self.build_manifest()
-        referenced = collect_referenced_paths_from_payload(manifest.get('mod', {}).get('payload', {}))
+        referenced = referenced_paths(manifest.get('mod', {}).get('payload', {}))
 
         missing = [p for p in referenced if p not in self.files_to_include]
         if missing:
             if not messagebox.askyesno("Missing files", "Referenced files not registered:\n" + "\n".join(missing[:20]) + "\nContinue export (missing files will be absent)?"):
                 return
 
-        payload_map = {k:v for k,v in self.files_to_include.items() if not k.startswith('icon_')}
-        flavor_hash = compute_payload_hash(payload_map) if payload_map else md5_bytes(b"")
-        manifest.setdefault('mod', {}).setdefault('flavor', {})
-        manifest['mod']['flavor']['hash'] = flavor_hash
-        manifest['mod']['flavor']['parent_hash'] = md5_bytes(b"")
+        inputs = self.export_inputs()
+        verify = self.widgets['verify_export'].get()
+        link_mode = self.widgets['link_mode'].get()
 
-        try:
-            for rel, src in sorted(self.files_to_include.items()):
-                dest = os.path.join(out, rel)
-                ensure_dir(os.path.dirname(dest))
-                if isinstance(src, (bytes, bytearray)):
-                    with open(dest, "wb") as fw: fw.write(src)
-                    self.log_validator(f"Wrote generated bytes -> {rel}")
-                else:
-                    if os.path.exists(src):
-                        shutil.copy2(src, dest)
-                        self.log_validator(f"Copied {src} -> {rel}")
-                    else:
-                        self.log_validator(f"WARNING: missing source {src} (skipped)")
-            # write manifest
-            with open(os.path.join(out, "manifest.json"), "w", encoding="utf-8") as mf:
-                json.dump(manifest, mf, indent=2, ensure_ascii=False)
-            messagebox.showinfo("Exported", f"Exported mod folder to:\n{out}\nflavor.hash={flavor_hash}")
-        except Exception as e:
-            messagebox.showerror("Export error", str(e))
+        def work(log, governor):
+            manifest, file_map = self.prepare_export(inputs=inputs, log=log, governor=governor)
+            expected = record_digests(file_map, self.digests) if verify else None
+            text = write_folder_export(out, file_map, manifest, log, link_mode, self.asset_store, governor)
+            self.digests.save()
+            problems = verify_export(out, expected, text, log, governor=governor) if expected is not None else []
+            return manifest['mod']['flavor']['hash'], problems
+
+        def done(result):
+            flavor_hash, problems = result
+            if self.report_verify(problems):
+                messagebox.showinfo("Exported", f"Exported mod folder to:\n{out}\nflavor.hash={flavor_hash}")
+
+        self.run_export("Export error", work, done)
 
     def export_zip(self):
         out = filedialog.asksaveasfilename(title="Save ZIP as", defaultextension=".zip", filetypes=[("Zip","*.zip")])
         if not out: return
-        manifest = self.build_manifest()
-        payload_map = {k:v for k,v in self.files_to_include.items() if not k.startswith('icon_')}
-        flavor_hash = compute_payload_hash(payload_map) if payload_map else md5_bytes(b"")
-        manifest.setdefault('mod', {}).setdefault('flavor', {})
-        manifest['mod']['flavor']['hash'] = flavor_hash
-        manifest['mod']['flavor']['parent_hash'] = md5_bytes(b"")
+        inputs = self.export_inputs()
+        verify = self.widgets['verify_export'].get()
+        update = self.widgets['zip_update'].get() and os.path.isfile(out)
+
+        def work(log, governor):
+            manifest, file_map = self.prepare_export(inputs=inputs, log=log, governor=governor)
+            manifest_text = manifest_to_json(manifest)
+            # archives are deterministic, so an identical input signature means an identical ZIP
+            key = build_signature(manifest_text, file_map, self.digests)
+            # recorded before writing: the output may replace an archive the sources live in
+            expected = record_digests(file_map, self.digests) if verify else None
+            self.digests.save()
+            cached = None if update else self.build_cache.get(key)
+            if update:
+                report = update_mod_zip(out, file_map, manifest_text, self.digests, log=log, governor=governor)
+                # only a full rewrite has the deterministic layout the cache promises; a compacted
+                # archive keeps the member records of the old one and may differ from it
+                if report['mode'] == "full":
+                    self.build_cache.put(key, out, governor)
+            elif cached:
+                if governor is not None:
+                    with governor.file():
+                        governor.copy(cached, out)
+                else:
+                    shutil.copyfile(cached, out)
+                log(f"Build cache hit ({key[:12]}) -> {out}")
+            else:
+                write_mod_zip(out, file_map, manifest_text, log=log, governor=governor)
+                self.build_cache.put(key, out, governor)
+            problems = verify_export(out, expected, manifest_text, log, governor=governor) if expected is not None else []
+            return manifest['mod']['flavor']['hash'], problems
+
+        def done(result):
+            flavor_hash, problems = result
+            self.rebind_zip_sources(out)
+            if self.report_verify(problems):
+                messagebox.showinfo("ZIP Exported", f"Wrote ZIP: {out}\nflavor.hash={flavor_hash}")
+
+        self.run_export("ZIP error", work, done)
+
+    def export_governor(self):
+        """IOGovernor for the I/O settings on the Validator tab, None when they are all off."""
         try:
-            with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
-                for rel, src in sorted(self.files_to_include.items()):
-                    if isinstance(src, (bytes, bytearray)):
-                        zf.writestr(rel, src)
-                        self.log_validator(f"Wrote bytes -> {rel}")
-                    else:
-                        if os.path.exists(src):
-                            zf.write(src, rel)
-                            self.log_validator(f"Added {src} -> {rel}")
-                        else:
-                            self.log_validator(f"WARNING: missing source {src} (skipped)")
-                zf.writestr("manifest.json", json.dumps(manifest, indent=2, ensure_ascii=False))
-            messagebox.showinfo("ZIP Exported", f"Wrote ZIP: {out}\nflavor.hash={flavor_hash}")
+            limit = float(self.widgets['io_limit'].get() or 0)
+            in_flight = int(self.widgets['io_in_flight'].get() or 0)
+        except ValueError:
+            raise ValueError("Export I/O limit and max files in flight must be numbers")
+        if limit < 0 or in_flight < 0:
+            raise ValueError("Export I/O limit and max files in flight can't be negative")
+        low = bool(self.widgets['io_low_priority'].get())
+        if not limit and not in_flight and not low:
+            return None
+        return IOGovernor(int(limit * 1024 * 1024), in_flight, low)
+
+    def report_verify(self, problems):
+        """Log verify_export problems; False (after an error box) if there were any."""
+        for p in problems:
+            self.log_validator("VERIFY: " + p)
+        if problems:
+            messagebox.showerror("Verify failed", f"The export does not match its inputs ({len(problems)} problem(s)):\n"
+                                 + "\n".join(problems[:10]))
+            return False
+        return True
+
+    def rebind_zip_sources(self, out):
+        """After overwriting an imported ZIP, point its members at the new archive's layout."""
+        out = os.path.abspath(out)
+        # not an edit: the old member names no longer exist, so this must not be undone
+        with self.history.untracked():
+            for rel, src in list(self.files_to_include.items()):
+                if isinstance(src, ZipMember) and src.zip_path == out:
+                    self.files_to_include[rel] = ZipMember(out, rel)
+
+    def export_delta(self):
+        kind = self.choose_from_list("Previous build", ["Previous ZIP", "Previous export folder"])
+        if not kind: return
+        if kind == "Previous ZIP":
+            prev = filedialog.askopenfilename(title="Select previous mod ZIP", filetypes=[("Zip","*.zip")])
+        else:
+            prev = filedialog.askdirectory(title="Select previous export folder")
+        if not prev: return
+        try:
+            previous, prev_manifest = read_previous_build(prev)
+        except Exception as e:
+            messagebox.showerror("Delta error", f"Failed to read previous build: {e}")
+            return
+        parent_hash = previous_flavor_hash(prev_manifest)
+        if not parent_hash:
+            parent_hash = self.prompt_simple("Parent hash", "Previous build has no mod.flavor.hash; enter it:")
+            if not parent_hash: return
+
+        out = filedialog.asksaveasfilename(title="Save delta ZIP as", defaultextension=".zip", filetypes=[("Zip","*.zip")])
+        if not out: return
+        inputs = self.export_inputs()
+
+        def work(log, governor):
+            manifest, file_map = self.prepare_export(parent_hash=parent_hash, inputs=inputs, log=log, governor=governor)
+            plan = plan_delta(file_map, previous, self.digests)
+            self.digests.save()
+            if delta_is_empty(plan, manifest, prev_manifest):
+                return manifest, None, None
+            return manifest, plan, write_delta_zip(out, file_map, plan, manifest, log=log, governor=governor)
+
+        def done(result):
+            manifest, plan, report = result
+            if plan is None:
+                messagebox.showinfo("Delta", "Files and manifest are unchanged since the previous build; nothing to package.")
+                return
+            self.log_validator(f"Delta vs {parent_hash}: {len(plan['added'])} added, {len(plan['changed'])} changed, "
+                               f"{len(plan['removed'])} removed, {len(plan['unchanged'])} unchanged")
+            saved = report['full_bytes'] - report['delta_bytes']
+            self.log_validator(f"Payload bytes: delta {report['delta_bytes']} / full {report['full_bytes']} "
+                               f"({saved} bytes not shipped); delta archive {report['archive_bytes']} bytes")
+            messagebox.showinfo("Delta exported", f"Wrote delta ZIP: {out}\n"
+                                f"{report['delta_files']} of {report['full_files']} files, {report['removed_files']} removed\n"
+                                f"{report['delta_bytes']} of {report['full_bytes']} payload bytes\n"
+                                f"parent_hash={parent_hash}\nflavor.hash={manifest['mod']['flavor']['hash']}")
+
+        self.run_export("Delta error", work, done)
+
+    def export_matrix(self):
+        p = filedialog.askopenfilename(title="Select build matrix JSON", filetypes=[("JSON","*.json")])
+        if not p: return
+        try:
+            variants = load_matrix(p)
+        except Exception as e:
+            messagebox.showerror("Matrix error", f"Failed to read matrix: {e}")
+            return
+        out_dir = filedialog.askdirectory(title="Output folder for variant ZIPs")
+        if not out_dir: return
+        t0 = time.perf_counter()
+        base_manifest, base_files, enabled = self.export_inputs()
+
+        def work(log, governor):
+            # same stages and build cache as a normal export, so a variant matches its single-flavor ZIP
+            results = build_matrix(base_manifest, base_files, variants, out_dir, log=log, governor=governor,
+                                   stage_ctx=self.stage_ctx.for_export(log, governor), stages=enabled,
+                                   build_cache=self.build_cache, digests=self.digests)
+            self.digests.save()
+            return results
+
+        def done(results):
+            summary = "\n".join(f"{r['name']}: {r['bytes']} bytes, flavor.hash={r['flavor_hash']}" for r in results)
+            messagebox.showinfo("Matrix built", f"Built {len(results)} variants in {time.perf_counter() - t0:.1f}s:\n{summary}")
+
+        self.run_export("Matrix error", work, done)
+
+    def show_asset_store(self):
+        report = self.asset_store.usage()
+        for line in format_usage(report):
+            self.log_validator(line)
+        if not report['unreferenced_objects'] and all(p['exists'] for p in report['projects']):
+            return
+        if messagebox.askyesno("Asset store", "Remove blobs no export folder uses any more "
+                               "(records of deleted export folders are dropped first)?"):
+            removed, freed = self.asset_store.gc()
+            self.log_validator(f"Asset store gc: removed {removed} blobs, freed {format_bytes(freed)}")
+
+    def toggle_update_server(self):
+        if self.update_server is not None:
+            self.update_server.shutdown()
+            self.update_server.server_close()
+            self.update_server = None
+            self.serve_btn_text.set("Serve builds locally")
+            self.log_validator("Update server stopped")
+            return
+        folder = filedialog.askdirectory(title="Folder with exported mod ZIPs")
+        if not folder: return
+        try:
+            self.update_server = serve_in_thread(folder)
+        except OSError as e:
+            messagebox.showerror("Update server", f"Could not start the server: {e}")
+            return
+        url = self.update_server.url + UPDATE_MANIFEST_NAME
+        self.serve_btn_text.set("Stop update server")
+        self.log_validator(f"Serving {len(self.update_server.index.builds)} build(s) from {folder} at {url}")
+        if self.widgets['update_url'].get().strip() != url and \
+                messagebox.askyesno("Update server", f"Use {url} as this mod's update URL for testing?"):
+            self.widgets['update_url'].set(url)
+
+    # ---------- Watch mode ----------
+    def toggle_watch(self):
+        if self.watcher is not None:
+            self.stop_watch()
+            return
+        out = filedialog.askdirectory(title="Folder to keep in sync (Load unpacked)")
+        if not out: return
+        # live sync mirrors the sources as registered (no export stages), so edits show up at once
+        manifest, file_map = self.prepare_export(stages=False)
+        self.live_sync = LiveSync(out, log=self.log_validator, link_mode=self.widgets['link_mode'].get(),
+                                  store=self.asset_store)
+        try:
+            self.live_sync.full_export(file_map, manifest)
         except Exception as e:
-            messagebox.showerror("ZIP error", str(e))
+            self.live_sync = None
+            messagebox.showerror("Watch error", str(e))
+            return
+        self.watcher = SourceWatcher(file_map)
+        self.watcher.start()
+        # as text: build_manifest shares the live payload lists, which in-place edits mutate
+        self._watch_manifest = manifest_to_json(self.build_manifest())
+        self.watch_btn_text.set("Stop watch")
+        self.log_validator(f"Watching {len(file_map)} sources -> {out}")
+        self.root.after(100, self._watch_tick)
+
+    def stop_watch(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+        self.watcher = None
+        self.live_sync = None
+        self.watch_btn_text.set("Start watch (live sync)")
+        self.log_validator("Watch stopped")
+
+    def _watch_tick(self):
+        if self.watcher is None:
+            return
+        changed = set()
+        while not self.watcher.changes.empty():
+            changed |= self.watcher.changes.get_nowait()
+        # registrations and info edits made in the GUI count as changes too
+        registered = self.files_to_include != self.live_sync.file_map
+        manifest_now = manifest_to_json(self.build_manifest())
+        if changed or registered or manifest_now != self._watch_manifest:
+            t0 = time.perf_counter()
+            self._watch_manifest = manifest_now
+            manifest, file_map = self.prepare_export(stages=False)
+            if registered:
+                self.watcher.set_sources(file_map)
+            try:
+                n = self.live_sync.sync(file_map, manifest, changed)
+                self.log_validator(f"Live sync: {n} file(s) updated in {(time.perf_counter() - t0) * 1000:.0f} ms "
+                                   f"({self.watcher.backend})")
+            except Exception as e:
+                self.log_validator(f"Live sync error: {e}")
+        self.root.after(100, self._watch_tick)
 
     # ---------- Utility dialogs ----------
     def generate_auto_id(self, prefix, existing_list):
@@ -0,0 +1,354 @@
+"""
+Undo/redo for the project state (payload and registered files).
+
+The payload and files_to_include are kept in TrackedDict/TrackedList
+containers. Every mutation records only the slot it overwrote (one dict key,
+one list position), so a step costs time and memory proportional to what it
+changed; everything it didn't touch stays shared between the live state and
+the history. Undoing a step applies those records in reverse and yields the
+records that redo it.
+
+Containers tracked under a root name carry a tag telling which top-level key
+of that root they belong to, so listeners (the autosave journal) can tell
+which sections a step touched without walking the payload.
+"""
+
+import copy
+
+_MISSING = object()
+
+
+def track(value, history, tag=None):
+    """value with every dict/list in it (recursively) turned into tracked containers."""
+    if isinstance(value, (TrackedDict, TrackedList)):
+        if value._tag != tag and not isinstance(value._tag, str):
+            _retag(value, tag)
+        return value
+    if isinstance(value, dict):
+        return TrackedDict(history, value, tag)
+    if isinstance(value, list):
+        return TrackedList(history, value, tag)
+    return value
+
+
+def _retag(value, tag):
+    # a subtree moved to another section
+    if isinstance(value, (TrackedDict, TrackedList)):
+        value._tag = tag
+        for v in (value.values() if isinstance(value, dict) else value):
+            _retag(v, tag)
+
+
+def _child_tag(tag, key):
+    # children of a root are tagged (root, key); deeper levels inherit their parent's tag
+    return (tag, key) if isinstance(tag, str) else tag
+
+
+def _index(lst, i):
+    n = len(lst)
+    if i < 0:
+        i += n
+    return min(max(i, 0), n)
+
+
+class TrackedDict(dict):
+    __slots__ = ("_h", "_tag")
+
+    def __init__(self, history, items=(), tag=None):
+        self._h = history
+        self._tag = tag
+        dict.__init__(self, ((k, track(v, history, _child_tag(tag, k))) for k, v in dict(items).items()))
+
+    def _record(self, key):
+        if self._h is not None:
+            self._h.record(("dset", self, key, dict.get(self, key, _MISSING)))
+
+    def __setitem__(self, key, value):
+        self._record(key)
+        dict.__setitem__(self, key, track(value, self._h, _child_tag(self._tag, key)))
+
+    def __delitem__(self, key):
+        if key in self:
+            self._record(key)
+        dict.__delitem__(self, key)
+
+    def pop(self, key, *default):
+        if key in self:
+            self._record(key)
+        return dict.pop(self, key, *default)
+
+    def popitem(self):
+        if self:
+            self._record(next(reversed(self)))
+        return dict.popitem(self)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return dict.__getitem__(self, key)
+
+    def update(self, *args, **kwargs):
+        for k, v in dict(*args, **kwargs).items():
+            self[k] = v
+
+    def clear(self):
+        for k in list(self):
+            self._record(k)
+        dict.clear(self)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return {copy.deepcopy(k, memo): copy.deepcopy(v, memo) for k, v in self.items()}
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+
+class TrackedList(list):
+    __slots__ = ("_h", "_tag")
+
+    def __init__(self, history, items=(), tag=None):
+        self._h = history
+        self._tag = tag
+        list.__init__(self, (track(v, history, _child_tag(tag, None)) for v in items))
+
+    def _track(self, value):
+        return track(value, self._h, _child_tag(self._tag, None))
+
+    def _record(self, op):
+        if self._h is not None:
+            self._h.record(op)
+
+    def _snapshot(self):
+        # fallback for whole-list operations (sort, slices ...): a shallow copy of this one list
+        self._record(("all", self, list(self)))
+
+    def append(self, value):
+        list.append(self, self._track(value))
+        self._record(("del", self, len(self) - 1))
+
+    def extend(self, values):
+        start = len(self)
+        list.extend(self, (self._track(v) for v in values))
+        for i in range(start, len(self)):
+            self._record(("del", self, i))
+
+    def __iadd__(self, values):
+        self.extend(values)
+        return self
+
+    def insert(self, i, value):
+        i = _index(self, i)
+        list.insert(self, i, self._track(value))
+        self._record(("del", self, i))
+
+    def pop(self, i=-1):
+        if not self:
+            return list.pop(self)
+        i = _index(self, i)
+        if i >= len(self):
+            raise IndexError("pop index out of range")
+        value = list.pop(self, i)
+        self._record(("ins", self, i, value))
+        return value
+
+    def remove(self, value):
+        self.pop(self.index(value))
+
+    def __setitem__(self, i, value):
+        if isinstance(i, slice):
+            self._snapshot()
+            list.__setitem__(self, i, [self._track(v) for v in value])
+            return
+        old = list.__getitem__(self, i)
+        i = _index(self, i)
+        self._record(("set", self, i, old))
+        list.__setitem__(self, i, self._track(value))
+
+    def __delitem__(self, i):
+        if isinstance(i, slice):
+            self._snapshot()
+            list.__delitem__(self, i)
+        else:
+            self.pop(i)
+
+    def __imul__(self, n):
+        self._snapshot()
+        return list.__imul__(self, n)
+
+    def clear(self):
+        self._snapshot()
+        list.clear(self)
+
+    def sort(self, *args, **kwargs):
+        self._snapshot()
+        list.sort(self, *args, **kwargs)
+
+    def reverse(self):
+        self._snapshot()
+        list.reverse(self)
+
+    def __copy__(self):
+        return list(self)
+
+    def __deepcopy__(self, memo):
+        return [copy.deepcopy(v, memo) for v in self]
+
+    def __reduce__(self):
+        return (list, (list(self),))
+
+
+def _apply(op):
+    """Perform one record without tracking it; returns the record that reverts it."""
+    kind, target = op[0], op[1]
+    if kind == "dset":
+        key, value = op[2], op[3]
+        cur = dict.get(target, key, _MISSING)
+        if value is _MISSING:
+            dict.pop(target, key, None)
+        else:
+            dict.__setitem__(target, key, value)
+        return ("dset", target, key, cur)
+    if kind == "del":
+        return ("ins", target, op[2], list.pop(target, op[2]))
+    if kind == "ins":
+        list.insert(target, op[2], op[3])
+        return ("del", target, op[2])
+    if kind == "set":
+        cur = list.__getitem__(target, op[2])
+        list.__setitem__(target, op[2], op[3])
+        return ("set", target, op[2], cur)
+    cur = list(target)
+    list.__setitem__(target, slice(None), op[2])
+    return ("all", target, cur)
+
+
+class Step:
+    __slots__ = ("label", "ops")
+
+    def __init__(self, label, ops=None):
+        self.label = label
+        self.ops = ops if ops is not None else []
+
+    def touched(self):
+        """{(root name, top-level key)} changed by this step (untagged containers are ignored)."""
+        out = set()
+        for op in self.ops:
+            tag = op[1]._tag
+            if isinstance(tag, str):
+                out.add((tag, op[2]))
+            elif tag is not None:
+                out.add(tag)
+        return out
+
+
+class History:
+    """Undo/redo stacks of steps. A step groups the mutations of one user action: either an
+    explicit `with history.step(label):` block, or everything recorded until `schedule`
+    (e.g. Tk's after_idle) calls back. Listeners are called with every step that changed the
+    state: committed, undone/redone, or recorded while paused."""
+
+    def __init__(self, limit=500, schedule=None):
+        self.limit = limit
+        self.schedule = schedule
+        self.undo_stack = []
+        self.redo_stack = []
+        self.current = None
+        self.depth = 0
+        self.paused = 0
+        self.listeners = []
+
+    def track(self, value, name=None):
+        """Tracked copy of value; with a root name, its containers are tagged for Step.touched()."""
+        return track(value, self, name)
+
+    def _notify(self, step):
+        for f in self.listeners:
+            f(step)
+
+    def record(self, op):
+        if self.paused:
+            self._notify(Step(None, [op]))
+            return
+        if self.current is None:
+            self.current = Step("Edit")
+            if self.depth == 0 and self.schedule is not None:
+                self.schedule(self.commit)
+        self.current.ops.append(op)
+
+    def step(self, label):
+        return _StepContext(self, label)
+
+    def untracked(self):
+        """Context in which mutations are not undoable (bookkeeping); listeners still see them."""
+        return _PauseContext(self)
+
+    def commit(self):
+        if self.depth or self.current is None:
+            return
+        step, self.current = self.current, None
+        if not step.ops:
+            return
+        self.undo_stack.append(step)
+        if len(self.undo_stack) > self.limit:
+            del self.undo_stack[0]
+        self.redo_stack.clear()
+        self._notify(step)
+
+    def _replay(self, src, dst):
+        self.commit()
+        if not src:
+            return None
+        step = src.pop()
+        inverse = Step(step.label, [_apply(op) for op in reversed(step.ops)])
+        dst.append(inverse)
+        self._notify(inverse)
+        return step.label
+
+    def undo(self):
+        """Revert the last step; returns its label, or None if there is nothing to undo."""
+        return self._replay(self.undo_stack, self.redo_stack)
+
+    def redo(self):
+        return self._replay(self.redo_stack, self.undo_stack)
+
+
+class _StepContext:
+    def __init__(self, history, label):
+        self.history = history
+        self.label = label
+
+    def __enter__(self):
+        h = self.history
+        if h.depth == 0:
+            # close an auto-opened step so this one starts clean
+            h.commit()
+            h.current = Step(self.label)
+        h.depth += 1
+        return h
+
+    def __exit__(self, *exc):
+        h = self.history
+        h.depth -= 1
+        if h.depth == 0:
+            h.commit()
+        return False
+
+
+class _PauseContext:
+    def __init__(self, history):
+        self.history = history
+
+    def __enter__(self):
+        self.history.paused += 1
+        return self.history
+
+    def __exit__(self, *exc):
+        self.history.paused -= 1
+        return False
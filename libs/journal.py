@@ -0,0 +1,268 @@
+"""
+Autosave journal for crash recovery.
+
+Every change to the project is appended to journal.jsonl in a session slot,
+~/.gx_builder/session/<n>/, as one JSON line holding the new value of each payload section, registered
+file or info field it touched. Lines are buffered and written + fsynced in
+batches (the GUI flushes every FSYNC_INTERVAL_MS). Once the journal grows past
+COMPACT_RECORDS lines or COMPACT_BYTES it is folded into snapshot.json and
+truncated. A clean exit removes both files; if they are still there on the
+next start, the session can be restored from the snapshot plus the journal.
+
+Each running builder holds an exclusive lock on its slot's lock file, so
+several instances journal side by side: a slot whose lock can be taken
+belongs to no running instance, and only such a slot's session is offered
+for restore.
+"""
+
+import os
+import json
+import base64
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+from .lib import USER_DATA_DIR, ensure_dir, ZipMember
+
+SESSION_DIR = os.path.join(USER_DATA_DIR, "session")
+JOURNAL_NAME = "journal.jsonl"
+SNAPSHOT_NAME = "snapshot.json"
+LOCK_NAME = "lock"
+
+FSYNC_INTERVAL_MS = 500
+COMPACT_RECORDS = 500
+COMPACT_BYTES = 4 << 20
+
+# parts of the session state; "files" values are files_to_include sources
+ROOTS = ("payload", "files", "mod", "info")
+
+
+def encode_source(src):
+    if isinstance(src, (bytes, bytearray)):
+        return {"bytes": base64.b64encode(bytes(src)).decode("ascii")}
+    if isinstance(src, ZipMember):
+        return {"zip": src.zip_path, "member": src.name}
+    return src
+
+
+def decode_source(val):
+    if isinstance(val, dict):
+        if "bytes" in val:
+            return base64.b64decode(val["bytes"])
+        return ZipMember(val["zip"], val["member"])
+    return val
+
+
+def _encode_root(root, values):
+    if root == "files":
+        return {k: encode_source(v) for k, v in values.items()}
+    return dict(values)
+
+
+def _try_lock(path):
+    """Open path and lock it exclusively without waiting; the open file, or None if
+    another process holds the lock."""
+    fp = open(path, "a+b")
+    try:
+        if fcntl is not None:
+            fcntl.flock(fp.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        elif msvcrt is not None:
+            fp.seek(0)
+            msvcrt.locking(fp.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        fp.close()
+        return None
+    return fp
+
+
+def _has_session(slot):
+    for name in (JOURNAL_NAME, SNAPSHOT_NAME):
+        try:
+            if os.path.getsize(os.path.join(slot, name)) > 0:
+                return True
+        except OSError:
+            pass
+    return False
+
+
+class Journal:
+
+    def __init__(self, root=SESSION_DIR):
+        self.root = os.path.abspath(root)
+        self.dir = self.journal_path = self.snapshot_path = None
+        self.lock_fp = None
+        self.fp = None
+        self.pending = []
+        self.records = 0
+        self.seq = 0
+
+    @property
+    def enabled(self):
+        return self.fp is not None
+
+    def _use(self, slot, lock_fp):
+        if self.lock_fp is not None:
+            self.lock_fp.close()
+        self.lock_fp = lock_fp
+        self.dir = slot
+        self.journal_path = os.path.join(slot, JOURNAL_NAME)
+        self.snapshot_path = os.path.join(slot, SNAPSHOT_NAME)
+
+    def claim(self):
+        """Lock a session slot for this instance: the first one a previous instance left
+        a session in, otherwise a free or new one. True if it holds such a session."""
+        if self.lock_fp is not None:
+            return self.has_session()
+        ensure_dir(self.root)
+        slots = sorted(int(n) for n in os.listdir(self.root) if n.isdigit())
+        free = None
+        for n in slots:
+            slot = os.path.join(self.root, str(n))
+            try:
+                lock_fp = _try_lock(os.path.join(slot, LOCK_NAME))
+            except OSError:
+                continue
+            if lock_fp is None:
+                # a running instance's slot
+                continue
+            if _has_session(slot):
+                if free is not None:
+                    free[1].close()
+                self._use(slot, lock_fp)
+                return True
+            if free is None:
+                free = (slot, lock_fp)
+            else:
+                lock_fp.close()
+        n = slots[-1] + 1 if slots else 0
+        while free is None:
+            slot = os.path.join(self.root, str(n))
+            n += 1
+            try:
+                os.mkdir(slot)
+            except FileExistsError:
+                # another instance got there first
+                continue
+            lock_fp = _try_lock(os.path.join(slot, LOCK_NAME))
+            if lock_fp is not None:
+                free = (slot, lock_fp)
+        self._use(*free)
+        return False
+
+    def has_session(self):
+        """True if the slot holds a session that did not end with close()."""
+        return self.dir is not None and _has_session(self.dir)
+
+    def load(self):
+        """(state, number of journal records replayed) of the previous session.
+        A torn last line from a crash mid-write ends the replay."""
+        state = {r: {} for r in ROOTS}
+        seq = 0
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                snap = json.load(f)
+            for r in ROOTS:
+                state[r].update(snap.get(r) or {})
+            seq = snap.get("seq", 0)
+        except (OSError, ValueError):
+            pass
+        replayed = 0
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        break
+                    # records already folded into the snapshot (crash between snapshot and truncate)
+                    if rec.get("seq", 0) <= seq:
+                        continue
+                    for r in ROOTS:
+                        state[r].update(rec.get(r) or {})
+                        for k in rec.get(r + "-") or ():
+                            state[r].pop(k, None)
+                    seq = rec["seq"]
+                    replayed += 1
+        except OSError:
+            pass
+        state["files"] = {k: decode_source(v) for k, v in state["files"].items()}
+        return state, replayed
+
+    def _write_snapshot(self, state):
+        ensure_dir(self.dir)
+        data = {r: _encode_root(r, state.get(r) or {}) for r in ROOTS}
+        data["seq"] = self.seq
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_path)
+
+    def start(self, state):
+        """Snapshot state and begin an empty journal on top of it."""
+        self.close(remove=False)
+        self.claim()
+        self.seq = 0
+        self._write_snapshot(state)
+        self.fp = open(self.journal_path, "w", encoding="utf-8")
+        self.records = 0
+
+    def record(self, changes, removed=None):
+        """Queue one record: changes = {root: {key: new value}}, removed = {root: [keys]}."""
+        if not self.enabled:
+            return
+        self.seq += 1
+        rec = {"seq": self.seq}
+        for r, values in changes.items():
+            if values:
+                rec[r] = _encode_root(r, values)
+        for r, keys in (removed or {}).items():
+            if keys:
+                rec[r + "-"] = sorted(keys)
+        # serialized now: the containers keep changing after this call
+        self.pending.append(json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    def flush(self):
+        """Write queued records and fsync them in one go."""
+        if not self.enabled or not self.pending:
+            return
+        self.fp.write("".join(self.pending))
+        self.fp.flush()
+        os.fsync(self.fp.fileno())
+        self.records += len(self.pending)
+        self.pending = []
+
+    def needs_compaction(self):
+        return self.enabled and (self.records >= COMPACT_RECORDS or self.fp.tell() >= COMPACT_BYTES)
+
+    def compact(self, state):
+        """Fold the journal into a new snapshot of state and truncate it."""
+        self.flush()
+        self._write_snapshot(state)
+        self.fp.close()
+        self.fp = open(self.journal_path, "w", encoding="utf-8")
+        self.records = 0
+
+    def close(self, remove=True):
+        """Stop journaling; remove=True (a clean exit) deletes the session files and
+        gives the slot up."""
+        if self.fp is not None:
+            self.flush()
+            self.fp.close()
+            self.fp = None
+        if remove and self.dir is not None:
+            for p in (self.journal_path, self.snapshot_path):
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
+            self.lock_fp.close()
+            self.lock_fp = None
+            self.dir = self.journal_path = self.snapshot_path = None
@@ -3,11 +3,21 @@ Library / helper code extracted from the original builder script.
 Contains constants, presets, and utility functions used by the GUI.
 """
 
+import io
 import os
+import json
 import hashlib
+import threading
+import zipfile
 
 APP_TITLE = "GX Builder"
 
+# per-user data (caches, indexes) lives here
+USER_DATA_DIR = os.path.join(os.path.expanduser("~"), ".gx_builder")
+
+# read/write block size used by the export helpers
+CHUNK_SIZE = 1 << 20
+
 # ---------- Theme Configuration ----------
 def is_windows_or_linux():
     return os.name in ('nt', 'posix')
@@ -55,36 +65,172 @@ SILENT_MP3_BYTES = b""
 def md5_bytes(b: bytes) -> str:
     return hashlib.md5(b).hexdigest()
 
+class ZipMember:
+    """A file inside a mod ZIP, used as a files_to_include source without unpacking it."""
+    __slots__ = ("zip_path", "name")
+
+    def __init__(self, zip_path, name):
+        self.zip_path = os.path.abspath(zip_path)
+        self.name = name
+
+    def __eq__(self, other):
+        return isinstance(other, ZipMember) and (self.zip_path, self.name) == (other.zip_path, other.name)
+
+    def __hash__(self):
+        return hash((self.zip_path, self.name))
+
+    def __repr__(self):
+        return f"{self.zip_path}!{self.name}"
+
+    __str__ = __repr__
+
+    def info(self):
+        with zipfile.ZipFile(self.zip_path) as zf:
+            return zf.getinfo(self.name)
+
+def iter_source_chunks(src, chunk_size=CHUNK_SIZE):
+    """Content of a files_to_include value: path, bytes or ZipMember."""
+    if isinstance(src, (bytes, bytearray)):
+        yield bytes(src)
+    elif isinstance(src, ZipMember):
+        with zipfile.ZipFile(src.zip_path) as zf, zf.open(src.name) as f:
+            while True:
+                buf = f.read(chunk_size)
+                if not buf:
+                    break
+                yield buf
+    else:
+        yield from iter_file_chunks(src, chunk_size)
+
+def open_source(src):
+    """Seekable binary file object for a files_to_include value."""
+    if isinstance(src, (bytes, bytearray)):
+        return io.BytesIO(src)
+    if isinstance(src, ZipMember):
+        # seeking backwards in a deflated member re-inflates from the start: read it once
+        with zipfile.ZipFile(src.zip_path) as zf:
+            return io.BytesIO(zf.read(src.name))
+    return open(src, "rb")
+
+def copy_range(f, out, start, length):
+    """Stream `length` bytes from offset `start` of file object f into out."""
+    f.seek(start)
+    while length > 0:
+        buf = f.read(min(CHUNK_SIZE, length))
+        if not buf:
+            raise ValueError("source ended early")
+        out.write(buf)
+        length -= len(buf)
+
+def source_exists(src):
+    if isinstance(src, (bytes, bytearray)):
+        return True
+    if isinstance(src, ZipMember):
+        try:
+            src.info()
+            return True
+        except (OSError, KeyError, zipfile.BadZipFile):
+            return False
+    return os.path.exists(src)
+
+def source_size(src):
+    """Uncompressed size of a files_to_include value (0 if unreadable)."""
+    if isinstance(src, (bytes, bytearray)):
+        return len(src)
+    try:
+        if isinstance(src, ZipMember):
+            return src.info().file_size
+        return os.path.getsize(src)
+    except (OSError, KeyError, zipfile.BadZipFile):
+        return 0
+
 def compute_payload_hash(file_map: dict) -> str:
-    """file_map: relpath -> abs path or bytes"""
+    """file_map: relpath -> abs path, bytes or ZipMember"""
     m = hashlib.md5()
     for rel in sorted(file_map.keys()):
-        src = file_map[rel]
+        h = m.copy()
         try:
-            if isinstance(src, (bytes, bytearray)):
-                m.update(src)
-            else:
-                with open(src, "rb") as f:
-                    m.update(f.read())
+            for buf in iter_source_chunks(file_map[rel]):
+                h.update(buf)
         except Exception:
             continue
+        m = h
     return m.hexdigest()
 
+def flavor_files(relpaths):
+    """Relpaths covered by mod.flavor.hash: everything but the icon_* package files."""
+    return [r for r in relpaths if not r.startswith('icon_')]
+
+class PayloadHasher:
+    """Incremental compute_payload_hash for an editing session.
+
+    Keeps an md5 state checkpoint after every file (in sorted relpath order), so
+    when one source changes only that file and the ones after it are re-read.
+    The digest is always identical to compute_payload_hash(file_map).
+
+    Safe to share between threads (the Tk thread's watch mode and an export
+    thread): a call works on its own copy of the checkpoints and the last one
+    to finish keeps its checkpoints. Hashing itself runs outside the lock.
+    """
+
+    def __init__(self):
+        self.keys = []      # (relpath, source identity) per hashed position
+        self.states = []    # md5 state after the file at the same position
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def source_identity(src):
+        if isinstance(src, (bytes, bytearray)):
+            return ('bytes', bytes(src))
+        path = src.zip_path if isinstance(src, ZipMember) else src
+        try:
+            st = os.stat(path)
+        except (OSError, TypeError, ValueError):
+            return ('missing', src)
+        return ('file', src, st.st_size, st.st_mtime_ns)
+
+    def hexdigest(self, file_map: dict) -> str:
+        keys = [(rel, self.source_identity(file_map[rel])) for rel in sorted(file_map.keys())]
+        with self.lock:
+            old_keys, old_states = self.keys, self.states
+        # longest unchanged prefix -> resume from its checkpoint
+        i = 0
+        n = min(len(keys), len(old_keys))
+        while i < n and keys[i] == old_keys[i]:
+            i += 1
+        m = old_states[i - 1].copy() if i else hashlib.md5()
+        states = old_states[:i]
+        for rel, ident in keys[i:]:
+            h = m.copy()
+            try:
+                for buf in iter_source_chunks(file_map[rel]):
+                    h.update(buf)
+                m = h
+            except Exception:
+                pass
+            states.append(m.copy())
+        with self.lock:
+            self.keys, self.states = keys, states
+        return m.hexdigest()
+
+    def reset(self):
+        with self.lock:
+            self.keys, self.states = [], []
+
 def ensure_dir(path):
     os.makedirs(path, exist_ok=True)
 
+def iter_file_chunks(path, chunk_size=CHUNK_SIZE):
+    with open(path, "rb") as f:
+        while True:
+            buf = f.read(chunk_size)
+            if not buf:
+                break
+            yield buf
+
+def manifest_to_json(manifest) -> str:
+    """Stable manifest serialization: same manifest -> same bytes."""
+    return json.dumps(manifest, indent=2, ensure_ascii=False, sort_keys=True) + "\n"
+
 def is_nonempty_list_of_dicts(x):
     return isinstance(x, list) and len(x) > 0 and all(isinstance(i, dict) for i in x)
-
-def collect_referenced_paths_from_payload(payload):
-    referenced = set()
-    def walk(o):
-        if isinstance(o, dict):
-            for v in o.values(): walk(v)
-        elif isinstance(o, list):
-            for i in o: walk(i)
-        elif isinstance(o, str):
-            if "/" in o:
-                referenced.add(o)
-    walk(payload)
-    return referenced
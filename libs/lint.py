@@ -0,0 +1,214 @@
+"""
+Headless batch lint of a mod library.
+
+Every folder with a manifest.json and every mod ZIP under a root is checked
+on a process pool, with the same checks as the Validation tab:
+- manifest structure
+- referenced files that are not in the mod
+- invalid page_styles match patterns
+- duplicate relpaths: ZIP members stored twice, and references that only
+  differ by case or separators, which collide on case-insensitive systems
+
+Only the ZIP central directory is read and folder files are only stat()ed,
+so a library of hundreds of mods is linted in seconds. Results can be
+written as JSON or as a JUnit XML report for CI.
+"""
+
+import os
+import json
+import time
+import zipfile
+import posixpath
+import xml.etree.ElementTree as ET
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from .schema import validate_payload, referenced_paths
+from .matcher import compile_page_styles
+
+# folders never searched for mods
+SKIP_DIRS = {"__pycache__", "node_modules"}
+# below this many mods a process pool costs more than it saves
+POOL_MIN_MODS = 8
+
+
+def discover_mods(root):
+    """Sorted paths of mod folders (containing manifest.json) and ZIPs under root."""
+    found = []
+    stack = [os.path.abspath(root)]
+    while stack:
+        d = stack.pop()
+        try:
+            with os.scandir(d) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        for e in entries:
+            if e.name.startswith(".") or e.name in SKIP_DIRS:
+                continue
+            try:
+                if e.is_dir(follow_symlinks=False):
+                    stack.append(e.path)
+                elif e.name == "manifest.json":
+                    found.append(d)
+                elif e.name.lower().endswith(".zip") and e.is_file():
+                    found.append(e.path)
+            except OSError:
+                continue
+    return sorted(found)
+
+
+def _norm(rel):
+    return posixpath.normpath(rel.replace("\\", "/").lstrip("/")).lower()
+
+
+def manifest_refs(m):
+    """Relpaths a manifest references: payload paths plus the license and the 512px icon."""
+    mod = m.get('mod') if isinstance(m.get('mod'), dict) else {}
+    payload = mod.get('payload') if isinstance(mod.get('payload'), dict) else {}
+    refs = set(referenced_paths(payload))
+    if isinstance(mod.get('license'), str) and mod['license']:
+        refs.add(mod['license'])
+    icons = m.get('icons')
+    if isinstance(icons, dict) and isinstance(icons.get('512'), str) and icons['512']:
+        refs.add(icons['512'])
+    return refs
+
+
+def check_manifest(m, members):
+    """Issues of a parsed manifest whose package holds the relpaths in `members`."""
+    if not isinstance(m, dict):
+        return ["manifest.json must be a JSON object."]
+    issues = []
+    mod = m.get('mod')
+    if not isinstance(mod, dict):
+        return ["manifest.json has no 'mod' object."]
+    payload = mod.get('payload')
+    if not isinstance(payload, dict):
+        return ["manifest.json has no 'mod.payload' object."]
+    for key in ('name', 'version'):
+        if not isinstance(m.get(key), str) or not m[key].strip():
+            issues.append(f"manifest.json has empty or missing '{key}'.")
+    issues.extend(validate_payload(payload))
+    for style, pattern, why in compile_page_styles(payload.get('page_styles') or [])[1]:
+        issues.append(f"page_styles '{style}': invalid match pattern '{pattern}' ({why}).")
+
+    refs = manifest_refs(m)
+    missing = sorted(r for r in refs if r.replace("\\", "/").lstrip("/") not in members)
+    if missing:
+        issues.append("Referenced files missing from the mod: " + ", ".join(missing[:8]) + ("" if len(missing) <= 8 else " ..."))
+    seen = {}
+    for r in sorted(refs):
+        seen.setdefault(_norm(r), []).append(r)
+    for variants in seen.values():
+        if len(variants) > 1:
+            issues.append("Referenced paths differ only by case or separators: " + ", ".join(variants))
+    return issues
+
+
+def _folder_members(folder, refs):
+    # only the referenced files are looked at, not the whole tree
+    return {r.replace("\\", "/").lstrip("/") for r in refs
+            if os.path.isfile(os.path.join(folder, r.replace("\\", "/").lstrip("/")))}
+
+
+def lint_mod(path):
+    """Lint result dict for one mod folder or ZIP; None for a ZIP that isn't a mod."""
+    t0 = time.perf_counter()
+    res = {"path": path, "kind": "zip" if os.path.isfile(path) else "folder",
+           "name": None, "version": None, "files": 0, "issues": []}
+    issues = res["issues"]
+    try:
+        if res["kind"] == "folder":
+            with open(os.path.join(path, "manifest.json"), "rb") as f:
+                raw = f.read()
+            m = json.loads(raw.decode("utf-8"))
+            members = _folder_members(path, manifest_refs(m) if isinstance(m, dict) else ())
+        else:
+            with zipfile.ZipFile(path) as zf:
+                names = [n for n in zf.namelist() if not n.endswith("/")]
+                manifests = sorted((n for n in names if n.rsplit("/", 1)[-1] == "manifest.json"), key=len)
+                if not manifests:
+                    return None
+                m = json.loads(zf.read(manifests[0]).decode("utf-8"))
+            # mods are sometimes zipped with their folder: paths are relative to the manifest
+            prefix = manifests[0][:-len("manifest.json")]
+            members = {n[len(prefix):] for n in names if n.startswith(prefix)}
+            dups = sorted(n for n, k in Counter(names).items() if k > 1)
+            if dups:
+                issues.append("ZIP members stored more than once: " + ", ".join(dups[:8]))
+            folded = {}
+            for n in set(names):
+                folded.setdefault(n.lower(), []).append(n)
+            clash = sorted(", ".join(sorted(v)) for v in folded.values() if len(v) > 1)
+            if clash:
+                issues.append("ZIP members differ only by case: " + "; ".join(clash[:8]))
+        res["files"] = len(members)
+    except (OSError, zipfile.BadZipFile) as e:
+        issues.append(f"Cannot read mod: {e}")
+        m = None
+    except (ValueError, UnicodeDecodeError) as e:
+        issues.append(f"manifest.json is not valid JSON: {e}")
+        m = None
+    if m is not None:
+        if isinstance(m, dict):
+            res["name"] = m.get('name') if isinstance(m.get('name'), str) else None
+            res["version"] = m.get('version') if isinstance(m.get('version'), str) else None
+        issues.extend(check_manifest(m, members))
+    res["seconds"] = time.perf_counter() - t0
+    return res
+
+
+def lint_library(root, jobs=None):
+    """Lint every mod under root; results in path order."""
+    paths = discover_mods(root)
+    if len(paths) < POOL_MIN_MODS or jobs == 1:
+        results = [lint_mod(p) for p in paths]
+    else:
+        workers = jobs or os.cpu_count() or 1
+        # mods are small: hand them out in batches to keep pickling overhead down
+        chunk = max(1, len(paths) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(lint_mod, paths, chunksize=chunk))
+    return [r for r in results if r is not None]
+
+
+def _display(root, path):
+    rel = os.path.relpath(path, os.path.abspath(root))
+    return rel.replace(os.sep, "/") if rel != "." else os.path.basename(path)
+
+
+def format_lint(results, root, seconds=None):
+    """Text report lines: one per failing mod and its issues, then a summary."""
+    lines = []
+    bad = [r for r in results if r["issues"]]
+    for r in bad:
+        lines.append(f"FAIL {_display(root, r['path'])}")
+        lines.extend("  " + i for i in r["issues"])
+    tail = f"{len(results)} mod(s) linted, {len(bad)} with issues"
+    if seconds is not None:
+        tail += f" in {seconds:.2f}s"
+    lines.append(tail)
+    return lines
+
+
+def lint_to_json(results, root):
+    return {"root": os.path.abspath(root),
+            "mods": [dict(r, path=_display(root, r["path"])) for r in results],
+            "failed": sum(1 for r in results if r["issues"])}
+
+
+def write_junit(results, root, path):
+    """JUnit XML: one testcase per mod, a <failure> listing its issues."""
+    suite = ET.Element("testsuite", name="gx-lint", tests=str(len(results)),
+                       failures=str(sum(1 for r in results if r["issues"])), errors="0",
+                       time=f"{sum(r['seconds'] for r in results):.3f}")
+    for r in results:
+        case = ET.SubElement(suite, "testcase", classname="gx-lint." + r["kind"],
+                             name=_display(root, r["path"]), time=f"{r['seconds']:.3f}")
+        if r["issues"]:
+            fail = ET.SubElement(case, "failure", message=r["issues"][0], type="lint")
+            fail.text = "\n".join(r["issues"])
+    top = ET.Element("testsuites")
+    top.append(suite)
+    ET.ElementTree(top).write(path, encoding="utf-8", xml_declaration=True)
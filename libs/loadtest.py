@@ -0,0 +1,81 @@
+"""
+Small HTTP load generator for the local update server (keep-alive connections, one per worker).
+
+    python main.py loadtest http://127.0.0.1:8765/update.json -c 8 -d 5
+"""
+
+import time
+import threading
+import http.client
+from urllib.parse import urlsplit
+
+
+def _worker(url, deadline, headers, stats, lock):
+    u = urlsplit(url)
+    path = (u.path or "/") + (f"?{u.query}" if u.query else "")
+    conn = None
+    n = nbytes = 0
+    codes = {}
+    lat = []
+    while time.perf_counter() < deadline:
+        if conn is None:
+            conn = http.client.HTTPConnection(u.hostname, u.port or 80, timeout=10)
+        t0 = time.perf_counter()
+        try:
+            conn.request("GET", path, headers=headers)
+            r = conn.getresponse()
+            while True:
+                buf = r.read(1 << 20)
+                if not buf:
+                    break
+                nbytes += len(buf)
+            if r.will_close:
+                conn.close(); conn = None
+            code = r.status
+        except (OSError, http.client.HTTPException):
+            if conn is not None:
+                conn.close()
+            conn = None
+            code = "error"
+        lat.append(time.perf_counter() - t0)
+        codes[code] = codes.get(code, 0) + 1
+        n += 1
+    if conn is not None:
+        conn.close()
+    with lock:
+        stats["requests"] += n
+        stats["bytes"] += nbytes
+        stats["latencies"].extend(lat)
+        for k, v in codes.items():
+            stats["codes"][k] = stats["codes"].get(k, 0) + v
+
+
+def run_load_test(url, concurrency=8, duration=5.0, headers=None):
+    stats = {"requests": 0, "bytes": 0, "latencies": [], "codes": {}}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=_worker, args=(url, deadline, dict(headers or {}), stats, lock))
+               for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    lat = sorted(stats["latencies"])
+    pct = lambda q: lat[min(len(lat) - 1, int(q * len(lat)))] * 1000 if lat else 0.0
+    return {
+        "requests": stats["requests"],
+        "seconds": elapsed,
+        "rps": stats["requests"] / elapsed if elapsed else 0.0,
+        "mb_per_s": stats["bytes"] / elapsed / (1 << 20) if elapsed else 0.0,
+        "p50_ms": pct(0.50),
+        "p99_ms": pct(0.99),
+        "codes": stats["codes"],
+    }
+
+
+def format_result(r):
+    codes = ", ".join(f"{k}: {v}" for k, v in sorted(r["codes"].items(), key=lambda kv: str(kv[0])))
+    return (f"{r['requests']} requests in {r['seconds']:.1f}s = {r['rps']:.0f} req/s, "
+            f"{r['mb_per_s']:.1f} MB/s, p50 {r['p50_ms']:.2f} ms, p99 {r['p99_ms']:.2f} ms ({codes})")
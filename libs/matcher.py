@@ -0,0 +1,381 @@
+"""
+page_styles match patterns, compiled into one matcher.
+
+Patterns use the browser's match-pattern syntax:
+    <all_urls>
+    <scheme>://<host><path>     scheme: * (http/https), http, https, file, ftp, ws, wss
+                                host:   *, *.example.com (the domain and its subdomains),
+                                        example.com, [::1]; an optional :port (or :*)
+                                path:   /... with * wildcards, matched against path + query
+
+Hosts go into a trie of reversed labels (com -> example -> www), so a URL
+only meets the patterns of its own domain chain plus the host-less ones.
+The candidates for each host are compiled once into a bucket: patterns whose
+path is /* are decided by scheme alone, the rest are prefiltered with one
+combined regex before their own regexes run. Buckets are memoized per host,
+so a history export with many URLs per site costs one split and one dict
+lookup per URL in the common case.
+"""
+
+import os
+import re
+import csv
+import json
+import zipfile
+from urllib.parse import urlsplit
+
+SCHEMES = ("http", "https", "file", "ftp", "ws", "wss")
+ALL_URLS = "<all_urls>"
+# scheme "*" and <all_urls> cover these
+_STAR_SCHEMES = frozenset(("http", "https"))
+_ALL_SCHEMES = frozenset(SCHEMES)
+_PATTERN = re.compile(r"^(\*|[a-z][a-z0-9+.-]*)://([^/]*)(/.*)$", re.I)
+_URL_IN_TEXT = re.compile(r"\b(?:https?|file|ftp|wss?)://[^\s\"'<>]+", re.I)
+# host -> bucket memo size
+BUCKET_MEMO = 20000
+
+
+class MatchPattern:
+    __slots__ = ("text", "owner", "schemes", "host", "wild", "port", "path", "path_re")
+
+    def __init__(self, text, owner=None):
+        self.text = text
+        self.owner = owner
+        self.path_re = None
+        if text == ALL_URLS:
+            self.schemes, self.host, self.wild, self.port, self.path = _ALL_SCHEMES, "*", False, None, "/*"
+            return
+        m = _PATTERN.match(text)
+        if not m:
+            raise ValueError("expected <scheme>://<host>/<path> or <all_urls>")
+        scheme, host, path = m.group(1).lower(), m.group(2).lower(), m.group(3)
+        if scheme == "*":
+            self.schemes = _STAR_SCHEMES
+        elif scheme in _ALL_SCHEMES:
+            self.schemes = frozenset((scheme,))
+        else:
+            raise ValueError(f"unsupported scheme '{scheme}'")
+        port = None
+        if ":" in host and not host.endswith("]"):
+            host, port = host.rsplit(":", 1)
+            if port == "*":
+                port = None
+            elif not port.isdigit():
+                raise ValueError(f"bad port '{port}'")
+        if scheme == "file":
+            if host:
+                raise ValueError("file patterns have no host (file:///path)")
+        elif not host:
+            raise ValueError("missing host")
+        if host.startswith("["):
+            # IPv6 literal: URLs report it without the brackets (urlsplit().hostname)
+            if not host.endswith("]"):
+                raise ValueError("unclosed '[' in the host")
+            host = host[1:-1]
+        wild = False
+        if host.startswith("*."):
+            host, wild = host[2:], True
+        if "*" in host:
+            raise ValueError("'*' in the host must be the whole host or a leading '*.'")
+        self.host, self.wild, self.port, self.path = host.rstrip("."), wild, port, path
+        if path != "/*":
+            self.path_re = re.compile(glob_to_regex(path), re.S)
+
+    def host_covers(self, other):
+        if self.host == "*":
+            return True
+        if other.host == "*":
+            return False
+        if self.wild:
+            return other.host == self.host or other.host.endswith("." + self.host)
+        return not other.wild and other.host == self.host
+
+    def path_covers(self, other):
+        if self.path == other.path or self.path == "/*":
+            return True
+        star = self.path.find("*")
+        if star != len(self.path) - 1:
+            return False
+        prefix = self.path[:-1]
+        other_star = other.path.find("*")
+        literal = other.path if other_star < 0 else other.path[:other_star]
+        return literal.startswith(prefix)
+
+    def covers(self, other):
+        """True if every URL other matches is matched by this pattern too (conservative)."""
+        return (other.schemes <= self.schemes and self.host_covers(other)
+                and (self.port is None or self.port == other.port) and self.path_covers(other))
+
+    def __repr__(self):
+        return self.text
+
+
+def glob_to_regex(path):
+    return ".*".join(re.escape(part) for part in path.split("*"))
+
+
+def parse_pattern(text, owner=None):
+    """MatchPattern for text; ValueError says why it isn't valid."""
+    return MatchPattern(text.strip(), owner)
+
+
+class _Node:
+    __slots__ = ("children", "exact", "wild")
+
+    def __init__(self):
+        self.children = {}
+        self.exact = []
+        self.wild = []
+
+
+class _Bucket:
+    """Patterns that can apply to one host."""
+
+    def __init__(self, patterns, order):
+        self.order = order
+        self.universal = [p for p in patterns if p.path_re is None]
+        self.specific = [p for p in patterns if p.path_re is not None]
+        self.prefilter = None
+        if len(self.specific) > 1:
+            alts = sorted({glob_to_regex(p.path) for p in self.specific})
+            self.prefilter = re.compile("|".join(f"(?:{a})" for a in alts), re.S)
+
+    def match(self, scheme, port, path):
+        hits = [p for p in self.universal if scheme in p.schemes and (p.port is None or p.port == port)]
+        if self.specific and (self.prefilter is None or self.prefilter.fullmatch(path)):
+            more = [p for p in self.specific if scheme in p.schemes and (p.port is None or p.port == port)
+                    and p.path_re.fullmatch(path)]
+            if more:
+                hits = sorted(hits + more, key=lambda p: self.order[id(p)]) if hits else more
+        return hits
+
+
+class URLMatcher:
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self.root = _Node()
+        self.any_host = []
+        for p in self.patterns:
+            if p.host == "*":
+                self.any_host.append(p)
+                continue
+            node = self.root
+            for label in reversed(p.host.split(".")) if p.host else ():
+                node = node.children.setdefault(label, _Node())
+            (node.wild if p.wild else node.exact).append(p)
+        self.order = {id(p): i for i, p in enumerate(self.patterns)}
+        self.buckets = {}
+
+    def _bucket(self, host):
+        b = self.buckets.get(host)
+        if b is not None:
+            return b
+        found = list(self.any_host)
+        node = self.root
+        labels = list(reversed(host.split("."))) if host else []
+        for label in labels:
+            node = node.children.get(label)
+            if node is None:
+                break
+            found.extend(node.wild)
+        else:
+            found.extend(node.exact)
+        # keep declaration order so results list styles in manifest order
+        found.sort(key=lambda p: self.order[id(p)])
+        if len(self.buckets) >= BUCKET_MEMO:
+            self.buckets.clear()
+        b = self.buckets[host] = _Bucket(found, self.order)
+        return b
+
+    def match(self, url):
+        """Patterns matching url (in declaration order); [] for unparsable URLs."""
+        try:
+            u = urlsplit(url.strip())
+            scheme = u.scheme.lower()
+            host = (u.hostname or "").rstrip(".")
+            port = str(u.port) if u.port is not None else None
+        except ValueError:
+            return []
+        if scheme not in _ALL_SCHEMES:
+            return []
+        path = (u.path or "/") + (f"?{u.query}" if u.query else "")
+        return self._bucket(host).match(scheme, port, path)
+
+
+def style_label(entry, index):
+    if isinstance(entry, dict) and (entry.get('id') or entry.get('name')):
+        return str(entry.get('id') or entry.get('name'))
+    return f"page_styles[{index}]"
+
+
+def compile_page_styles(page_styles):
+    """(URLMatcher, [(style, pattern, reason)] for invalid patterns). Pattern owners are style labels."""
+    if isinstance(page_styles, dict):
+        page_styles = [page_styles]
+    patterns, invalid = [], []
+    for i, entry in enumerate(page_styles if isinstance(page_styles, list) else []):
+        label = style_label(entry, i)
+        matches = (entry.get('matches') or []) if isinstance(entry, dict) else []
+        if isinstance(matches, str):
+            matches = [matches]
+        elif not isinstance(matches, list):
+            invalid.append((label, repr(matches), "'matches' must be a list of patterns"))
+            continue
+        for text in matches:
+            try:
+                patterns.append(parse_pattern(str(text), label))
+            except ValueError as e:
+                invalid.append((label, str(text), str(e)))
+    return URLMatcher(patterns), invalid
+
+
+def static_overlaps(patterns):
+    """(redundant, overlapping): patterns covered by another pattern of the same style,
+    and pairs of styles' patterns where one covers the other."""
+    redundant, overlapping = [], []
+    for i, a in enumerate(patterns):
+        for j, b in enumerate(patterns):
+            if i == j or not a.covers(b):
+                continue
+            if a.owner == b.owner:
+                # of two identical patterns, report only the later one
+                if not (b.covers(a) and j < i):
+                    redundant.append((b, a))
+            elif not (b.covers(a) and j < i):
+                overlapping.append((a, b))
+    return redundant, overlapping
+
+
+def run_match_report(page_styles, urls):
+    """Match every URL against every page style; see format_match_report."""
+    matcher, invalid = compile_page_styles(page_styles)
+    per_url = []
+    pattern_hits = {id(p): 0 for p in matcher.patterns}
+    style_hits = {}
+    # URLs matched by the same set of patterns are counted together; pairs are expanded per set
+    hit_sets = {}
+    for url in urls:
+        hits = matcher.match(url)
+        styles = []
+        for p in hits:
+            pattern_hits[id(p)] += 1
+            if p.owner not in styles:
+                styles.append(p.owner)
+        for s in styles:
+            style_hits[s] = style_hits.get(s, 0) + 1
+        if len(styles) > 1:
+            key = tuple(id(p) for p in hits)
+            if key in hit_sets:
+                hit_sets[key][1] += 1
+            else:
+                hit_sets[key] = [hits, 1, url]
+        per_url.append((url, styles))
+    pairs = {}
+    for hits, n, url in hit_sets.values():
+        # patterns of different styles that both matched these URLs
+        for i, a in enumerate(hits):
+            for b in hits[i + 1:]:
+                if a.owner != b.owner:
+                    key = (id(a), id(b))
+                    if key in pairs:
+                        pairs[key][2] += n
+                    else:
+                        pairs[key] = [a, b, n, url]
+    redundant, overlapping = static_overlaps(matcher.patterns)
+    return {
+        "urls": per_url,
+        "styles": style_hits,
+        "never": [p for p in matcher.patterns if not pattern_hits[id(p)]],
+        "invalid": invalid,
+        "redundant": redundant,
+        "overlapping": overlapping,
+        "co_matches": sorted(pairs.values(), key=lambda v: -v[2]),
+        "patterns": len(matcher.patterns),
+    }
+
+
+def format_match_report(report, max_urls=50):
+    lines = []
+    urls = report["urls"]
+    matched = sum(1 for _, s in urls if s)
+    lines.append(f"{len(urls)} URL(s), {matched} matched by at least one style; {report['patterns']} pattern(s)")
+    for style, n in sorted(report["styles"].items(), key=lambda kv: -kv[1]):
+        lines.append(f"  {style}: {n} URL(s)")
+    shown = [(u, s) for u, s in urls if s][:max_urls]
+    if shown:
+        lines.append("Matches:")
+        lines.extend(f"  {u} -> {', '.join(s)}" for u, s in shown)
+        if matched > len(shown):
+            lines.append(f"  ... {matched - len(shown)} more")
+    if report["invalid"]:
+        lines.append("Invalid patterns:")
+        lines.extend(f"  {s}: {p} ({why})" for s, p, why in report["invalid"])
+    if report["never"]:
+        lines.append("Patterns that matched no URL:")
+        lines.extend(f"  {p.owner}: {p.text}" for p in report["never"])
+    if report["redundant"]:
+        lines.append("Redundant patterns (covered by another pattern of the same style):")
+        lines.extend(f"  {b.owner}: {b.text}  covered by  {a.text}" for b, a in report["redundant"])
+    if report["overlapping"]:
+        lines.append("Overlapping patterns (every URL of the second is also matched by the first):")
+        lines.extend(f"  {a.owner}: {a.text}  >=  {b.owner}: {b.text}" for a, b in report["overlapping"])
+    if report["co_matches"]:
+        lines.append("Styles applied together (patterns of different styles matching the same URL):")
+        lines.extend(f"  {a.owner}: {a.text}  +  {b.owner}: {b.text}  ({n} URL(s), e.g. {url})"
+                     for a, b, n, url in report["co_matches"][:max_urls])
+    return lines
+
+
+def report_to_json(report):
+    pat = lambda p: {"style": p.owner, "pattern": p.text}
+    return {
+        "urls": [{"url": u, "styles": s} for u, s in report["urls"]],
+        "styles": report["styles"],
+        "invalid": [{"style": s, "pattern": p, "reason": why} for s, p, why in report["invalid"]],
+        "never_matched": [pat(p) for p in report["never"]],
+        "redundant": [{"pattern": pat(b), "covered_by": pat(a)} for b, a in report["redundant"]],
+        "overlapping": [{"covering": pat(a), "covered": pat(b)} for a, b in report["overlapping"]],
+        "co_matches": [{"a": pat(a), "b": pat(b), "urls": n, "example": url} for a, b, n, url in report["co_matches"]],
+    }
+
+
+def extract_urls(text):
+    return _URL_IN_TEXT.findall(text)
+
+
+def read_url_list(path):
+    """URLs from a browsing-history export: plain text (one per line), CSV or JSON."""
+    with open(path, "r", encoding="utf-8", errors="replace", newline="") as f:
+        if path.lower().endswith(".csv"):
+            return [cell.strip() for row in csv.reader(f) for cell in row if _URL_IN_TEXT.match(cell.strip())]
+        text = f.read()
+    if path.lower().endswith(".json"):
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return extract_urls(text)
+        out = []
+        stack = [data]
+        while stack:
+            v = stack.pop()
+            if isinstance(v, dict):
+                stack.extend(reversed(list(v.values())))
+            elif isinstance(v, list):
+                stack.extend(reversed(v))
+            elif isinstance(v, str) and _URL_IN_TEXT.fullmatch(v.strip()):
+                out.append(v.strip())
+        return out
+    return [line.strip() for line in text.splitlines() if _URL_IN_TEXT.match(line.strip())]
+
+
+def read_page_styles(path):
+    """page_styles of a manifest.json, an export folder or a mod ZIP."""
+    if os.path.isdir(path):
+        path = os.path.join(path, "manifest.json")
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            manifest = json.loads(zf.read("manifest.json").decode("utf-8"))
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    return ((manifest.get('mod') or {}).get('payload') or {}).get('page_styles') or []
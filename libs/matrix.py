@@ -0,0 +1,240 @@
+"""
+Build matrix: several variants of one base project (different theme values,
+wallpapers, music sets ...) built in one go.
+
+Matrix file format (JSON):
+    {
+      "variants": [
+        {
+          "name": "red",                       # output: <out_dir>/<name>.zip unless "out" is given
+          "info": {"name": "My Mod (Red)", "version": "1.0.1"},
+          "payload": {"theme": [...], "wallpaper": [...]},   # replaces whole sections, null drops one
+          "files": {"wallpaper/red.png": "red.png"}          # extra sources, relative to the matrix file
+        }
+      ]
+    }
+
+Every unique source is read, checksummed and compressed exactly once for the
+whole matrix; variants are then assembled in parallel from those compressed
+members.
+"""
+
+import os
+import copy
+import json
+import shutil
+import hashlib
+import tempfile
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+
+from .lib import md5_bytes, manifest_to_json, iter_source_chunks, flavor_files, ZipMember
+from .schema import PAYLOAD_KEYS, referenced_paths
+from .cache import build_signature
+from .stages import run_export_stages
+from .ziputil import ZipWriter, ZipMemberReader, compress_to_file
+
+INFO_FIELDS = ('name', 'version', 'author', 'description', 'update_url', 'developer')
+
+
+def load_matrix(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    variants = data.get('variants') if isinstance(data, dict) else None
+    if not isinstance(variants, list) or not variants:
+        raise ValueError("matrix file must contain a non-empty 'variants' array")
+    base_dir = os.path.dirname(os.path.abspath(path))
+    seen = set()
+    out = []
+    for i, v in enumerate(variants):
+        if not isinstance(v, dict):
+            raise ValueError(f"variants[{i}] must be an object")
+        name = str(v.get('name') or f"variant_{i}")
+        if name in seen:
+            raise ValueError(f"duplicate variant name '{name}'")
+        seen.add(name)
+        payload = v.get('payload') or {}
+        if not isinstance(payload, dict):
+            raise ValueError(f"variants[{i}].payload must be an object")
+        unknown = sorted(k for k in payload if k not in PAYLOAD_KEYS)
+        if unknown:
+            raise ValueError(f"variants[{i}].payload: unknown section(s) {', '.join(unknown)}")
+        files = {}
+        for rel, src in (v.get('files') or {}).items():
+            files[rel] = None if src is None else os.path.join(base_dir, src)
+        out.append({
+            "name": name,
+            "out": v.get('out'),
+            "info": v.get('info') or {},
+            "payload": payload,
+            "files": files,
+        })
+    return out
+
+
+def variant_manifest(base_manifest, variant):
+    manifest = copy.deepcopy(base_manifest)
+    for k, val in variant['info'].items():
+        if k not in INFO_FIELDS:
+            continue
+        if k == 'developer' and isinstance(val, str):
+            val = {"name": val}
+        if val in (None, ""):
+            manifest.pop(k, None)
+        else:
+            manifest[k] = val
+    mod = manifest.setdefault('mod', {"schema_version": 2})
+    payload = mod.setdefault('payload', {})
+    for k, val in variant['payload'].items():
+        if val:
+            payload[k] = copy.deepcopy(val)
+        else:
+            payload.pop(k, None)
+    if not payload:
+        mod.pop('payload', None)
+    return manifest
+
+
+def variant_files(base_manifest, base_files, manifest, variant):
+    """Base sources minus files only the replaced sections referenced, plus the variant's own files."""
+    base_refs = referenced_paths(base_manifest.get('mod', {}).get('payload', {}))
+    refs = referenced_paths(manifest.get('mod', {}).get('payload', {}))
+    files = {rel: src for rel, src in base_files.items() if rel not in base_refs or rel in refs}
+    for rel, src in variant['files'].items():
+        if src is None:
+            files.pop(rel, None)
+        else:
+            files[rel] = src
+    return files
+
+
+def _source_key(src):
+    if isinstance(src, (bytes, bytearray)):
+        return ('bytes', hashlib.sha256(src).hexdigest())
+    if isinstance(src, ZipMember):
+        return ('zip', src.zip_path, src.name)
+    return ('file', os.path.abspath(src))
+
+
+def _flavor_hashes(payloads, raws):
+    """mod.flavor.hash of each variant: the same bytes and order as compute_payload_hash, fed
+    from the spilled members. The variants' md5s advance side by side in relpath order, so a
+    member is inflated once for every variant that ships it under that relpath."""
+    hashers = [hashlib.md5() for _ in payloads]
+    users = {}
+    for i, payload in enumerate(payloads):
+        for step in payload:
+            users.setdefault(step, []).append(hashers[i])
+    for step in sorted(users):
+        for buf in raws[step[1]].iter_data():
+            for m in users[step]:
+                m.update(buf)
+    return [m.hexdigest() for m in hashers]
+
+
+def build_matrix(base_manifest, base_files, variants, out_dir, workers=None, log=print, governor=None,
+                 stage_ctx=None, stages=(), build_cache=None, digests=None):
+    """Build every variant as a deterministic ZIP in out_dir. Returns one result dict per variant.
+
+    The enabled export `stages` run on every variant with stage_ctx, as they would for a normal
+    export; their outputs are cached by content, so each unique source is processed once. With
+    a build_cache (and the digests to key it), a variant identical to an earlier build is copied
+    from the cache and newly built ones are stored in it.
+
+    With a governor (libs/throttle.py), the spilled members and the variant ZIPs are written
+    through its bandwidth limit and both phases respect its cap on files in flight.
+    """
+    plans = []
+    for v in variants:
+        manifest = variant_manifest(base_manifest, v)
+        files = variant_files(base_manifest, base_files, manifest, v)
+        if stages:
+            run_export_stages(manifest, files, stage_ctx, stages)
+        out = v['out'] or f"{v['name']}.zip"
+        plans.append((v['name'], os.path.join(out_dir, out), manifest, files))
+
+    sources = {}
+    refs = 0
+    for _, _, _, files in plans:
+        for src in files.values():
+            sources.setdefault(_source_key(src), src)
+            refs += 1
+    log(f"Matrix: {len(plans)} variants, {refs} member references, {len(sources)} unique sources")
+
+    zip_reader = ZipMemberReader()
+    with tempfile.TemporaryDirectory(prefix="gx_matrix_") as spill_dir:
+        # phase 1: read + crc + deflate each unique source once;
+        # members of imported ZIPs are already compressed and are used in place
+        def spill(item):
+            if governor is not None:
+                with governor.file():
+                    return _spill(item)
+            return _spill(item)
+
+        def _spill(item):
+            idx, (key, src) = item
+            if key[0] == 'zip':
+                raw = zip_reader.raw(src)
+                if raw is not None:
+                    return key, raw
+            try:
+                return key, compress_to_file(iter_source_chunks(src), os.path.join(spill_dir, f"{idx}.bin"), governor)
+            except Exception:
+                return key, None
+
+        init = governor.init_worker if governor is not None else None
+        with ThreadPoolExecutor(max_workers=workers, initializer=init) as pool:
+            raws = dict(pool.map(spill, enumerate(sources.items())))
+
+        # phase 2: flavor hashes, then assemble variants in parallel from the compressed members
+        payloads = []
+        for _, _, _, files in plans:
+            keys = {rel: _source_key(src) for rel, src in files.items()}
+            payloads.append([(rel, keys[rel]) for rel in sorted(flavor_files(keys)) if raws[keys[rel]] is not None])
+        plans = [plan + (h,) for plan, h in zip(plans, _flavor_hashes(payloads, raws))]
+
+        def assemble(plan):
+            name, out, manifest, files, flavor_hash = plan
+            members = {rel: raws[_source_key(src)] for rel, src in files.items()}
+            manifest.setdefault('mod', {}).setdefault('flavor', {})
+            manifest['mod']['flavor']['hash'] = flavor_hash
+            manifest['mod']['flavor']['parent_hash'] = md5_bytes(b"")
+
+            os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+            manifest_text = manifest_to_json(manifest)
+            skipped = sorted(rel for rel, raw in members.items() if raw is None)
+            key = build_signature(manifest_text, files, digests) if build_cache is not None else None
+            cached = build_cache.get(key) if key else None
+            if cached:
+                if governor is not None:
+                    with governor.file():
+                        governor.copy(cached, out)
+                else:
+                    shutil.copyfile(cached, out)
+                return {"name": name, "out": out, "flavor_hash": flavor_hash, "files": len(members) - len(skipped),
+                        "skipped": skipped, "bytes": os.path.getsize(out), "cached": True}
+            manifest_bytes = manifest_text.encode("utf-8")
+            tmp = out + ".part"
+            with open(tmp, "wb") as fp, (governor.file() if governor else nullcontext()):
+                zw = ZipWriter(governor.wrap(fp) if governor else fp)
+                for rel in sorted(list(members) + ["manifest.json"]):
+                    if rel == "manifest.json":
+                        zw.write_bytes(rel, manifest_bytes)
+                    elif members[rel] is not None:
+                        zw.write_raw(rel, members[rel])
+                zw.close()
+            os.replace(tmp, out)
+            if key:
+                build_cache.put(key, out, governor)
+            return {"name": name, "out": out, "flavor_hash": flavor_hash, "files": len(members) - len(skipped),
+                    "skipped": skipped, "bytes": os.path.getsize(out), "cached": False}
+
+        with ThreadPoolExecutor(max_workers=workers, initializer=init) as pool:
+            results = list(pool.map(assemble, plans))
+
+    for r in results:
+        for rel in r['skipped']:
+            log(f"WARNING: {r['name']}: missing source for {rel} (skipped)")
+        log(f"{r['name']}: {r['files']} files, {r['bytes']} bytes -> {r['out']} (flavor.hash={r['flavor_hash']})"
+            + (" from the build cache" if r['cached'] else ""))
+    return results
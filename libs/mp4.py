@@ -0,0 +1,210 @@
+"""
+MP4 "faststart" export stage (see libs/stages.py).
+
+Many encoders write the `moov` box (the index a player needs before it can
+decode anything) after the media data. A browser then has to fetch the whole
+file before a splash or wallpaper video starts. This stage moves `moov` in
+front of the first `mdat` and shifts every chunk offset in `stco` / `co64`
+by the same amount. `stco` becomes `co64` if an offset would no longer fit
+in 32 bits. Media data is copied in streaming chunks and never re-encoded.
+
+Files that are already faststart, fragmented (`moof`) or that keep offsets
+this code doesn't rewrite (`saio`, `iloc`) are left as they are.
+"""
+
+import struct
+import hashlib
+import zipfile
+
+from .lib import open_source, copy_range, source_size
+from .schema import SECTIONS
+from .analyze import format_bytes
+
+# bump when the rewrite changes so cached outputs are rebuilt
+MP4_FORMAT_VERSION = 1
+
+VIDEO_EXTENSIONS = (".mp4", ".m4v", ".mov")
+# sections and the fields of theirs that can hold a video
+VIDEO_SECTIONS = ("splash_screen", "wallpaper")
+
+# boxes whose payload is nothing but child boxes
+CONTAINERS = {b"moov", b"trak", b"mdia", b"minf", b"stbl", b"edts", b"dinf"}
+# absolute file offsets in boxes this module doesn't rewrite
+UNSUPPORTED = (b"saio", b"iloc")
+
+# cache key -> stats, or None when the file is left as it is
+_faststart_memo = {}
+
+
+def top_level_boxes(f, size):
+    """[(type, offset, box size)] of the top-level boxes; ValueError if the layout is broken."""
+    boxes = []
+    pos = 0
+    while pos < size:
+        f.seek(pos)
+        head = f.read(8)
+        if len(head) < 8:
+            raise ValueError("truncated box header")
+        n, kind = struct.unpack(">I4s", head)
+        if n == 1:
+            ext = f.read(8)
+            if len(ext) < 8:
+                raise ValueError("truncated box header")
+            n = struct.unpack(">Q", ext)[0]
+        elif n == 0:
+            n = size - pos
+        if n < 8 or pos + n > size:
+            raise ValueError(f"bad size for box {kind!r} at {pos}")
+        boxes.append((kind, pos, n))
+        pos += n
+    return boxes
+
+
+def parse_boxes(data):
+    """Box tree of `data`: [[type, children list or payload bytes]]."""
+    out = []
+    pos = 0
+    while pos + 8 <= len(data):
+        n, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        head = 8
+        if n == 1:
+            n = struct.unpack(">Q", data[pos + 8:pos + 16])[0]
+            head = 16
+        elif n == 0:
+            n = len(data) - pos
+        if n < head or pos + n > len(data):
+            raise ValueError(f"bad size for box {kind!r}")
+        body = data[pos + head:pos + n]
+        out.append([kind, parse_boxes(body) if kind in CONTAINERS else body])
+        pos += n
+    if pos != len(data):
+        raise ValueError("trailing bytes in box")
+    return out
+
+
+def serialize_boxes(boxes):
+    parts = []
+    for kind, body in boxes:
+        payload = serialize_boxes(body) if isinstance(body, list) else body
+        parts.append(struct.pack(">I4s", len(payload) + 8, kind) + payload)
+    return b"".join(parts)
+
+
+def _chunk_offset_boxes(boxes):
+    for box in boxes:
+        if isinstance(box[1], list):
+            yield from _chunk_offset_boxes(box[1])
+        elif box[0] in (b"stco", b"co64"):
+            yield box
+
+
+def _read_offsets(box):
+    kind, body = box
+    count = struct.unpack(">I", body[4:8])[0]
+    fmt = ">%d%s" % (count, "I" if kind == b"stco" else "Q")
+    if 8 + struct.calcsize(fmt) > len(body):
+        raise ValueError("truncated chunk offset table")
+    return list(struct.unpack(fmt, body[8:8 + struct.calcsize(fmt)]))
+
+
+def _write_offsets(box, offsets, wide):
+    box[0] = b"co64" if wide else b"stco"
+    # version/flags, count, then the table
+    box[1] = box[1][:4] + struct.pack(">I", len(offsets)) + struct.pack(">%d%s" % (len(offsets), "Q" if wide else "I"), *offsets)
+
+
+def plan_faststart(f, size):
+    """(new moov bytes, moov offset, moov size, insert offset) to make a file faststart; None if it already is or can't be."""
+    boxes = top_level_boxes(f, size)
+    kinds = [b[0] for b in boxes]
+    if b"moov" not in kinds or b"mdat" not in kinds or b"moof" in kinds:
+        return None
+    moov = boxes[kinds.index(b"moov")]
+    first_mdat = boxes[kinds.index(b"mdat")]
+    if moov[1] < first_mdat[1]:
+        return None
+    _, moov_pos, moov_size = moov
+    insert = first_mdat[1]
+    f.seek(moov_pos)
+    raw = f.read(moov_size)
+    if any(tag in raw for tag in UNSUPPORTED):
+        return None
+    tree = parse_boxes(raw)
+    tables = [(box, _read_offsets(box), box[0] == b"co64") for box in _chunk_offset_boxes(tree)]
+
+    def resized(wide):
+        # the moov size only depends on the table widths, not on the offsets
+        for box, offs, was_wide in tables:
+            _write_offsets(box, offs, wide or was_wide)
+        return len(serialize_boxes(tree))
+
+    def moved(new_size):
+        # data in [insert, moov) moves back by the new moov's size, data after the old moov by the size change
+        return [[o + new_size if insert <= o < moov_pos else
+                 o + new_size - moov_size if o >= moov_pos + moov_size else o for o in offs]
+                for _, offs, _ in tables]
+
+    wide = False
+    shifted = moved(resized(wide))
+    if any(o > 0xFFFFFFFF for offs in shifted for o in offs):
+        wide = True
+        shifted = moved(resized(wide))
+    for (box, _, was_wide), offs in zip(tables, shifted):
+        _write_offsets(box, offs, wide or was_wide)
+    return serialize_boxes(tree), moov_pos, moov_size, insert
+
+
+def write_faststart(f, size, plan, out):
+    """Stream the faststart layout of f into the file object out."""
+    new_moov, moov_pos, moov_size, insert = plan
+    copy_range(f, out, 0, insert)
+    out.write(new_moov)
+    copy_range(f, out, insert, moov_pos - insert)
+    copy_range(f, out, moov_pos + moov_size, size - moov_pos - moov_size)
+
+
+def video_relpaths(payload):
+    rels = []
+    for key in VIDEO_SECTIONS:
+        if key in payload:
+            for rel in SECTIONS[key].extract(payload[key]):
+                if rel.lower().endswith(VIDEO_EXTENSIONS) and rel not in rels:
+                    rels.append(rel)
+    return rels
+
+
+def faststart_videos(manifest, file_map, ctx):
+    """Export stage: move the moov box of splash / wallpaper MP4s in front of the media data."""
+    payload = manifest.get('mod', {}).get('payload') or {}
+    cache = ctx.cache("mp4", ".mp4")
+    for rel in video_relpaths(payload):
+        src = file_map.get(rel)
+        if src is None:
+            continue
+        sha = ctx.digests.source_digest(src)
+        if sha is None:
+            continue
+        key = hashlib.sha256(f"gx-mp4-v{MP4_FORMAT_VERSION}\0{sha}".encode()).hexdigest()
+        path = cache.get(key)
+        if key not in _faststart_memo or (_faststart_memo[key] is not None and path is None):
+            size = source_size(src)
+            stats = None
+            try:
+                f = open_source(src)
+                try:
+                    plan = plan_faststart(f, size)
+                    if plan is not None:
+                        stats = {"moov": plan[2], "before": plan[1] + plan[2]}
+                        if path is None:
+                            path = cache.put_with(key, lambda out: write_faststart(f, size, plan, out), ctx.governor)
+                finally:
+                    f.close()
+            except (OSError, ValueError, KeyError, struct.error, zipfile.BadZipFile) as e:
+                ctx.log(f"MP4: {rel}: {e}, left as is")
+            _faststart_memo[key] = stats
+        stats = _faststart_memo[key]
+        if stats is None:
+            continue
+        file_map[rel] = path
+        ctx.log(f"MP4: {rel}: index ({format_bytes(stats['moov'])}) moved to the front, "
+                f"playback no longer waits for {format_bytes(stats['before'])}")
@@ -0,0 +1,102 @@
+"""
+Relinking registered files whose sources were moved or renamed.
+
+The DigestIndex remembers the size and digests of every source it has
+hashed (exports, bundling, thumbnails, ...), even after the file is gone.
+For each missing source, the chosen folders are scanned once:
+  1. files of a different size are ruled out from the stat() alone,
+  2. same-size candidates are compared by the digest of their first
+     PARTIAL_BYTES,
+  3. only those still matching are hashed in full.
+Every digest computed goes into the persistent index, so re-running over
+the same library costs little more than the directory walk.
+
+Sources the index never saw, and references that were never registered,
+fall back to a unique file name match, like "Auto-scan folder".
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from .lib import source_exists
+
+RELINK_WORKERS = 8
+
+
+def missing_sources(file_map):
+    """{relpath: source} of registered files whose source can't be read any more."""
+    return {rel: src for rel, src in file_map.items()
+            if not isinstance(src, (bytes, bytearray)) and not source_exists(src)}
+
+
+def scan_folders(folders):
+    """{size: [paths]} and {lowercased file name: [paths]} of every file under the folders."""
+    by_size, by_name = {}, {}
+    seen = set()
+    for folder in folders:
+        for root_dir, dirs, files in os.walk(folder):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            for fname in files:
+                p = os.path.join(root_dir, fname)
+                try:
+                    st = os.stat(p)
+                except OSError:
+                    continue
+                if (st.st_dev, st.st_ino) in seen:
+                    continue
+                seen.add((st.st_dev, st.st_ino))
+                by_size.setdefault(st.st_size, []).append(p)
+                by_name.setdefault(fname.lower(), []).append(p)
+    return by_size, by_name
+
+
+def _match_by_content(targets, by_size, digests, workers):
+    """targets {rel: index entry} -> {rel: path} of files with the same content."""
+    wanted = {}
+    for rel, e in targets.items():
+        wanted.setdefault(e.get("member_size", e["size"]), []).append(rel)
+    jobs = [(size, path) for size in wanted for path in by_size.get(size, ())]
+    if not jobs:
+        return {}
+
+    def check(job):
+        size, path = job
+        rels = wanted[size]
+        heads = {targets[r].get("head") for r in rels}
+        # targets recorded before heads were kept can't be pre-checked
+        if None not in heads and digests.head_digest(path) not in heads:
+            return path, None
+        return path, digests.digest(path)
+
+    found = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for (size, _), (path, sha) in zip(jobs, pool.map(check, jobs)):
+            if sha is None:
+                continue
+            for rel in wanted[size]:
+                if rel not in found and targets[rel]["sha256"] == sha:
+                    found[rel] = path
+    return found
+
+
+def find_relinks(file_map, references, folders, digests, workers=RELINK_WORKERS):
+    """New sources for missing files: ({relpath: (path, "content" | "name")}, [relpaths still missing]).
+
+    file_map is the project's relpath -> source map, references the relpaths the payload uses.
+    """
+    missing = missing_sources(file_map)
+    unregistered = [rel for rel in references if rel not in file_map]
+    targets = {}
+    for rel, src in missing.items():
+        e = digests.recorded(src)
+        if e and e.get("sha256") and "size" in e:
+            targets[rel] = e
+    by_size, by_name = scan_folders(folders)
+    found = {rel: (p, "content") for rel, p in _match_by_content(targets, by_size, digests, workers).items()}
+    for rel in sorted(set(missing) - set(targets)) + sorted(unregistered):
+        hits = by_name.get(rel.replace("\\", "/").rsplit("/", 1)[-1].lower(), [])
+        if len(hits) == 1:
+            found[rel] = (hits[0], "name")
+    digests.save()
+    still = sorted((set(missing) | set(unregistered)) - set(found))
+    return found, still
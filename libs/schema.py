@@ -0,0 +1,199 @@
+"""
+Declarative schema of the mod payload sections.
+Each section lists where its file references live; path extractors and
+validators are compiled from that once, at import time, and drive import,
+validation and export.
+
+Path specs are dotted field paths where `[]` visits every list item and `*`
+every dict value, e.g. "items[].path" or "sounds.*[]". Only strings found at
+the end of a spec count as file references.
+"""
+
+from .lib import is_nonempty_list_of_dicts
+
+
+def _compile_steps(steps):
+    if not steps:
+        def leaf(o, out):
+            if isinstance(o, str) and o:
+                out.append(o)
+        return leaf
+    step, rest = steps[0], _compile_steps(steps[1:])
+    if step == "[]":
+        def each(o, out):
+            if isinstance(o, list):
+                for i in o:
+                    rest(i, out)
+        return each
+    if step == "*":
+        def values(o, out):
+            if isinstance(o, dict):
+                for v in o.values():
+                    rest(v, out)
+        return values
+    def field(o, out):
+        if isinstance(o, dict) and step in o:
+            rest(o[step], out)
+    return field
+
+
+def _parse_spec(spec):
+    steps = []
+    for part in spec.split("."):
+        while part.endswith("[]"):
+            part = part[:-2]
+            if part:
+                steps.append(part)
+            steps.append("[]")
+            part = ""
+        if part:
+            steps.append(part)
+    return steps
+
+
+def compile_paths(specs):
+    """Extractor entry -> list of referenced relpaths for a set of path specs."""
+    walkers = [_compile_steps(_parse_spec(s)) for s in specs]
+    def extract(entry):
+        out = []
+        for w in walkers:
+            w(entry, out)
+        return out
+    return extract
+
+
+def compile_validator(key, required):
+    """Validator section value -> list of issue strings. Empty sections are omitted
+    from the manifest, so only non-empty ones are checked."""
+    def validate(val):
+        if not val:
+            return []
+        if not is_nonempty_list_of_dicts(val):
+            return [f"{key} must be a non-empty array of objects when present."]
+        issues = []
+        for i, el in enumerate(val):
+            for field in required:
+                if not el.get(field):
+                    issues.append(f"{key}[{i}] has empty or missing '{field}'.")
+        return issues
+    return validate
+
+
+def _row_id_name(e):
+    return f"{e.get('id')} : {e.get('name')}"
+
+
+def _row_with_path(e):
+    return f"{e.get('id')} : {e.get('name')} -> {e.get('path')}"
+
+
+def _row_items(e):
+    return f"{e.get('id')} : {e.get('name')} ({len(e.get('items', []))} items)"
+
+
+def _row_css(e):
+    return f"{e.get('id')} : {e.get('name')} -> {', '.join(c for c in e.get('css') or [] if isinstance(c, str))}"
+
+
+def _normalize_music(bg):
+    if not isinstance(bg, dict):
+        return None
+    tracks = [t for t in bg.get('tracks', []) if isinstance(t, str)]
+    return {"id": bg.get('id', '0'), "name": bg.get('name', 'Background Music'), "tracks": tracks}
+
+
+def _normalize_pack(pack):
+    if not isinstance(pack, dict):
+        return None
+    sounds = {}
+    raw = pack.get('sounds', {})
+    for ev, arr in (raw.items() if isinstance(raw, dict) else ()):
+        if not isinstance(ev, str) or not isinstance(arr, list):
+            continue
+        norm = []
+        for it in arr:
+            if isinstance(it, str):
+                norm.append(it)
+            elif isinstance(it, dict) and isinstance(it.get('src'), str):
+                norm.append(it['src'])
+        if norm:
+            sounds[ev] = norm
+    return {"id": pack.get('id', '0'), "name": pack.get('name', ''), "sounds": sounds}
+
+
+def _normalize_entry(entry):
+    return entry if isinstance(entry, dict) else None
+
+
+class Section:
+    """One payload section: where its files are referenced and how it is shown, imported and checked."""
+
+    def __init__(self, key, listbox, paths=(), required=(), row=_row_id_name, normalize=_normalize_entry,
+                 import_mode="append", wrap_dict=False):
+        self.key = key
+        self.listbox = listbox
+        self.paths = tuple(paths)
+        self.required = tuple(required)
+        self.row = row
+        self.normalize = normalize
+        # "append" adds imported entries to existing ones, "replace" swaps the section
+        self.import_mode = import_mode
+        # a single object is accepted and wrapped into a one-element array
+        self.wrap_dict = wrap_dict
+        self.extract_entry = compile_paths(self.paths)
+        self.validate = compile_validator(key, self.required)
+
+    def extract(self, val):
+        """Referenced relpaths of a whole section value."""
+        if self.wrap_dict and isinstance(val, dict):
+            val = [val]
+        out = []
+        if isinstance(val, list):
+            for entry in val:
+                out.extend(self.extract_entry(entry))
+        return out
+
+
+SCHEMA = (
+    Section("app_icon", "app_icon_list", paths=("path",), row=_row_with_path),
+    Section("background_music", "bgmusic_list", paths=("tracks[]",), required=("tracks",),
+            normalize=_normalize_music),
+    Section("browser_sounds", "browser_sounds_listbox", paths=("sounds.*[]", "sounds.*[].src"),
+            required=("sounds",), normalize=_normalize_pack),
+    Section("keyboard_sounds", "keyboard_sounds_listbox", paths=("sounds.*[]", "sounds.*[].src"),
+            required=("sounds",), normalize=_normalize_pack),
+    Section("cursors", "cursors_list", paths=("items[].path", "preview"), row=_row_items),
+    Section("fonts", "fonts_list", paths=("header.variants[].path", "body.variants[].path")),
+    Section("mobile_image_overrides", "mobile_list", paths=("images.*",), import_mode="replace"),
+    Section("splash_screen", "splash_list", paths=("path",), row=_row_with_path),
+    Section("theme", "theme_list", import_mode="replace"),
+    Section("wallpaper", "wp_list",
+            paths=("dark.image", "dark.first_frame_image", "light.image", "light.first_frame_image"),
+            import_mode="replace", wrap_dict=True),
+    Section("page_styles", "pages_list", paths=("css[]",), row=_row_css, import_mode="replace", wrap_dict=True),
+)
+
+SECTIONS = {s.key: s for s in SCHEMA}
+PAYLOAD_KEYS = tuple(s.key for s in SCHEMA)
+
+
+def referenced_paths(payload):
+    """All file relpaths referenced by known path fields of a payload."""
+    refs = set()
+    if isinstance(payload, dict):
+        for s in SCHEMA:
+            if s.key in payload:
+                refs.update(s.extract(payload[s.key]))
+    return refs
+
+
+def section_paths(payload):
+    """{section key: [relpaths]} for the sections present in payload."""
+    return {s.key: s.extract(payload[s.key]) for s in SCHEMA if isinstance(payload, dict) and s.key in payload}
+
+
+def validate_payload(payload):
+    issues = []
+    for s in SCHEMA:
+        issues.extend(s.validate(payload.get(s.key)))
+    return issues
@@ -0,0 +1,309 @@
+"""
+Local update server: a stand-in for real hosting to test update delivery.
+
+Serves every exported mod ZIP in a folder plus a generated update manifest:
+    /update.json        all builds, newest first, and "latest"
+                        (?flavor=<hash> answers 304 if that is already the latest build)
+    /latest.zip         the newest build
+    /<file>.zip         a build by file name
+
+ZIPs carry a strong ETag derived from the archive itself (size plus every
+member's name and CRC, manifest and icons included), so a client sending
+If-None-Match with the tag it has gets 304. mod.flavor.hash only covers the
+payload, so it is used for the update.json ?flavor= check alone. Single byte ranges (and If-Range)
+are honoured so interrupted downloads resume; the update manifest is sent
+gzip-compressed when the client accepts it, compressed once per rescan.
+"""
+
+import os
+import re
+import gzip
+import json
+import time
+import zipfile
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote
+
+from .delta import DELTA_INFO_NAME
+
+UPDATE_MANIFEST_NAME = "update.json"
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# the folder is re-scanned at most this often (seconds)
+RESCAN_INTERVAL = 1.0
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def version_key(v):
+    return tuple(int(p) if p.isdigit() else 0 for p in re.split(r"[.\-+]", str(v or "0")))
+
+
+def read_build_info(path):
+    """Name, version and flavor hashes from a build's manifest.json (None if it isn't a mod ZIP)."""
+    try:
+        with zipfile.ZipFile(path) as zf:
+            names = set(zf.namelist())
+            if "manifest.json" not in names:
+                return None
+            m = json.loads(zf.read("manifest.json").decode("utf-8"))
+    except (OSError, ValueError, zipfile.BadZipFile):
+        return None
+    flavor = (m.get('mod') or {}).get('flavor') or {}
+    return {
+        "name": m.get('name'),
+        "version": m.get('version'),
+        "flavor_hash": flavor.get('hash'),
+        "parent_hash": flavor.get('parent_hash'),
+        "delta": DELTA_INFO_NAME in names,
+    }
+
+
+def build_etag(path, st):
+    """Strong ETag of a ZIP: size plus the name and CRC of every member, in order."""
+    h = hashlib.sha256(f"{st.st_size}\0".encode())
+    try:
+        with zipfile.ZipFile(path) as zf:
+            for info in zf.infolist():
+                h.update(f"{info.filename}\0{info.CRC:08x}\0{info.compress_size}\0".encode("utf-8"))
+    except (OSError, zipfile.BadZipFile):
+        h.update(f"{st.st_mtime_ns}".encode())
+    return f'"{h.hexdigest()[:32]}"'
+
+
+def accepts_gzip(header):
+    """True if an Accept-Encoding header allows gzip with a non-zero q-value."""
+    q = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params.split(";"):
+            k, _, v = param.strip().partition("=")
+            if k.strip().lower() == "q":
+                try:
+                    weight = float(v)
+                except ValueError:
+                    weight = 0.0
+        q[coding] = weight
+    if "gzip" in q:
+        return q["gzip"] > 0
+    if "x-gzip" in q:
+        return q["x-gzip"] > 0
+    return q.get("*", 0) > 0
+
+
+class Build:
+    __slots__ = ("file", "path", "size", "mtime_ns", "info", "etag")
+
+    def __init__(self, file, path, st, info):
+        self.file = file
+        self.path = path
+        self.size = st.st_size
+        self.mtime_ns = st.st_mtime_ns
+        self.info = info
+        self.etag = build_etag(path, st)
+
+
+class BuildIndex:
+    """Builds in a folder; ZIP manifests are only re-read when a file's size or mtime changes."""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.lock = threading.Lock()
+        self.builds = {}
+        self.latest = None
+        self.manifest_bytes = b""
+        self.manifest_gzip = b""
+        self.manifest_etag = '""'
+        self.checked = 0.0
+        self.refresh(force=True)
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.checked < RESCAN_INTERVAL:
+            return
+        with self.lock:
+            if not force and now - self.checked < RESCAN_INTERVAL:
+                return
+            self.checked = now
+            builds = {}
+            try:
+                names = sorted(n for n in os.listdir(self.root) if n.lower().endswith(".zip"))
+            except OSError:
+                names = []
+            for n in names:
+                p = os.path.join(self.root, n)
+                try:
+                    st = os.stat(p)
+                except OSError:
+                    continue
+                old = self.builds.get(n)
+                if old and old.size == st.st_size and old.mtime_ns == st.st_mtime_ns:
+                    builds[n] = old
+                    continue
+                info = read_build_info(p)
+                if info is not None:
+                    builds[n] = Build(n, p, st, info)
+            if builds.keys() == self.builds.keys() and all(builds[n] is self.builds[n] for n in builds) and not force:
+                return
+            self.builds = builds
+            self._render_manifest()
+
+    def _render_manifest(self):
+        ordered = sorted(self.builds.values(),
+                         key=lambda b: (not b.info["delta"], version_key(b.info["version"]), b.mtime_ns), reverse=True)
+        full = [b for b in ordered if not b.info["delta"]]
+        self.latest = full[0] if full else None
+        entries = [dict(b.info, file=b.file, url=b.file, size=b.size) for b in ordered]
+        doc = {"latest": dict(self.latest.info, file=self.latest.file, url=self.latest.file, size=self.latest.size)
+                         if self.latest else None,
+               "builds": entries}
+        self.manifest_bytes = (json.dumps(doc, indent=2, ensure_ascii=False) + "\n").encode("utf-8")
+        self.manifest_gzip = gzip.compress(self.manifest_bytes, 9, mtime=0)
+        self.manifest_etag = f'"{hashlib.sha256(self.manifest_bytes).hexdigest()[:32]}"'
+
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tags = [t.strip() for t in header.split(",")]
+    # weak comparison is fine for If-None-Match
+    return any(t == etag or t == "W/" + etag or t.strip('"') == etag.strip('"') for t in tags)
+
+
+def parse_range(header, size):
+    """(start, end inclusive) for a single byte range, None to ignore the header, "invalid" for 416."""
+    m = _RANGE.match(header.strip()) if header else None
+    if not m:
+        return None
+    a, b = m.groups()
+    if not a and not b:
+        return None
+    if not a:
+        n = int(b)
+        if n == 0:
+            return "invalid"
+        return max(size - n, 0), size - 1
+    start = int(a)
+    end = int(b) if b else size - 1
+    if start >= size or end < start:
+        return "invalid"
+    return start, min(end, size - 1)
+
+
+class UpdateRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "GXBuilderUpdateServer/1.0"
+    # headers and body go out in separate writes; don't let Nagle hold the body back
+    disable_nagle_algorithm = True
+
+    def log_message(self, fmt, *args):
+        log = getattr(self.server, "log", None)
+        if log is not None:
+            log(f"{self.address_string()} {fmt % args}")
+
+    def do_HEAD(self):
+        self.do_GET(head=True)
+
+    def do_GET(self, head=False):
+        index = self.server.index
+        index.refresh()
+        url = urlsplit(self.path)
+        name = unquote(url.path).lstrip("/")
+        if name in ("", UPDATE_MANIFEST_NAME):
+            self.send_update_manifest(index, parse_qs(url.query), head)
+            return
+        build = index.latest if name == "latest.zip" else index.builds.get(name)
+        if build is None:
+            self.send_empty(404)
+            return
+        self.send_build(build, head)
+
+    def send_empty(self, code, headers=()):
+        self.send_response(code)
+        for k, v in headers:
+            self.send_header(k, v)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def send_update_manifest(self, index, query, head):
+        have = (query.get("flavor") or [None])[0]
+        if (have and index.latest and have == index.latest.info.get("flavor_hash")) or \
+                _etag_matches(self.headers.get("If-None-Match"), index.manifest_etag):
+            self.send_empty(304, [("ETag", index.manifest_etag), ("Cache-Control", "no-cache")])
+            return
+        gz = accepts_gzip(self.headers.get("Accept-Encoding"))
+        body = index.manifest_gzip if gz else index.manifest_bytes
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("ETag", index.manifest_etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+        if gz:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def send_build(self, build, head):
+        common = [("ETag", build.etag), ("Accept-Ranges", "bytes"), ("Cache-Control", "no-cache")]
+        if _etag_matches(self.headers.get("If-None-Match"), build.etag):
+            self.send_empty(304, common)
+            return
+        size = build.size
+        rng = parse_range(self.headers.get("Range"), size)
+        if_range = self.headers.get("If-Range")
+        if rng is not None and if_range and if_range.strip() != build.etag:
+            # the client's partial copy is of another build: send the whole file
+            rng = None
+        if rng == "invalid":
+            self.send_empty(416, common + [("Content-Range", f"bytes */{size}")])
+            return
+        start, end = rng if rng else (0, size - 1)
+        length = end - start + 1 if size else 0
+        self.send_response(206 if rng else 200)
+        self.send_header("Content-Type", "application/zip")
+        for k, v in common:
+            self.send_header(k, v)
+        if rng:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(length))
+        self.end_headers()
+        if head or not length:
+            return
+        try:
+            with open(build.path, "rb") as f:
+                # zero-copy where the platform allows it
+                self.connection.sendfile(f, start, length)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+
+class UpdateServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, root, host=DEFAULT_HOST, port=DEFAULT_PORT, log=None):
+        self.index = BuildIndex(root)
+        self.log = log
+        super().__init__((host, port), UpdateRequestHandler)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+
+def serve_in_thread(root, host=DEFAULT_HOST, port=DEFAULT_PORT, log=None):
+    """Start an UpdateServer on a background thread; stop it with server.shutdown()."""
+    server = UpdateServer(root, host, port, log)
+    t = threading.Thread(target=server.serve_forever, name="gx-update-server", daemon=True)
+    t.start()
+    return server
@@ -0,0 +1,68 @@
+"""
+Export stages: optional transforms applied to a build right before it is written.
+
+A stage is a function (manifest, file_map, ctx) that may rewrite both in
+place: swap sources for processed copies, add generated files, drop files
+nothing references any more and point manifest entries at the results (the
+manifest's payload lists are the project's own, so stages replace them
+instead of editing them). prepare_export() runs the enabled stages in
+EXPORT_STAGES order before the flavor hash is taken, so the hash, the build
+cache key and every writer see exactly the files that ship.
+
+Stage outputs are cached under ~/.gx_builder/stage_cache/<stage>, keyed by
+the digests of their inputs.
+"""
+
+import os
+
+from .lib import USER_DATA_DIR
+from .cache import BuildCache
+from .css import bundle_page_styles
+from .mp4 import faststart_videos
+from .tags import strip_mp3_tags
+from .audio import trim_keyboard_wavs, compact_keyboard_wavs
+
+STAGE_CACHE_DIR = os.path.join(USER_DATA_DIR, "stage_cache")
+# entries used by the running export are kept even past this (see BuildCache pin)
+STAGE_CACHE_MAX_BYTES = 4 << 30
+
+# (name, label, function), in the order they run
+EXPORT_STAGES = (
+    ("css", "Bundle + minify page-style CSS", bundle_page_styles),
+    ("mp4", "Faststart splash / wallpaper MP4s", faststart_videos),
+    ("tags", "Strip ID3 / APE tags and artwork from MP3s", strip_mp3_tags),
+    ("wav_trim", "Trim silence from keyboard WAVs", trim_keyboard_wavs),
+    ("wav_compact", "Keyboard WAVs as mono 16-bit, max 44.1 kHz", compact_keyboard_wavs),
+)
+DEFAULT_STAGES = ("css", "mp4")
+
+
+class StageContext:
+    def __init__(self, digests, root=STAGE_CACHE_DIR, log=None, governor=None):
+        self.digests = digests
+        self.root = root
+        self._log = log
+        # cache writes go through it (libs/throttle.py)
+        self.governor = governor
+
+    def for_export(self, log, governor=None):
+        """Same caches, with the log and I/O governor of one export."""
+        return StageContext(self.digests, self.root, log, governor)
+
+    def cache(self, stage, suffix):
+        return BuildCache(os.path.join(self.root, stage), STAGE_CACHE_MAX_BYTES, suffix=suffix, pin=True)
+
+    def log(self, msg):
+        if self._log:
+            self._log(msg)
+
+
+def run_export_stages(manifest, file_map, ctx, enabled=DEFAULT_STAGES):
+    """Run the enabled stages; one that fails is logged and skipped (the build ships unprocessed files)."""
+    for name, label, fn in EXPORT_STAGES:
+        if name not in enabled:
+            continue
+        try:
+            fn(manifest, file_map, ctx)
+        except Exception as e:
+            ctx.log(f"{label} failed, skipped: {e}")
@@ -0,0 +1,207 @@
+"""
+Local content-addressed asset store shared by all projects.
+
+Layout under ~/.gx_builder/store:
+    objects/ab/abcdef...   one read-only file per unique sha256
+    refs/<id>.json         objects used by one export folder: {"out", "name", "objects": {relpath: sha256}}
+
+Folder exports in "store" link mode register their assets here and link the
+export to the stored blob (reflink, else hardlink, else copy), so a sound or
+font shared by many mods exists once on disk. Digests come from the shared
+DigestIndex, so each source is hashed once no matter how many projects use it.
+"""
+
+import os
+import json
+import hashlib
+import threading
+
+from .lib import USER_DATA_DIR, ensure_dir, iter_source_chunks
+from .cache import DigestIndex
+from .export import place_file
+from .analyze import format_bytes
+
+STORE_DIR = os.path.join(USER_DATA_DIR, "store")
+
+
+class AssetStore:
+
+    def __init__(self, root=STORE_DIR, digests=None):
+        self.root = os.path.abspath(root)
+        self.objects_dir = os.path.join(self.root, "objects")
+        self.refs_dir = os.path.join(self.root, "refs")
+        self.digests = digests if digests is not None else DigestIndex()
+        self.lock = threading.Lock()
+
+    def object_path(self, sha):
+        return os.path.join(self.objects_dir, sha[:2], sha)
+
+    def source_sha(self, src):
+        if isinstance(src, (bytes, bytearray)):
+            return hashlib.sha256(src).hexdigest()
+        return self.digests.digest(src)
+
+    def add(self, src):
+        """Path of the stored blob holding src's content, or None if src can't be read.
+        A blob already in the store is not written again."""
+        sha = self.source_sha(src)
+        if sha is None:
+            return None
+        p = self.object_path(sha)
+        if os.path.isfile(p):
+            return p
+        ensure_dir(os.path.dirname(p))
+        tmp = f"{p}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            if isinstance(src, str):
+                # never hardlink a source in: editing it in place would change the blob
+                place_file(src, tmp, "reflink")
+            else:
+                with open(tmp, "wb") as f:
+                    for buf in iter_source_chunks(src):
+                        f.write(buf)
+            os.chmod(tmp, 0o444)
+            os.replace(tmp, p)
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return None
+        return p
+
+    def object_map(self, file_map):
+        """{relpath: sha256} for the readable file sources of a files_to_include map
+        (generated bytes are written straight into exports, not stored)."""
+        out = {}
+        for rel, src in file_map.items():
+            if isinstance(src, (bytes, bytearray)):
+                continue
+            sha = self.source_sha(src)
+            if sha is not None:
+                out[rel] = sha
+        return out
+
+    # ---------- refs ----------
+    def ref_path(self, out):
+        key = hashlib.sha1(os.path.abspath(out).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.refs_dir, key + ".json")
+
+    def set_refs(self, out, objects, name=None):
+        """Record the blobs an export folder uses (replaces its previous record)."""
+        ensure_dir(self.refs_dir)
+        data = {"out": os.path.abspath(out), "name": name, "objects": dict(sorted(objects.items()))}
+        path = self.ref_path(out)
+        tmp = path + ".tmp"
+        with self.lock:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp, path)
+
+    def load_refs(self):
+        refs = []
+        try:
+            names = sorted(os.listdir(self.refs_dir))
+        except OSError:
+            return refs
+        for n in names:
+            if not n.endswith(".json"):
+                continue
+            p = os.path.join(self.refs_dir, n)
+            try:
+                with open(p, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if isinstance(data, dict) and isinstance(data.get("objects"), dict):
+                data["_path"] = p
+                refs.append(data)
+        return refs
+
+    def iter_objects(self):
+        """(sha256, path, size) of every stored blob."""
+        try:
+            prefixes = sorted(os.listdir(self.objects_dir))
+        except OSError:
+            return
+        for pre in prefixes:
+            d = os.path.join(self.objects_dir, pre)
+            try:
+                names = sorted(os.listdir(d))
+            except OSError:
+                continue
+            for n in names:
+                p = os.path.join(d, n)
+                try:
+                    size = os.stat(p).st_size
+                except OSError:
+                    continue
+                yield n, p, size
+
+    # ---------- maintenance ----------
+    def usage(self):
+        """Disk usage report: stored blobs vs. what the registered projects would take as copies."""
+        sizes = {}
+        tmp_bytes = 0
+        for sha, _, size in self.iter_objects():
+            if sha.endswith(".tmp"):
+                tmp_bytes += size
+            else:
+                sizes[sha] = size
+        projects = []
+        referenced = set()
+        logical = 0
+        for r in self.load_refs():
+            objs = r["objects"]
+            b = sum(sizes.get(sha, 0) for sha in objs.values())
+            projects.append({"out": r.get("out"), "name": r.get("name"), "files": len(objs), "bytes": b,
+                             "exists": bool(r.get("out")) and os.path.isdir(r["out"])})
+            referenced.update(objs.values())
+            logical += b
+        stored = sum(sizes.values())
+        unref = [sha for sha in sizes if sha not in referenced]
+        return {
+            "objects": len(sizes),
+            "stored_bytes": stored,
+            "logical_bytes": logical,
+            "unreferenced_objects": len(unref),
+            "unreferenced_bytes": sum(sizes[sha] for sha in unref) + tmp_bytes,
+            "projects": projects,
+        }
+
+    def gc(self, drop_missing_projects=True):
+        """Remove blobs no project references (and leftover temp files).
+        Records of export folders that no longer exist are dropped first. Returns (blobs removed, bytes freed)."""
+        referenced = set()
+        for r in self.load_refs():
+            if drop_missing_projects and not (r.get("out") and os.path.isdir(r["out"])):
+                try:
+                    os.remove(r["_path"])
+                except OSError:
+                    pass
+                continue
+            referenced.update(r["objects"].values())
+        removed = freed = 0
+        with self.lock:
+            for sha, p, size in list(self.iter_objects()):
+                if sha in referenced:
+                    continue
+                try:
+                    os.chmod(p, 0o644)  # read-only files can't be deleted on Windows
+                    os.remove(p)
+                    removed += 1; freed += size
+                except OSError:
+                    pass
+        return removed, freed
+
+
+def format_usage(report):
+    saved = report["logical_bytes"] - report["stored_bytes"] + report["unreferenced_bytes"]
+    lines = [f"Asset store: {report['objects']} blobs, {format_bytes(report['stored_bytes'])} on disk",
+             f"  used by {len(report['projects'])} export(s) totalling {format_bytes(report['logical_bytes'])}"
+             f" ({format_bytes(max(saved, 0))} saved by sharing)",
+             f"  unreferenced: {report['unreferenced_objects']} blobs, {format_bytes(report['unreferenced_bytes'])}"]
+    for p in sorted(report["projects"], key=lambda p: -p["bytes"]):
+        gone = "" if p["exists"] else "  [folder gone]"
+        lines.append(f"  {format_bytes(p['bytes']):>10}  {p['files']:>5} files  {p['name'] or '?'} -> {p['out']}{gone}")
+    return lines
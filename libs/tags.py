@@ -0,0 +1,178 @@
+"""
+Tag stripping export stage for MP3s (see libs/stages.py).
+
+Tracks from music libraries carry ID3v2 tags, often with hundreds of KB of
+embedded cover art, plus ID3v1 / APEv2 / Lyrics3 tags at the end. The
+browser never reads any of them. This stage cuts every tag off the front
+and back of the background_music and sound pack MP3s. The audio frames in
+between are streamed through byte for byte. Files are processed on a
+thread pool and cached by source digest.
+"""
+
+import struct
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from .lib import open_source, copy_range, source_size
+from .schema import SECTIONS
+from .analyze import format_bytes
+
+# bump when the stripping changes so cached outputs are rebuilt
+TAGS_FORMAT_VERSION = 1
+TAG_WORKERS = 8
+
+# sections whose MP3s are stripped, and how their entries are named in the report
+TAG_SECTIONS = (("background_music", "Music"), ("browser_sounds", "Browser sounds"),
+                ("keyboard_sounds", "Keyboard sounds"))
+
+# cache key -> (audio start, audio end, size), or None when the file has no tags
+_strip_memo = {}
+
+
+def _syncsafe(b):
+    if any(x & 0x80 for x in b):
+        return None
+    return (b[0] << 21) | (b[1] << 14) | (b[2] << 7) | b[3]
+
+
+def _id3v2_size(head):
+    """Total size of an ID3v2 tag from its 10-byte header (or footer), None if it isn't one."""
+    if len(head) < 10 or head[3] == 0xFF or head[4] == 0xFF:
+        return None
+    n = _syncsafe(head[6:10])
+    if n is None:
+        return None
+    # a footer repeats the header
+    return 10 + n + (10 if head[5] & 0x10 else 0)
+
+
+def audio_range(f, size):
+    """(start, end) of the data left once every leading / trailing tag is cut."""
+    start = 0
+    while True:
+        f.seek(start)
+        head = f.read(32)
+        if head[:3] == b"ID3" and _id3v2_size(head) is not None:
+            n = _id3v2_size(head)
+        elif head[:8] == b"APETAGEX" and len(head) == 32:
+            # an APE tag with a header in front; its size field excludes the header
+            n = 32 + struct.unpack("<I", head[12:16])[0]
+        else:
+            break
+        if start + n > size:
+            break
+        start += n
+    end = size
+    while end > start:
+        f.seek(max(start, end - 227))
+        tail = f.read(end - max(start, end - 227))
+        if len(tail) >= 128 and tail[-128:-125] == b"TAG":
+            end -= 128
+            # extended ID3v1 ("TAG+") sits right before the plain one
+            if end - 227 >= start:
+                f.seek(end - 227)
+                if f.read(4) == b"TAG+":
+                    end -= 227
+            continue
+        elif len(tail) >= 32 and tail[-32:-24] == b"APETAGEX":
+            # footer: "APETAGEX", version, size (tag + footer), item count, flags, 8 reserved bytes
+            n, flags = struct.unpack("<I", tail[-20:-16])[0], struct.unpack("<I", tail[-12:-8])[0]
+            n += 32 if flags & 0x80000000 else 0
+        elif len(tail) >= 15 and tail[-9:] == b"LYRICS200" and tail[-15:-9].isdigit():
+            n = int(tail[-15:-9]) + 15
+        elif len(tail) >= 10 and tail[-10:-7] == b"3DI" and _id3v2_size(tail[-10:]) is not None:
+            n = _id3v2_size(tail[-10:])
+        else:
+            break
+        if n < 10 or n > end - start:
+            break
+        end -= n
+    return start, max(start, end)
+
+
+def tagged_mp3s(payload):
+    """[(report label, set name, relpath)] of the MP3s in TAG_SECTIONS."""
+    out = []
+    for key, label in TAG_SECTIONS:
+        val = payload.get(key)
+        section = SECTIONS[key]
+        for i, entry in enumerate(val if isinstance(val, list) else ()):
+            if not isinstance(entry, dict):
+                continue
+            name = entry.get('name') or entry.get('id') or str(i)
+            for rel in section.extract_entry(entry):
+                if rel.lower().endswith(".mp3"):
+                    out.append((label, name, rel))
+    return out
+
+
+def _strip_one(ctx, cache, src, sha):
+    """(output path, bytes before, bytes after) for one source with digest sha, or None to keep it."""
+    key = hashlib.sha256(f"gx-tags-v{TAGS_FORMAT_VERSION}\0{sha}".encode()).hexdigest()
+    path = cache.get(key)
+    if key in _strip_memo and (_strip_memo[key] is None or path is not None):
+        kept = _strip_memo[key]
+    else:
+        f = open_source(src)
+        try:
+            size = source_size(src)
+            start, end = audio_range(f, size)
+            kept = None if (start, end) == (0, size) or end <= start else (start, end, size)
+            if kept is not None and path is None:
+                path = cache.put_with(key, lambda out: copy_range(f, out, start, end - start), ctx.governor)
+        finally:
+            f.close()
+        _strip_memo[key] = kept
+    if kept is None:
+        return None
+    start, end, size = kept
+    return path, size, end - start
+
+
+def strip_mp3_tags(manifest, file_map, ctx):
+    """Export stage: cut ID3 / APE / Lyrics3 tags (and the artwork in them) off music and sound pack MP3s."""
+    payload = manifest.get('mod', {}).get('payload') or {}
+    found = tagged_mp3s(payload)
+    rels = sorted({rel for _, _, rel in found if rel in file_map})
+    if not rels:
+        return
+    cache = ctx.cache("tags", ".mp3")
+
+    def digest(rel):
+        return ctx.digests.source_digest(file_map[rel])
+
+    def work(group):
+        try:
+            return _strip_one(ctx, cache, file_map[group[1][0]], group[0])
+        except (OSError, ValueError, struct.error) as e:
+            return e
+
+    # the log may be a Tk widget: only this thread touches it
+    init = ctx.governor.init_worker if ctx.governor is not None else None
+    with ThreadPoolExecutor(max_workers=TAG_WORKERS, initializer=init) as pool:
+        # one job per content: copies of one sound under several events share a cache entry
+        by_sha = {}
+        for rel, sha in zip(rels, pool.map(digest, rels)):
+            if sha is not None:
+                by_sha.setdefault(sha, []).append(rel)
+        outcomes = pool.map(work, by_sha.items())
+        results = {rel: r for (_, group), r in zip(by_sha.items(), outcomes) for rel in group}
+    sets = {}
+    for label, name, rel in found:
+        r = results.get(rel)
+        if isinstance(r, tuple):
+            sets.setdefault((label, name), {})[rel] = r
+    for rel, r in results.items():
+        if isinstance(r, Exception):
+            ctx.log(f"Tags: {rel}: {r}, left as is")
+        elif r is not None:
+            file_map[rel] = r[0]
+    for (label, name), files in sets.items():
+        before = sum(b for _, b, _ in files.values())
+        after = sum(a for _, _, a in files.values())
+        ctx.log(f"Tags: {label} '{name}': {len(files)} file(s), {format_bytes(before - after)} of tags removed "
+                f"({format_bytes(before)} -> {format_bytes(after)})")
+    stripped = [r for r in results.values() if isinstance(r, tuple)]
+    if stripped:
+        ctx.log(f"Tags: {len(stripped)} of {len(rels)} MP3(s) stripped, "
+                f"{format_bytes(sum(b - a for _, b, a in stripped))} saved")
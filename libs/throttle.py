@@ -0,0 +1,206 @@
+"""
+I/O governor for exports on shared build hosts.
+
+An export normally reads and writes as fast as the disk allows. On a shared
+build host or NAS that starves every other job. An IOGovernor passed to
+the export writers (folder, ZIP, delta, matrix), the stage and build caches
+and verify_export provides three controls:
+  - a token bucket limiting the bytes written (and re-read by verify) per
+    second; a transfer that overdraws the bucket sleeps until it has been
+    paid back,
+  - a cap on the number of files being written at once (matters for the
+    matrix build, which writes on a thread pool),
+  - lower I/O priority and CPU nice for the threads doing the export, where
+    the OS allows it: ioprio "best effort, level 7" on Linux, the throttle
+    I/O policy on macOS, background mode on Windows.
+An unprivileged process can't undo nice, so both are only applied to
+threads that end with the export (see init_worker); the GUI runs a
+governed export on a worker thread of its own, which also keeps the
+bucket's sleeps off the Tk thread.
+
+The governor counts what it lets through, so report() gives the measured
+throughput and how long the limit held the export back.
+"""
+
+import os
+import sys
+import time
+import shutil
+import ctypes
+import platform
+import threading
+from contextlib import contextmanager
+
+from .lib import iter_file_chunks
+from .analyze import format_bytes
+
+# ioprio_set syscall numbers
+IOPRIO_SET = {"x86_64": 251, "amd64": 251, "aarch64": 30, "arm64": 30, "i386": 289, "i686": 289, "armv7l": 314}
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_CLASS_SHIFT = 13
+# best effort, lowest level: needs no privileges
+IOPRIO_LOW = (2 << IOPRIO_CLASS_SHIFT) | 7
+# macOS setiopolicy_np
+IOPOL_TYPE_DISK = 0
+IOPOL_SCOPE_THREAD = 1
+IOPOL_THROTTLE = 3
+# Windows SetThreadPriority
+THREAD_MODE_BACKGROUND_BEGIN = 0x00010000
+LOW_NICE = 10
+
+# a fraction of a second of the limit may be written in one burst
+BURST_SECONDS = 0.25
+
+_libc = None
+
+
+def _c():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(None, use_errno=True)
+    return _libc
+
+
+def _lower_io_priority():
+    """Lower the calling thread's I/O priority. False if the OS doesn't let us."""
+    try:
+        if sys.platform.startswith("linux"):
+            nr = IOPRIO_SET.get(platform.machine().lower())
+            # with who = 0, ioprio applies to the calling thread only
+            return nr is not None and _c().syscall(nr, IOPRIO_WHO_PROCESS, 0, IOPRIO_LOW) >= 0
+        if sys.platform == "darwin":
+            return _c().setiopolicy_np(IOPOL_TYPE_DISK, IOPOL_SCOPE_THREAD, IOPOL_THROTTLE) >= 0
+        if os.name == "nt":
+            k32 = ctypes.windll.kernel32
+            return bool(k32.SetThreadPriority(k32.GetCurrentThread(), THREAD_MODE_BACKGROUND_BEGIN))
+    except (OSError, AttributeError):
+        pass
+    return False
+
+
+class IOGovernor:
+    """Bandwidth limit, files-in-flight cap and low priority for one export.
+
+    bytes_per_sec / max_in_flight of 0 mean unlimited.
+    """
+
+    def __init__(self, bytes_per_sec=0, max_in_flight=0, low_priority=False):
+        self.rate = bytes_per_sec
+        self.max_in_flight = max_in_flight
+        self.low_priority = low_priority
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(max_in_flight) if max_in_flight > 0 else None
+        self.tokens = self.burst = max(bytes_per_sec * BURST_SECONDS, 1) if bytes_per_sec > 0 else 0
+        self.last = time.monotonic()
+        self.started = None
+        self.transferred = 0
+        self.throttled = 0.0
+        self.files = 0
+        self.in_flight = 0
+        self.peak = 0
+        self.priority_applied = False
+
+    def consume(self, n):
+        """Account for n bytes transferred, sleeping as long as the limit requires."""
+        with self.lock:
+            now = time.monotonic()
+            if self.started is None:
+                self.started = now
+            self.transferred += n
+            if self.rate <= 0:
+                return
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            # the bucket may go into debt: later writers wait for it to be paid back too
+            self.tokens -= n
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+            self.throttled += wait
+        if wait > 0:
+            time.sleep(wait)
+
+    @contextmanager
+    def file(self):
+        """Hold one of the in-flight slots while a file is written."""
+        if self.slots is not None:
+            self.slots.acquire()
+        with self.lock:
+            self.files += 1
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+            if self.slots is not None:
+                self.slots.release()
+
+    def wrap(self, fp):
+        """A file object whose writes go through the bucket."""
+        return _GovernedFile(fp, self)
+
+    def chunks(self, iterable):
+        """Pass read chunks through the bucket."""
+        for buf in iterable:
+            self.consume(len(buf))
+            yield buf
+
+    def copy_to(self, src, fp):
+        """Throttled copy of the file src into the open file fp."""
+        fw = self.wrap(fp)
+        for buf in iter_file_chunks(src):
+            fw.write(buf)
+
+    def copy(self, src, dest):
+        """Chunked, throttled copy of a file (in place of copy_file_range / shutil.copy2)."""
+        with open(dest, "wb") as fd:
+            self.copy_to(src, fd)
+        shutil.copystat(src, dest)
+
+    def init_worker(self):
+        """Lower the calling thread's priority, for threads that end with the export
+        (the GUI's export thread, ThreadPoolExecutor initializer)."""
+        if not self.low_priority:
+            return
+        if _lower_io_priority():
+            self.priority_applied = True
+        if hasattr(os, "setpriority") and sys.platform.startswith("linux"):
+            try:
+                # Linux applies PRIO_PROCESS to a single thread when given its thread id
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), LOW_NICE)
+            except OSError:
+                pass
+
+    def progress(self):
+        """Short status line while the export runs."""
+        elapsed = time.monotonic() - self.started if self.started is not None else 0.0
+        speed = f", {format_bytes(self.transferred / elapsed)}/s" if elapsed > 0 else ""
+        return f"{format_bytes(self.transferred)} transferred{speed}, {self.in_flight} file(s) in flight"
+
+    def report(self):
+        """One log line with the measured throughput."""
+        elapsed = time.monotonic() - self.started if self.started is not None else 0.0
+        speed = f"{format_bytes(self.transferred / elapsed)}/s" if elapsed > 0 else "n/a"
+        parts = [f"I/O: {format_bytes(self.transferred)} transferred in {elapsed:.1f}s ({speed})"]
+        if self.rate > 0:
+            parts.append(f"limit {format_bytes(self.rate)}/s, held back {self.throttled:.1f}s")
+        parts.append(f"{self.files} file(s), at most {self.peak} at once"
+                     + (f" (cap {self.max_in_flight})" if self.max_in_flight > 0 else ""))
+        if self.low_priority:
+            parts.append("low I/O priority" if self.priority_applied else "low I/O priority not supported here")
+        return ", ".join(parts)
+
+
+class _GovernedFile:
+    """Write-throttling proxy; everything but write() goes straight to the wrapped file."""
+
+    def __init__(self, fp, governor):
+        self._fp = fp
+        self._governor = governor
+
+    def write(self, data):
+        self._governor.consume(len(data))
+        return self._fp.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._fp, name)
@@ -0,0 +1,434 @@
+"""
+Thumbnails of payload images for the GUI.
+
+Images are decoded and downscaled on worker threads: with Pillow when it is
+installed, otherwise by the small PNG / ICO / CUR decoder below (box-filtered
+with NumPy when available). Finished thumbnails are PNG bytes, kept in an
+in-memory LRU and on disk under ~/.gx_builder/thumbs keyed by the source's
+sha256, so each image is decoded once per thumbnail size.
+"""
+
+import io
+import os
+import zlib
+import struct
+import hashlib
+import zipfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .lib import USER_DATA_DIR, iter_source_chunks, source_size, ZipMember
+from .cache import BuildCache
+
+THUMB_DIR = os.path.join(USER_DATA_DIR, "thumbs")
+THUMB_CACHE_MAX_BYTES = 64 << 20
+THUMB_SIZE = 64
+MEMORY_ITEMS = 1024
+# files thumbnails are made of; anything else (wallpaper videos, ...) is never read
+THUMB_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".gif", ".ico", ".cur")
+# sources bigger than this are not read at all: Pillow / the built-in decoder
+MAX_SOURCE_BYTES = 64 << 20
+MAX_FALLBACK_BYTES = 4 << 20
+# the pure-Python decoder works byte by byte under the GIL: it only takes small images (pixels)
+MAX_PIXELS = 1_000_000
+# bump when thumbnails are rendered differently so old disk entries stop matching
+THUMB_FORMAT_VERSION = 1
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+_ADAM7 = ((0, 0, 8, 8), (4, 0, 8, 8), (0, 4, 4, 8), (2, 0, 4, 4), (0, 2, 2, 4), (1, 0, 2, 2), (0, 1, 1, 2))
+# byte -> its 8/depth samples, for 1/2/4-bit images
+_BIT_TABLES = {
+    d: [bytes((b >> (8 - d * (i + 1))) & ((1 << d) - 1) for i in range(8 // d)) for b in range(256)]
+    for d in (1, 2, 4)
+}
+
+
+# ---------- PNG ----------
+
+def _add_bytes(a, b):
+    """Bytewise (a + b) mod 256 of two equally long rows, as one big-int operation."""
+    n = len(a)
+    x = int.from_bytes(a, "little"); y = int.from_bytes(b, "little")
+    low = int.from_bytes(b"\x7f" * n, "little")
+    high = int.from_bytes(b"\x80" * n, "little")
+    return bytearray((((x & low) + (y & low)) ^ ((x ^ y) & high)).to_bytes(n, "little"))
+
+
+def _unfilter(ft, line, prev, bpp):
+    n = len(line)
+    if ft == 0:
+        return line
+    if ft == 1:
+        for i in range(bpp, n):
+            line[i] = (line[i] + line[i - bpp]) & 255
+    elif ft == 2:
+        return _add_bytes(line, prev)
+    elif ft == 3:
+        for i in range(min(bpp, n)):
+            line[i] = (line[i] + (prev[i] >> 1)) & 255
+        for i in range(bpp, n):
+            line[i] = (line[i] + ((line[i - bpp] + prev[i]) >> 1)) & 255
+    elif ft == 4:
+        for i in range(min(bpp, n)):
+            line[i] = (line[i] + prev[i]) & 255
+        for i in range(bpp, n):
+            a = line[i - bpp]; b = prev[i]; c = prev[i - bpp]
+            pa = abs(b - c); pb = abs(a - c); pc = abs(a + b - 2 * c)
+            if pa <= pb and pa <= pc:
+                p = a
+            elif pb <= pc:
+                p = b
+            else:
+                p = c
+            line[i] = (line[i] + p) & 255
+    else:
+        raise ValueError(f"bad PNG filter type {ft}")
+    return line
+
+
+def _row_to_rgba(line, width, ctype, depth, palette):
+    if depth == 16:
+        line = line[0::2]
+    elif depth < 8:
+        line = bytearray(b"".join(map(_BIT_TABLES[depth].__getitem__, line))[:width])
+        if ctype == 0:
+            scale = 255 // ((1 << depth) - 1)
+            line = line.translate(bytes(min(v * scale, 255) for v in range(256)))
+    if ctype == 6:
+        return line
+    out = bytearray(width * 4)
+    if ctype == 2:
+        out[0::4] = line[0::3]; out[1::4] = line[1::3]; out[2::4] = line[2::3]
+        out[3::4] = b"\xff" * width
+    elif ctype == 0:
+        out[0::4] = line; out[1::4] = line; out[2::4] = line
+        out[3::4] = b"\xff" * width
+    elif ctype == 4:
+        g = line[0::2]
+        out[0::4] = g; out[1::4] = g; out[2::4] = g
+        out[3::4] = line[1::2]
+    else:
+        r, g, b, a = palette
+        out[0::4] = line.translate(r); out[1::4] = line.translate(g)
+        out[2::4] = line.translate(b); out[3::4] = line.translate(a)
+    return out
+
+
+def decode_png(data):
+    """(width, height, RGBA bytearray) of a PNG. Raises ValueError for anything it can't read."""
+    if data[:8] != PNG_SIGNATURE:
+        raise ValueError("not a PNG")
+    pos = 8
+    header = None
+    plte = trns = b""
+    idat = []
+    while pos + 8 <= len(data):
+        n, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        body = data[pos + 8:pos + 8 + n]
+        pos += 12 + n
+        if kind == b"IHDR":
+            header = struct.unpack(">IIBBBBB", body[:13])
+        elif kind == b"PLTE":
+            plte = body
+        elif kind == b"tRNS":
+            trns = body
+        elif kind == b"IDAT":
+            idat.append(body)
+        elif kind == b"IEND":
+            break
+    if header is None:
+        raise ValueError("PNG without IHDR")
+    w, h, depth, ctype, _, _, interlace = header
+    if ctype not in _CHANNELS or depth not in (1, 2, 4, 8, 16) or not w or not h:
+        raise ValueError("unsupported PNG format")
+    if w * h > MAX_PIXELS:
+        raise ValueError(f"image too large ({w}x{h})")
+    palette = None
+    if ctype == 3:
+        pal = plte.ljust(768, b"\0")
+        palette = (pal[0::3], pal[1::3], pal[2::3], trns[:256].ljust(256, b"\xff"))
+    try:
+        raw = zlib.decompress(b"".join(idat))
+    except zlib.error as e:
+        raise ValueError(f"corrupt PNG data: {e}")
+
+    channels = _CHANNELS[ctype]
+    bpp = max(1, channels * depth // 8)
+    out = bytearray(w * h * 4)
+    off = 0
+    for x0, y0, dx, dy in (_ADAM7 if interlace else ((0, 0, 1, 1),)):
+        pw = (w - x0 + dx - 1) // dx
+        ph = (h - y0 + dy - 1) // dy
+        if not pw or not ph:
+            continue
+        stride = (pw * channels * depth + 7) // 8
+        prev = bytearray(stride)
+        for r in range(ph):
+            if off + 1 + stride > len(raw):
+                raise ValueError("truncated PNG data")
+            line = _unfilter(raw[off], bytearray(raw[off + 1:off + 1 + stride]), prev, bpp)
+            off += 1 + stride
+            prev = line
+            rgba = _row_to_rgba(line, pw, ctype, depth, palette)
+            base = (y0 + r * dy) * w * 4
+            if dx == 1:
+                out[base:base + w * 4] = rgba
+            else:
+                for c in range(4):
+                    out[base + x0 * 4 + c:base + w * 4:dx * 4] = rgba[c::4]
+    return w, h, out
+
+
+def encode_png(width, height, rgba, level=6):
+    """Minimal 8-bit RGBA PNG."""
+    stride = width * 4
+    raw = b"".join(b"\0" + bytes(rgba[y * stride:(y + 1) * stride]) for y in range(height))
+
+    def chunk(kind, body):
+        return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body))
+
+    return (PNG_SIGNATURE + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw, level)) + chunk(b"IEND", b""))
+
+
+# ---------- ICO / CUR ----------
+
+def _decode_dib(data):
+    hsize, w, h2, _, bpp, compression = struct.unpack("<IiiHHI", data[:20])
+    h = abs(h2) // 2
+    if compression != 0 or bpp not in (24, 32) or w <= 0 or h <= 0:
+        raise ValueError("unsupported icon bitmap")
+    step = bpp // 8
+    stride = (w * bpp + 31) // 32 * 4
+    mask_stride = (w + 31) // 32 * 4
+    mask_off = hsize + stride * h
+    if len(data) < mask_off:
+        raise ValueError("truncated icon bitmap")
+    has_mask = len(data) >= mask_off + mask_stride * h
+    out = bytearray(w * h * 4)
+    any_alpha = False
+    for y in range(h):
+        src = h - 1 - y  # bottom-up
+        row = data[hsize + src * stride:hsize + src * stride + w * step]
+        o = y * w * 4
+        end = o + w * 4
+        out[o:end:4] = row[2::step]; out[o + 1:end:4] = row[1::step]; out[o + 2:end:4] = row[0::step]
+        if bpp == 32:
+            out[o + 3:end:4] = row[3::4]
+            any_alpha = any_alpha or any(row[3::4])
+    if not any_alpha:
+        # no alpha channel: the AND mask says which pixels are transparent
+        for y in range(h):
+            src = h - 1 - y
+            bits = data[mask_off + src * mask_stride:mask_off + (src + 1) * mask_stride] if has_mask else b""
+            for x in range(w):
+                transparent = bits and (bits[x >> 3] >> (7 - (x & 7))) & 1
+                out[(y * w + x) * 4 + 3] = 0 if transparent else 255
+    return w, h, out
+
+
+def decode_ico(data):
+    """Largest image of a .ico / .cur file (PNG or 24/32-bit bitmap entries)."""
+    _, kind, count = struct.unpack("<HHH", data[:6])
+    best = None
+    for i in range(count):
+        e = data[6 + 16 * i:22 + 16 * i]
+        if len(e) < 16:
+            break
+        w, h, _, _, _, bpp, size, off = struct.unpack("<BBBBHHII", e)
+        # for cursors the planes/bpp fields hold the hotspot
+        key = ((w or 256) * (h or 256), bpp if kind == 1 else 0)
+        if best is None or key > best[0]:
+            best = (key, off, size)
+    if best is None:
+        raise ValueError("empty icon file")
+    img = data[best[1]:best[1] + best[2]]
+    if img[:8] == PNG_SIGNATURE:
+        return decode_png(img)
+    return _decode_dib(img)
+
+
+def decode_image(data):
+    """(width, height, RGBA) with the built-in decoders (PNG, ICO, CUR)."""
+    if data[:8] == PNG_SIGNATURE:
+        return decode_png(data)
+    if data[:4] in (b"\0\0\1\0", b"\0\0\2\0"):
+        return decode_ico(data)
+    raise ValueError("unsupported image format")
+
+
+# ---------- resampling ----------
+
+def fit_size(w, h, size):
+    """Size of the thumbnail of a w x h image: fits in size x size, never enlarged."""
+    if w <= size and h <= size:
+        return w, h
+    scale = size / max(w, h)
+    return max(1, round(w * scale)), max(1, round(h * scale))
+
+
+def _resize_numpy(rgba, w, h, tw, th):
+    # box filter over premultiplied alpha
+    a = np.frombuffer(bytes(rgba), np.uint8).reshape(h, w, 4).astype(np.uint64)
+    a[..., :3] *= a[..., 3:]
+    ys = np.arange(th) * h // th
+    xs = np.arange(tw) * w // tw
+    a = np.add.reduceat(np.add.reduceat(a, ys, axis=0), xs, axis=1)
+    counts = (np.diff(np.append(ys, h))[:, None] * np.diff(np.append(xs, w))[None, :])
+    alpha = a[..., 3]
+    out = np.zeros((th, tw, 4), np.uint8)
+    nz = alpha > 0
+    out[..., :3][nz] = (a[..., :3][nz] // alpha[nz][:, None]).astype(np.uint8)
+    out[..., 3] = (alpha // counts).astype(np.uint8)
+    return out.tobytes()
+
+
+def _resize_python(rgba, w, h, tw, th):
+    # 2x2 samples per output pixel, alpha weighted
+    xs = [[min(w - 1, int((x + f) * w / tw)) * 4 for f in (0.25, 0.75)] for x in range(tw)]
+    ys = [[min(h - 1, int((y + f) * h / th)) * w * 4 for f in (0.25, 0.75)] for y in range(th)]
+    out = bytearray(tw * th * 4)
+    o = 0
+    for rows in ys:
+        for cols in xs:
+            r = g = b = a = 0
+            for ry in rows:
+                for cx in cols:
+                    i = ry + cx
+                    pa = rgba[i + 3]
+                    r += rgba[i] * pa; g += rgba[i + 1] * pa; b += rgba[i + 2] * pa; a += pa
+            if a:
+                out[o] = r // a; out[o + 1] = g // a; out[o + 2] = b // a; out[o + 3] = a >> 2
+            o += 4
+    return out
+
+
+def resize_rgba(rgba, w, h, tw, th):
+    if (tw, th) == (w, h):
+        return rgba
+    if np is not None:
+        return _resize_numpy(rgba, w, h, tw, th)
+    return _resize_python(rgba, w, h, tw, th)
+
+
+def make_thumbnail(data, size=THUMB_SIZE):
+    """PNG bytes of a thumbnail of image data. Raises ValueError if it can't be decoded."""
+    if Image is not None:
+        try:
+            with Image.open(io.BytesIO(data)) as im:
+                im.draft("RGB", (size, size))  # JPEG: decode at a reduced scale
+                im = im.convert("RGBA")
+                im.thumbnail((size, size), getattr(Image, "Resampling", Image).LANCZOS)
+                buf = io.BytesIO()
+                im.save(buf, "PNG")
+                return buf.getvalue()
+        except Exception as e:
+            # Pillow reports broken files in many ways (EOFError, SyntaxError, struct.error, ...)
+            raise ValueError(str(e) or type(e).__name__)
+    w, h, rgba = decode_image(data)
+    tw, th = fit_size(w, h, size)
+    return encode_png(tw, th, resize_rgba(rgba, w, h, tw, th))
+
+
+# ---------- cache ----------
+
+def is_thumbnail_source(name):
+    return name.lower().endswith(THUMB_EXTENSIONS)
+
+
+class ThumbnailCache:
+    """Thumbnails by source content: memory LRU, then disk, then decode on a worker thread.
+
+    request() returns a Future resolving to PNG bytes, or b"" for sources that
+    are missing or can't be decoded (remembered too, so they aren't retried)."""
+
+    def __init__(self, root=THUMB_DIR, digests=None, size=THUMB_SIZE, max_items=MEMORY_ITEMS,
+                 max_bytes=THUMB_CACHE_MAX_BYTES, workers=2):
+        self.digests = digests
+        self.size = size
+        self.max_items = max_items
+        self.disk = BuildCache(root, max_bytes, suffix=".png")
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.written = 0
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gx-thumbs")
+        self.engine = "pil" if Image is not None else "py"
+
+    def key(self, sha):
+        return f"{sha}-{self.size}-{self.engine}{THUMB_FORMAT_VERSION}"
+
+    def _remember(self, key, png):
+        with self.lock:
+            self.memory[key] = png
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.max_items:
+                self.memory.popitem(last=False)
+
+    def load(self, src):
+        """Thumbnail PNG bytes of a files_to_include value (blocking; b"" if unavailable)."""
+        if src is None:
+            return b""
+        if isinstance(src, (bytes, bytearray)):
+            sha = hashlib.sha256(src).hexdigest()
+        else:
+            if not is_thumbnail_source(src.name if isinstance(src, ZipMember) else src):
+                return b""
+            if source_size(src) > (MAX_SOURCE_BYTES if Image is not None else MAX_FALLBACK_BYTES):
+                return b""
+            sha = self.digests.digest(src) if self.digests is not None else None
+            if sha is None:
+                return b""
+        key = self.key(sha)
+        with self.lock:
+            png = self.memory.get(key)
+            if png is not None:
+                self.memory.move_to_end(key)
+                return png
+        p = self.disk.get(key)
+        if p is not None:
+            try:
+                with open(p, "rb") as f:
+                    png = f.read()
+            except OSError:
+                png = None
+        if png is None:
+            try:
+                png = make_thumbnail(b"".join(iter_source_chunks(src)), self.size)
+            except (OSError, ValueError, KeyError, struct.error, zipfile.BadZipFile):
+                png = b""
+            self._store(key, png)
+        self._remember(key, png)
+        return png
+
+    def _store(self, key, png):
+        dest = self.disk.entry_path(key)
+        tmp = f"{dest}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.disk.root, exist_ok=True)
+            with open(tmp, "wb") as f:
+                f.write(png)
+            os.replace(tmp, dest)
+        except OSError:
+            return
+        with self.lock:
+            self.written += 1
+            evict = self.written % 200 == 0
+        if evict:
+            self.disk.evict()
+
+    def request(self, src):
+        return self.pool.submit(self.load, src)
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
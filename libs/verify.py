@@ -0,0 +1,241 @@
+"""
+Post-export integrity check.
+
+Before an export writes anything, record_digests notes the (size, crc32,
+sha256) of every source. The data usually comes from the DigestIndex and
+is already known from hashing. verify_export then re-reads the output on
+a thread pool:
+  - folder: each file's size and sha256 against its source
+  - ZIP: each member's size and CRC in the central directory against its
+    source, and the member data is inflated so a bad CRC or a truncated
+    archive is caught too
+It also recomputes mod.flavor.hash from the output files and compares it
+with the hash in the written manifest.json.
+
+Without recorded digests (e.g. `python main.py verify <build>`), only the
+output's own consistency is checked: ZIP CRCs and the flavor hash.
+
+A delta package (one with delta.json, see libs/delta.py) holds only the
+added and changed files, so its flavor hash can't be recomputed: exactly
+the members delta.json lists are checked, and its hashes must match the
+manifest's mod.flavor.
+"""
+
+import os
+import json
+import zlib
+import hashlib
+import zipfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .lib import CHUNK_SIZE, iter_file_chunks, flavor_files
+from .analyze import format_bytes
+from .delta import BUILD_META_NAMES, DELTA_INFO_NAME
+
+VERIFY_WORKERS = 8
+
+
+def _source_record(digests, src):
+    if isinstance(src, (bytes, bytearray)):
+        return len(src), zlib.crc32(src), hashlib.sha256(src).hexdigest()
+    e = digests.entry(src)
+    if e is None:
+        return None
+    return e.get("member_size", e["size"]), e["crc32"], e["sha256"]
+
+
+def record_digests(file_map, digests, workers=VERIFY_WORKERS):
+    """{relpath: (size, crc32, sha256) or None if unreadable} of the sources about to be exported."""
+    rels = sorted(file_map)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        records = list(pool.map(lambda rel: _source_record(digests, file_map[rel]), rels))
+    return dict(zip(rels, records))
+
+
+class _Output:
+    """Read access to the members of an export folder or ZIP, one ZipFile handle per thread."""
+
+    def __init__(self, out, governor=None):
+        self.out = out
+        self.governor = governor
+        self.is_zip = not os.path.isdir(out)
+        self.local = threading.local()
+        self.handles = []
+        self.lock = threading.Lock()
+        self.infos = {}
+        if self.is_zip:
+            zf = self.zip()
+            for info in zf.infolist():
+                if not info.is_dir():
+                    self.infos[info.filename] = info
+
+    def zip(self):
+        zf = getattr(self.local, "zf", None)
+        if zf is None:
+            zf = self.local.zf = zipfile.ZipFile(self.out)
+            with self.lock:
+                self.handles.append(zf)
+        return zf
+
+    def names(self):
+        if self.is_zip:
+            return set(self.infos)
+        out = set()
+        for root_dir, _, files in os.walk(self.out):
+            for fname in files:
+                out.add(os.path.relpath(os.path.join(root_dir, fname), self.out).replace(os.sep, "/"))
+        return out
+
+    def exists(self, rel):
+        return rel in self.infos if self.is_zip else os.path.isfile(os.path.join(self.out, rel))
+
+    def chunks(self, rel):
+        if self.governor is not None:
+            return self.governor.chunks(self._chunks(rel))
+        return self._chunks(rel)
+
+    def _chunks(self, rel):
+        if not self.is_zip:
+            yield from iter_file_chunks(os.path.join(self.out, rel))
+            return
+        # ZipExtFile checks the CRC when the member has been read to the end
+        with self.zip().open(rel) as f:
+            while True:
+                buf = f.read(CHUNK_SIZE)
+                if not buf:
+                    break
+                yield buf
+
+    def close(self):
+        for zf in self.handles:
+            zf.close()
+
+
+def _check_member(output, rel, record):
+    """Problem string for one exported file, or None."""
+    if not output.exists(rel):
+        return f"{rel}: missing from the output"
+    if output.is_zip:
+        info = output.infos[rel]
+        if record and (info.file_size, info.CRC) != (record[0], record[1]):
+            return (f"{rel}: central directory has {info.file_size} bytes / CRC {info.CRC:08x}, "
+                    f"source has {record[0]} bytes / CRC {record[1]:08x}")
+        try:
+            for _ in output.chunks(rel):
+                pass
+        except (zipfile.BadZipFile, zlib.error, EOFError, OSError) as e:
+            return f"{rel}: member data is damaged ({e})"
+        return None
+    path = os.path.join(output.out, rel)
+    size = os.path.getsize(path)
+    if record and size != record[0]:
+        return f"{rel}: {size} bytes in the output, source has {record[0]}"
+    if not record:
+        return None
+    h = hashlib.sha256()
+    for buf in output.chunks(rel):
+        h.update(buf)
+    if h.hexdigest() != record[2]:
+        return f"{rel}: content differs from the source (sha256 {h.hexdigest()[:12]}, source {record[2][:12]})"
+    return None
+
+
+def _output_flavor_hash(output, names):
+    # same algorithm as compute_payload_hash, over the output files
+    m = hashlib.md5()
+    for rel in sorted(flavor_files(names)):
+        h = m.copy()
+        try:
+            for buf in output.chunks(rel):
+                h.update(buf)
+        except (OSError, KeyError, zipfile.BadZipFile, zlib.error, EOFError):
+            continue
+        m = h
+    return m.hexdigest()
+
+
+def _read_manifest(output):
+    try:
+        data = b"".join(output.chunks("manifest.json"))
+        return data, json.loads(data.decode("utf-8"))
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile, zlib.error, EOFError):
+        return None, None
+
+
+def _read_delta_info(output):
+    """delta.json of a delta package as a dict, None for a full build."""
+    if not output.exists(DELTA_INFO_NAME):
+        return None
+    try:
+        info = json.loads(b"".join(output.chunks(DELTA_INFO_NAME)).decode("utf-8"))
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile, zlib.error, EOFError):
+        info = None
+    return info if isinstance(info, dict) else {}
+
+
+def _delta_names(info):
+    names = set()
+    for key in ("added", "changed"):
+        val = info.get(key)
+        names.update(r for r in (val if isinstance(val, list) else ()) if isinstance(r, str))
+    return names
+
+
+def verify_export(out, expected=None, manifest_text=None, log=print, workers=VERIFY_WORKERS, governor=None):
+    """Re-read an export folder or ZIP and return a list of problems (empty when it checks out).
+
+    expected is record_digests() of the exported file map; manifest_text the manifest that was written.
+    With a governor (libs/throttle.py), the reads count against its bandwidth limit.
+    """
+    try:
+        output = _Output(out, governor)
+    except (OSError, zipfile.BadZipFile) as e:
+        return [f"{out}: cannot be read ({e})"]
+    try:
+        problems = []
+        delta = _read_delta_info(output)
+        if delta is not None and expected is None:
+            if not delta:
+                problems.append(f"{DELTA_INFO_NAME}: not valid JSON")
+            names = _delta_names(delta)
+        elif expected is not None:
+            names = set(expected)
+        else:
+            names = output.names() - set(BUILD_META_NAMES)
+        init = governor.init_worker if governor is not None else None
+        with ThreadPoolExecutor(max_workers=workers, initializer=init) as pool:
+            # the flavor hash is one sequential pass: start it first so it overlaps the per-file checks
+            flavor = pool.submit(_output_flavor_hash, output, names) if delta is None else None
+            rels = sorted(names)
+            results = pool.map(lambda rel: _check_member(output, rel, (expected or {}).get(rel)), rels)
+            problems.extend(p for p in results if p)
+            flavor_hash = flavor.result() if flavor is not None else None
+
+        if output.is_zip and (expected is not None or delta is not None):
+            extra = sorted(set(output.infos) - names - set(BUILD_META_NAMES))
+            if extra:
+                problems.append("Unexpected members in the ZIP: " + ", ".join(extra[:8]) + ("" if len(extra) <= 8 else " ..."))
+        data, manifest = _read_manifest(output)
+        if manifest is None:
+            problems.append("manifest.json: missing or not valid JSON")
+        else:
+            if manifest_text is not None and data != manifest_text.encode("utf-8"):
+                problems.append("manifest.json: differs from the manifest that was exported")
+            flavor_info = ((manifest.get('mod') or {}).get('flavor') or {}) if isinstance(manifest, dict) else {}
+            want = flavor_info.get('hash')
+            if delta is not None:
+                # a delta's files alone don't hash to the full build's flavor
+                for key in ("hash", "parent_hash"):
+                    if delta and delta.get(key) != flavor_info.get(key):
+                        problems.append(f"{DELTA_INFO_NAME}: {key} {delta.get(key)} differs from "
+                                        f"mod.flavor.{key} {flavor_info.get(key)} in the manifest")
+            elif want != flavor_hash:
+                problems.append(f"mod.flavor.hash: manifest says {want}, output files hash to {flavor_hash}")
+        total = sum(output.infos[r].file_size if output.is_zip else os.path.getsize(os.path.join(out, r))
+                    for r in names if output.exists(r))
+        log(f"Verify: {'delta package, ' if delta is not None else ''}{len(names)} file(s), {format_bytes(total)} re-read, "
+            f"{'OK' if not problems else f'{len(problems)} problem(s)'}")
+        return problems
+    finally:
+        output.close()
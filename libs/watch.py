@@ -0,0 +1,235 @@
+"""
+Watch mode: notices edits to registered sources and live-syncs them into a
+"Load unpacked" export folder.
+Uses inotify (Linux, through ctypes) when available and falls back to stat polling.
+"""
+
+import os
+import time
+import queue
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+
+from .export import write_folder_member, write_folder_export, write_folder_manifest
+from .lib import manifest_to_json, ZipMember
+
+DEBOUNCE_SECONDS = 0.15
+POLL_INTERVAL = 0.25
+
+# inotify(7)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+class _Inotify:
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.libc = libc
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs = {}  # wd -> directory
+
+    def add_dir(self, path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+        self.dirs[wd] = path
+        return wd
+
+    def read(self, timeout):
+        """Changed paths seen within `timeout` seconds; None means the queue overflowed."""
+        r, _, _ = select.select([self.fd], [], [], timeout)
+        if not r:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        paths = []
+        pos = 0
+        while pos + INOTIFY_EVENT.size <= len(data):
+            wd, mask, _, nlen = INOTIFY_EVENT.unpack_from(data, pos)
+            pos += INOTIFY_EVENT.size
+            name = data[pos:pos + nlen].rstrip(b"\0")
+            pos += nlen
+            if mask & IN_Q_OVERFLOW:
+                return None
+            d = self.dirs.get(wd)
+            if d is not None and name:
+                paths.append(os.path.join(d, os.fsdecode(name)))
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+class SourceWatcher(threading.Thread):
+    """Background thread that reports changed relpaths through `changes` (a queue of sets).
+
+    Bursts of events are debounced: a batch is only emitted once the sources
+    have been quiet for `debounce` seconds.
+    """
+
+    def __init__(self, sources, debounce=DEBOUNCE_SECONDS, poll_interval=POLL_INTERVAL, use_inotify=True):
+        super().__init__(daemon=True)
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.changes = queue.Queue()
+        self.backend = "polling"
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._sources = {}
+        self._sources_changed = False
+        self.set_sources(sources)
+
+    def set_sources(self, sources):
+        """relpath -> source map; in-memory (bytes) sources are not watched, ZipMembers watch their archive."""
+        paths = {}
+        for rel, src in sources.items():
+            if isinstance(src, ZipMember):
+                paths[rel] = src.zip_path
+            elif isinstance(src, str):
+                paths[rel] = os.path.abspath(src)
+        with self._lock:
+            self._sources = paths
+            self._sources_changed = True
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _snapshot(self):
+        with self._lock:
+            self._sources_changed = False
+            return dict(self._sources)
+
+    def _emit(self, rels):
+        if rels:
+            self.changes.put(set(rels))
+
+    def run(self):
+        ino = None
+        if self.use_inotify and hasattr(select, "select") and os.name == "posix":
+            try:
+                ino = _Inotify()
+                self.backend = "inotify"
+            except (OSError, AttributeError):
+                ino = None
+        try:
+            if ino is not None:
+                self._run_inotify(ino)
+            else:
+                self._run_polling()
+        finally:
+            if ino is not None:
+                ino.close()
+
+    def _run_inotify(self, ino):
+        by_path = {}
+        watched = set()
+        pending = set()
+        last_event = 0.0
+        while not self._stop_event.is_set():
+            if self._sources_changed:
+                sources = self._snapshot()
+                by_path = {}
+                for rel, p in sources.items():
+                    by_path.setdefault(p, set()).add(rel)
+                    d = os.path.dirname(p)
+                    if d not in watched and os.path.isdir(d):
+                        try:
+                            ino.add_dir(d); watched.add(d)
+                        except OSError:
+                            pass
+            timeout = self.debounce if pending else self.poll_interval
+            paths = ino.read(timeout)
+            if paths is None:
+                # event queue overflow: assume everything changed
+                pending.update(rel for rels in by_path.values() for rel in rels)
+                last_event = time.monotonic()
+            elif paths:
+                for p in paths:
+                    pending.update(by_path.get(p, ()))
+                last_event = time.monotonic()
+            if pending and time.monotonic() - last_event >= self.debounce:
+                self._emit(pending); pending = set()
+
+    def _run_polling(self):
+        stats = {}
+        pending = set()
+        last_event = 0.0
+        while not self._stop_event.is_set():
+            if self._sources_changed:
+                sources = self._snapshot()
+                stats = {rel: (p, _stat_key(p)) for rel, p in sources.items()}
+            changed = False
+            for rel, (p, key) in list(stats.items()):
+                cur = _stat_key(p)
+                if cur != key:
+                    stats[rel] = (p, cur)
+                    pending.add(rel); changed = True
+            if changed:
+                last_event = time.monotonic()
+            if pending and time.monotonic() - last_event >= self.debounce:
+                self._emit(pending); pending = set()
+            self._stop_event.wait(self.debounce if pending else self.poll_interval)
+
+
+def _stat_key(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+class LiveSync:
+    """Keeps an export folder in step with the project, copying only what changed."""
+
+    def __init__(self, out, log=print, link_mode="copy", store=None):
+        self.out = out
+        self.log = log
+        self.link_mode = link_mode
+        self.store = store
+        self.file_map = {}
+        self.manifest_text = None
+
+    def full_export(self, file_map, manifest):
+        self.manifest_text = write_folder_export(self.out, file_map, manifest, self.log, self.link_mode, self.store)
+        self.file_map = dict(file_map)
+
+    def sync(self, file_map, manifest, changed=()):
+        """Copy changed/added members, drop removed ones, rewrite manifest.json only if it differs.
+        Returns the number of files touched."""
+        touched = 0
+        for rel, src in sorted(file_map.items()):
+            if rel in changed or self.file_map.get(rel) != src:
+                write_folder_member(self.out, rel, src, self.log, self.link_mode, self.store)
+                touched += 1
+        for rel in sorted(set(self.file_map) - set(file_map)):
+            try:
+                os.remove(os.path.join(self.out, rel))
+                self.log(f"Removed {rel}")
+                touched += 1
+            except OSError:
+                pass
+        if touched and self.link_mode == "store" and self.store is not None:
+            self.store.set_refs(self.out, self.store.object_map(file_map), manifest.get('name'))
+        self.file_map = dict(file_map)
+        if manifest_to_json(manifest) != self.manifest_text:
+            self.manifest_text = write_folder_manifest(self.out, manifest)
+            self.log("Rewrote manifest.json")
+            touched += 1
+        return touched
@@ -0,0 +1,489 @@
+"""
+Deterministic ZIP writing for mod exports.
+Every member gets the same timestamp and permissions and members are written
+in sorted order, so identical inputs always produce a byte-identical archive.
+update_mod_zip is the exception: it patches an existing archive in place, so
+its layout depends on the archive's history until it is compacted.
+"""
+
+import os
+import struct
+import zlib
+import zipfile
+from contextlib import nullcontext
+
+from .lib import CHUNK_SIZE, iter_file_chunks, iter_source_chunks, source_exists, source_size, ZipMember
+
+# 1980-01-01 00:00:00, the earliest DOS timestamp a ZIP can hold
+ZIP_DOS_TIME = 0
+ZIP_DOS_DATE = (0 << 9) | (1 << 5) | 1
+# regular file, rw-r--r--
+ZIP_EXTERNAL_ATTR = (0o100644 << 16)
+# "made by" unix, spec 2.0 (4.5 when zip64 is needed)
+ZIP_CREATE_SYSTEM = 3
+
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+COMPRESS_LEVEL = 6
+
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP64_COUNT_LIMIT = 0xFFFF
+# members bigger than this reserve a zip64 extra in their local header, the
+# margin covers deflate output that ends up slightly larger than its input
+ZIP64_RESERVE = ZIP64_LIMIT - (64 << 20)
+
+# an in-place update appends to the old archive until this share of it would be dead space
+COMPACT_DEAD_RATIO = 0.25
+# <archive><suffix> holds the archive's length while an in-place update appends to it
+UPDATE_JOURNAL_SUFFIX = ".update"
+
+LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+END_RECORD = struct.Struct("<IHHHHIIH")
+ZIP64_END_RECORD = struct.Struct("<IQHHIIQQQQ")
+ZIP64_LOCATOR = struct.Struct("<IIQI")
+
+SIG_LOCAL = 0x04034b50
+SIG_CENTRAL = 0x02014b50
+SIG_END = 0x06054b50
+SIG_ZIP64_END = 0x06064b50
+SIG_ZIP64_LOCATOR = 0x07064b50
+
+
+def needs_zip64(size):
+    """Whether a member of this size gets a zip64 local header. Shared by fresh and raw
+    copied members, so a member is laid out the same whichever way it was written."""
+    return size > ZIP64_RESERVE
+
+
+class ZipEntry:
+    """Central directory data of one written member."""
+    __slots__ = ("name", "method", "crc", "compress_size", "file_size", "header_offset")
+
+    def __init__(self, name, method, crc, compress_size, file_size, header_offset):
+        self.name = name
+        self.method = method
+        self.crc = crc
+        self.compress_size = compress_size
+        self.file_size = file_size
+        self.header_offset = header_offset
+
+
+class RawMember:
+    """Already-compressed member data: `compress_size` bytes at `offset` in the file at `path`."""
+    __slots__ = ("path", "offset", "method", "crc", "compress_size", "file_size")
+
+    def __init__(self, path, offset, method, crc, compress_size, file_size):
+        self.path = path
+        self.offset = offset
+        self.method = method
+        self.crc = crc
+        self.compress_size = compress_size
+        self.file_size = file_size
+
+    def iter_raw(self, chunk_size=CHUNK_SIZE):
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            left = self.compress_size
+            while left:
+                buf = f.read(min(chunk_size, left))
+                if not buf:
+                    raise IOError(f"{self.path}: member data truncated")
+                left -= len(buf)
+                yield buf
+
+    def iter_data(self):
+        """Decompressed member bytes."""
+        if self.method == ZIP_STORED:
+            yield from self.iter_raw()
+            return
+        d = zlib.decompressobj(-15)
+        for buf in self.iter_raw():
+            out = d.decompress(buf)
+            if out:
+                yield out
+        tail = d.flush()
+        if tail:
+            yield tail
+
+
+def compress_to_file(chunks, path, governor=None):
+    """Deflate `chunks` into a spill file the way ZipWriter would, and describe it as a RawMember.
+    With a governor (libs/throttle.py), the writes go through its bandwidth limit."""
+    comp = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, -15)
+    crc = 0; file_size = 0; compress_size = 0
+    with open(path, "wb") as raw:
+        f = governor.wrap(raw) if governor is not None else raw
+        for buf in chunks:
+            crc = zlib.crc32(buf, crc)
+            file_size += len(buf)
+            out = comp.compress(buf)
+            if out:
+                f.write(out); compress_size += len(out)
+        tail = comp.flush()
+        f.write(tail); compress_size += len(tail)
+    return RawMember(path, 0, ZIP_DEFLATED, crc, compress_size, file_size)
+
+
+def _scan_zip(zf, f, path):
+    """(ZipInfo, RawMember) of every stored/deflated, unencrypted file in the open archive."""
+    for info in zf.infolist():
+        if info.is_dir() or info.flag_bits & 0x1 or info.compress_type not in (ZIP_STORED, ZIP_DEFLATED):
+            continue
+        f.seek(info.header_offset)
+        head = f.read(LOCAL_HEADER.size)
+        if len(head) != LOCAL_HEADER.size or LOCAL_HEADER.unpack(head)[0] != SIG_LOCAL:
+            continue
+        fields = LOCAL_HEADER.unpack(head)
+        data_offset = info.header_offset + LOCAL_HEADER.size + fields[9] + fields[10]
+        yield info, RawMember(path, data_offset, info.compress_type, info.CRC, info.compress_size, info.file_size)
+
+
+def read_zip_directory(path):
+    """{member name: RawMember} for every stored/deflated, unencrypted file in an existing ZIP.
+
+    Data offsets come from each member's local header, so members can be
+    copied as raw compressed bytes into another archive.
+    """
+    path = os.path.abspath(path)
+    with zipfile.ZipFile(path) as zf, open(path, "rb") as f:
+        return {info.filename: raw for info, raw in _scan_zip(zf, f, path)}
+
+
+class ZipMemberReader:
+    """Resolves ZipMember sources to raw members, reading each source archive's directory once."""
+
+    def __init__(self):
+        self.directories = {}
+
+    def raw(self, src):
+        """RawMember for a ZipMember, or None if it has to be recompressed."""
+        d = self.directories.get(src.zip_path)
+        if d is None:
+            try:
+                d = read_zip_directory(src.zip_path)
+            except (OSError, zipfile.BadZipFile):
+                d = {}
+            self.directories[src.zip_path] = d
+        return d.get(src.name)
+
+
+def _encode_name(name):
+    try:
+        return name.encode("ascii"), 0
+    except UnicodeEncodeError:
+        return name.encode("utf-8"), 0x800
+
+
+class ZipWriter:
+    """Minimal streaming ZIP writer with fixed metadata.
+
+    `fp` must be a seekable binary file; local headers are patched in place
+    once a member's CRC and sizes are known.
+    """
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.entries = []
+
+    def _write_local_header(self, name, method, crc, compress_size, file_size, zip64):
+        bname, flags = _encode_name(name)
+        extra = b""
+        version = 20
+        if zip64:
+            version = 45
+            extra = struct.pack("<HHQQ", 1, 16, file_size, compress_size)
+            compress_size = file_size = ZIP64_LIMIT
+        self.fp.write(LOCAL_HEADER.pack(SIG_LOCAL, version, flags, method, ZIP_DOS_TIME, ZIP_DOS_DATE,
+                                        crc, compress_size, file_size, len(bname), len(extra)))
+        self.fp.write(bname)
+        self.fp.write(extra)
+
+    def _patch_local_header(self, entry, zip64):
+        end = self.fp.tell()
+        if zip64:
+            bname, _ = _encode_name(entry.name)
+            self.fp.seek(entry.header_offset + 14)
+            self.fp.write(struct.pack("<I", entry.crc))
+            self.fp.seek(entry.header_offset + LOCAL_HEADER.size + len(bname) + 4)
+            self.fp.write(struct.pack("<QQ", entry.file_size, entry.compress_size))
+        else:
+            self.fp.seek(entry.header_offset + 14)
+            self.fp.write(struct.pack("<III", entry.crc, entry.compress_size, entry.file_size))
+        self.fp.seek(end)
+
+    def write_chunks(self, name, chunks, size_hint=0, method=ZIP_DEFLATED):
+        offset = self.fp.tell()
+        zip64 = needs_zip64(size_hint)
+        self._write_local_header(name, method, 0, 0, 0, zip64)
+        comp = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, -15) if method == ZIP_DEFLATED else None
+        crc = 0; file_size = 0; compress_size = 0
+        for buf in chunks:
+            crc = zlib.crc32(buf, crc)
+            file_size += len(buf)
+            if comp is not None:
+                buf = comp.compress(buf)
+            if buf:
+                self.fp.write(buf)
+                compress_size += len(buf)
+        if comp is not None:
+            tail = comp.flush()
+            self.fp.write(tail)
+            compress_size += len(tail)
+        if not zip64 and (file_size >= ZIP64_LIMIT or compress_size >= ZIP64_LIMIT):
+            raise ValueError(f"{name}: grew past the zip64 limit while writing")
+        entry = ZipEntry(name, method, crc, compress_size, file_size, offset)
+        self._patch_local_header(entry, zip64)
+        self.entries.append(entry)
+        return entry
+
+    def write_raw(self, name, raw):
+        """Copy an already-compressed member without inflating/deflating it again."""
+        offset = self.fp.tell()
+        zip64 = needs_zip64(max(raw.file_size, raw.compress_size))
+        self._write_local_header(name, raw.method, raw.crc, raw.compress_size, raw.file_size, zip64)
+        for buf in raw.iter_raw():
+            self.fp.write(buf)
+        entry = ZipEntry(name, raw.method, raw.crc, raw.compress_size, raw.file_size, offset)
+        self.entries.append(entry)
+        return entry
+
+    def write_bytes(self, name, data):
+        return self.write_chunks(name, [bytes(data)], len(data))
+
+    def write_file(self, name, path):
+        return self.write_chunks(name, iter_file_chunks(path), os.path.getsize(path))
+
+    def close(self):
+        cd_offset = self.fp.tell()
+        for e in self.entries:
+            bname, flags = _encode_name(e.name)
+            fields = []
+            file_size, compress_size, header_offset = e.file_size, e.compress_size, e.header_offset
+            if file_size >= ZIP64_LIMIT:
+                fields.append(file_size); file_size = ZIP64_LIMIT
+            if compress_size >= ZIP64_LIMIT:
+                fields.append(compress_size); compress_size = ZIP64_LIMIT
+            if header_offset >= ZIP64_LIMIT:
+                fields.append(header_offset); header_offset = ZIP64_LIMIT
+            extra = struct.pack("<HH" + "Q" * len(fields), 1, 8 * len(fields), *fields) if fields else b""
+            version = 45 if fields else 20
+            self.fp.write(CENTRAL_HEADER.pack(SIG_CENTRAL, (ZIP_CREATE_SYSTEM << 8) | version, version, flags,
+                                              e.method, ZIP_DOS_TIME, ZIP_DOS_DATE, e.crc, compress_size,
+                                              file_size, len(bname), len(extra), 0, 0, 0,
+                                              ZIP_EXTERNAL_ATTR, header_offset))
+            self.fp.write(bname)
+            self.fp.write(extra)
+        cd_end = self.fp.tell()
+        cd_size = cd_end - cd_offset
+        count = len(self.entries)
+        if count > ZIP64_COUNT_LIMIT or cd_offset >= ZIP64_LIMIT or cd_size >= ZIP64_LIMIT:
+            self.fp.write(ZIP64_END_RECORD.pack(SIG_ZIP64_END, ZIP64_END_RECORD.size - 12, 45, 45, 0, 0,
+                                                count, count, cd_size, cd_offset))
+            self.fp.write(ZIP64_LOCATOR.pack(SIG_ZIP64_LOCATOR, 0, cd_end, 1))
+            count = min(count, ZIP64_COUNT_LIMIT)
+            cd_size = min(cd_size, ZIP64_LIMIT)
+            cd_offset = min(cd_offset, ZIP64_LIMIT)
+        self.fp.write(END_RECORD.pack(SIG_END, 0, 0, count, count, cd_size, cd_offset, 0))
+
+
+def write_mod_zip(out, file_map, manifest_text, log=print, zip_reader=None, governor=None):
+    """Write a deterministic mod archive: file_map members + manifest.json, sorted by name.
+
+    ZipMember sources are copied as raw compressed bytes (same CRC, no
+    inflate/deflate). The archive is written next to `out` and moved into
+    place when complete. Writes go through `governor` (libs/throttle.py) if given.
+    """
+    members = dict(file_map)
+    members["manifest.json"] = manifest_text.encode("utf-8")
+    zip_reader = zip_reader or ZipMemberReader()
+    tmp = out + ".part"
+    with open(tmp, "wb") as fp, (governor.file() if governor else nullcontext()):
+        zw = ZipWriter(governor.wrap(fp) if governor else fp)
+        for rel in sorted(members):
+            _write_member(zw, rel, members[rel], log, zip_reader)
+        zw.close()
+    os.replace(tmp, out)
+    return out
+
+
+def _write_member(zw, rel, src, log, zip_reader):
+    if isinstance(src, (bytes, bytearray)):
+        zw.write_bytes(rel, src)
+        log(f"Wrote bytes -> {rel}")
+    elif isinstance(src, ZipMember):
+        raw = zip_reader.raw(src)
+        if raw is not None:
+            zw.write_raw(rel, raw)
+            log(f"Copied raw {src} -> {rel}")
+        elif source_exists(src):
+            zw.write_chunks(rel, iter_source_chunks(src), src.info().file_size)
+            log(f"Recompressed {src} -> {rel}")
+        else:
+            log(f"WARNING: missing source {src} (skipped)")
+    elif os.path.exists(src):
+        zw.write_file(rel, src)
+        log(f"Added {src} -> {rel}")
+    else:
+        log(f"WARNING: missing source {src} (skipped)")
+
+
+def recover_interrupted_update(out):
+    """Cut off what an interrupted update_mod_zip appended, restoring the archive as it was before.
+    Returns True if there was something to recover."""
+    journal = out + UPDATE_JOURNAL_SUFFIX
+    try:
+        with open(journal, "r", encoding="ascii") as f:
+            length = int(f.read().strip())
+    except (OSError, ValueError):
+        return False
+    try:
+        # a later full rewrite replaced the file: the journal is stale
+        if os.path.getsize(out) >= length:
+            os.truncate(out, length)
+    except OSError:
+        return False
+    os.remove(journal)
+    return True
+
+
+def _update_layout(out):
+    """({name: (ZipEntry, RawMember)}, file size) of an archive that can be updated in
+    place; ValueError saying why if it has to be rewritten."""
+    try:
+        st = os.stat(out)
+    except OSError:
+        raise ValueError("no previous archive")
+    # other links would see the edit too
+    if st.st_nlink > 1:
+        raise ValueError("archive is hardlinked")
+    try:
+        with zipfile.ZipFile(out) as zf, open(out, "rb") as f:
+            layout = {info.filename: (ZipEntry(info.filename, raw.method, raw.crc, raw.compress_size,
+                                               raw.file_size, info.header_offset), raw)
+                      for info, raw in _scan_zip(zf, f, out)}
+    except (OSError, zipfile.BadZipFile) as e:
+        raise ValueError(f"previous archive can't be read ({e})")
+    return layout, st.st_size
+
+
+def _record_size(entry, raw):
+    # local header + name + extra + data
+    return raw.offset + raw.compress_size - entry.header_offset
+
+
+def update_mod_zip(out, file_map, manifest_text, digests, log=print, zip_reader=None, governor=None,
+                   compact_ratio=COMPACT_DEAD_RATIO):
+    """Bring an existing mod archive up to date, writing only what changed. Returns a report dict.
+
+    Members whose name, size and CRC match their source (the same test as
+    plan_delta) stay where they are, byte for byte. Added and changed ones
+    are appended after the end of the archive and a new central directory
+    is written after them; replaced and removed members and the old
+    directory become dead space. When the dead space would exceed
+    `compact_ratio` of the archive, or there is no archive to update, it is
+    rewritten by write_mod_zip instead (unchanged members are still copied
+    raw). report["mode"] is "unchanged", "update", "compact" or "full".
+
+    The old bytes are never overwritten. Before appending, the old length
+    is noted in <out>.update; the appended members are synced to disk
+    before the new directory is written, and the note is removed once that
+    is synced too. A failed update is cut back to the old length at once,
+    one that was killed (or lost power) by recover_interrupted_update, run
+    at the start of the next update. Until then the archive can't be
+    opened: its old end record is no longer at the end of the file.
+    """
+    out = os.path.abspath(out)
+    members = dict(file_map)
+    members["manifest.json"] = manifest_text.encode("utf-8")
+    report = {"mode": "full", "kept": 0, "written": 0, "removed": 0, "bytes_written": 0, "dead_bytes": 0}
+    if recover_interrupted_update(out):
+        log(f"Update: cut off the remains of an interrupted update of {out}")
+    try:
+        layout, old_size = _update_layout(out)
+    except ValueError as e:
+        log(f"Update: {e}, writing the whole archive")
+        write_mod_zip(out, file_map, manifest_text, log, zip_reader, governor)
+        size = os.path.getsize(out)
+        return dict(report, bytes_written=size, archive_bytes=size)
+
+    kept, changed = [], []
+    for rel in sorted(members):
+        src = members[rel]
+        if isinstance(src, ZipMember) and src.zip_path == out:
+            # a member of this very archive: its size and CRC are in the directory just read
+            old = layout.get(src.name)
+            if old is None:
+                log(f"Update: {src} is not in the archive, writing the whole archive")
+                write_mod_zip(out, file_map, manifest_text, log, zip_reader, governor)
+                size = os.path.getsize(out)
+                return dict(report, bytes_written=size, archive_bytes=size)
+            cur = (old[1].file_size, old[1].crc)
+        else:
+            cur = digests.source_crc(src)
+        if cur is None:
+            log(f"WARNING: missing source {src} (skipped)")
+            continue
+        old = layout.get(rel)
+        if old is not None and (old[1].file_size, old[1].crc) == tuple(cur):
+            kept.append(rel)
+        else:
+            changed.append(rel)
+    removed = sorted(set(layout) - set(kept) - set(changed))
+    report.update(kept=len(kept), written=len(changed), removed=len(removed))
+    if not changed and not removed:
+        log(f"Update: all {len(kept)} members unchanged, {out} left as is")
+        return dict(report, mode="unchanged", archive_bytes=os.path.getsize(out))
+
+    live = sum(_record_size(*layout[rel]) for rel in kept)
+    dead = old_size - live
+    # uncompressed sizes: an upper bound for what the changed members will add
+    added = sum(layout[src.name][1].compress_size if isinstance(src, ZipMember) and src.zip_path == out
+                else source_size(src) for src in (members[rel] for rel in changed))
+    if dead > compact_ratio * (old_size + added):
+        log(f"Update: {dead} of {old_size} bytes would be dead space, compacting")
+        # unchanged members are read back raw from the old archive while the new one is written beside it
+        compact = dict(file_map)
+        for rel in kept:
+            if rel != "manifest.json":
+                compact[rel] = ZipMember(out, rel)
+        zip_reader = zip_reader or ZipMemberReader()
+        zip_reader.directories[out] = {rel: raw for rel, (_, raw) in layout.items()}
+        write_mod_zip(out, compact, manifest_text, log, zip_reader, governor)
+        size = os.path.getsize(out)
+        return dict(report, mode="compact", bytes_written=size, archive_bytes=size)
+
+    zip_reader = zip_reader or ZipMemberReader()
+    # sources in this archive are copied from where they are now, all before the appended region
+    zip_reader.directories[out] = {rel: raw for rel, (_, raw) in layout.items()}
+    journal = out + UPDATE_JOURNAL_SUFFIX
+    with open(journal, "w", encoding="ascii") as f:
+        f.write(str(old_size))
+        f.flush()
+        os.fsync(f.fileno())
+    with open(out, "r+b") as fp, (governor.file() if governor else nullcontext()):
+        fp.seek(old_size)
+        zw = ZipWriter(governor.wrap(fp) if governor else fp)
+        zw.entries = [layout[rel][0] for rel in kept]
+        try:
+            for rel in changed:
+                _write_member(zw, rel, members[rel], log, zip_reader)
+            appended = fp.tell() - old_size
+            # the members must be on disk before a directory pointing at them
+            fp.flush()
+            os.fsync(fp.fileno())
+            zw.entries.sort(key=lambda e: e.name)
+            zw.close()
+            fp.flush()
+            os.fsync(fp.fileno())
+        except BaseException:
+            # only ever shrinks the file, so it works on a full disk too
+            fp.truncate(old_size)
+            fp.close()
+            os.remove(journal)
+            raise
+    os.remove(journal)
+    size = os.path.getsize(out)
+    log(f"Updated {out} in place: {len(kept)} kept, {len(changed)} written, {len(removed)} removed; "
+        f"{appended} bytes appended, {dead} bytes ({dead * 100 // max(size, 1)}%) dead space")
+    return dict(report, mode="update", bytes_written=size - old_size, dead_bytes=dead, archive_bytes=size)
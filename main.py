@@ -2,14 +2,103 @@
 """
 Entry point: starts the GX Mod Builder GUI.
 Keep this file next to the `libs` folder.
+
+Command line tools:
+    python main.py serve <builds folder> [--host H] [--port P]
+    python main.py loadtest <url> [-c CONCURRENCY] [-d SECONDS] [-H "Header: value"]
+    python main.py lint <library folder> [--json OUT] [--junit OUT] [-j JOBS]
+    python main.py verify <export folder | mod ZIP>
+    python main.py match <manifest.json | export folder | mod ZIP> <URL list> [--json OUT] [--max N]
 """
-import tkinter as tk
-from libs.gui import GXModBuilder
+import sys
+import json
+import time
+import argparse
 
 def main():
+    import tkinter as tk
+    from libs.gui import GXModBuilder
     root = tk.Tk()
     app = GXModBuilder(root)
     root.mainloop()
 
+def cli(argv):
+    from libs.server import UpdateServer, DEFAULT_HOST, DEFAULT_PORT, UPDATE_MANIFEST_NAME
+    from libs.loadtest import run_load_test, format_result
+    from libs.lint import lint_library, format_lint, lint_to_json, write_junit
+    from libs.verify import verify_export
+    from libs.matcher import read_page_styles, read_url_list, run_match_report, format_match_report, report_to_json
+
+    ap = argparse.ArgumentParser(prog="main.py")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("serve", help="serve exported mod ZIPs and an update manifest")
+    p.add_argument("folder")
+    p.add_argument("--host", default=DEFAULT_HOST)
+    p.add_argument("--port", type=int, default=DEFAULT_PORT)
+    p.add_argument("-v", "--verbose", action="store_true", help="log every request")
+    p = sub.add_parser("loadtest", help="measure requests per second against a URL")
+    p.add_argument("url")
+    p.add_argument("-c", "--concurrency", type=int, default=8)
+    p.add_argument("-d", "--duration", type=float, default=5.0)
+    p.add_argument("-H", "--header", action="append", default=[], help='extra request header, e.g. "Accept-Encoding: gzip"')
+    p = sub.add_parser("match", help="run a URL list (e.g. a browsing-history export) against the page_styles match patterns")
+    p.add_argument("build", help="manifest.json, export folder or mod ZIP")
+    p.add_argument("urls", help="text file with one URL per line, or a CSV / JSON history export")
+    p.add_argument("--json", metavar="OUT", help="also write the full per-URL report as JSON")
+    p.add_argument("--max", type=int, default=50, help="matching URLs / pairs to list (default 50)")
+    p = sub.add_parser("lint", help="validate every mod folder and mod ZIP under a folder")
+    p.add_argument("root")
+    p.add_argument("--json", metavar="OUT", help="write the results as JSON")
+    p.add_argument("--junit", metavar="OUT", help="write the results as JUnit XML")
+    p.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: one per CPU)")
+    p = sub.add_parser("verify", help="check an exported build's ZIP CRCs and mod.flavor.hash")
+    p.add_argument("build", help="export folder or mod ZIP")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "serve":
+        server = UpdateServer(args.folder, args.host, args.port, log=print if args.verbose else None)
+        print(f"Serving {len(server.index.builds)} build(s) from {server.index.root}")
+        print(f"Update manifest: {server.url}{UPDATE_MANIFEST_NAME}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return 0
+
+    if args.cmd == "lint":
+        t0 = time.perf_counter()
+        results = lint_library(args.root, args.jobs)
+        print("\n".join(format_lint(results, args.root, time.perf_counter() - t0)))
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(lint_to_json(results, args.root), f, indent=2, ensure_ascii=False)
+        if args.junit:
+            write_junit(results, args.root, args.junit)
+        return 1 if any(r["issues"] for r in results) else 0
+
+    if args.cmd == "verify":
+        problems = verify_export(args.build)
+        for p in problems:
+            print("PROBLEM: " + p)
+        return 1 if problems else 0
+
+    if args.cmd == "match":
+        report = run_match_report(read_page_styles(args.build), read_url_list(args.urls))
+        print("\n".join(format_match_report(report, args.max)))
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(report_to_json(report), f, indent=2, ensure_ascii=False)
+        # invalid patterns fail the run, so it can gate a release script
+        return 1 if report["invalid"] else 0
+
+    headers = dict(h.split(":", 1) for h in args.header)
+    headers = {k.strip(): v.strip() for k, v in headers.items()}
+    print(format_result(run_load_test(args.url, args.concurrency, args.duration, headers)))
+    return 0
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(cli(sys.argv[1:]))
     main()